@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Sidebar } from './components/Sidebar';
 import { ChatArea } from './components/ChatArea';
 import { ChatSession, Message, Role, Theme } from './types';
-import { sendToAgent, exchangeAuthCode } from './services/agentService';
+import { sendToAgent, exchangeAuthCode, subscribeToTask } from './services/agentService';
 import { PanelLeft } from 'lucide-react';
 
 const App: React.FC = () => {
@@ -59,23 +59,20 @@ const App: React.FC = () => {
     }
   }, [theme]);
 
-  // Poll for active task status
+  // Follow the active task's status (pushed by the backend)
   useEffect(() => {
-    let intervalId: any;
+    let unsubscribe: (() => void) | undefined;
 
     if (activeTaskId && activeTaskStatus !== 'completed') {
-      intervalId = setInterval(async () => {
+      unsubscribe = subscribeToTask(activeTaskId, (fetchedTask) => {
         try {
-          const service = await import('./services/agentService');
-          const fetchedTask = await service.getTask(activeTaskId);
-
           if (fetchedTask) {
             setActiveTaskStatus(fetchedTask.status);
 
             // Auto-resume removed. Waiting for user input.
 
             if (fetchedTask.status === 'completed') {
-              setActiveTaskId(null); // Stop polling
+              setActiveTaskId(null); // Stop listening
 
               // Update the chat message with the final result
               setChats(prev => prev.map(c => {
@@ -99,13 +96,13 @@ const App: React.FC = () => {
             }
           }
         } catch (e) {
-          console.error("Polling error", e);
+          console.error("Task update error", e);
         }
-      }, 1000);
+      });
     }
 
     return () => {
-      if (intervalId) clearInterval(intervalId);
+      if (unsubscribe) unsubscribe();
     };
   }, [activeTaskId, activeTaskStatus, currentChatId]);
 
@@ -171,12 +168,32 @@ const App: React.FC = () => {
     setIsLoading(true);
     const startTime = Date.now();
 
+    // The reply is added on its first streamed token and replaced when the stream ends
+    const modelMsgId = (Date.now() + 1).toString();
+    const upsertModelMsg = (update: (existing?: Message) => Message) => {
+      setChats(prev => prev.map(chat => {
+        if (chat.id !== chatId) return chat;
+        const existing = chat.messages.find(m => m.id === modelMsgId);
+        const message = update(existing);
+        return {
+          ...chat,
+          messages: existing ? chat.messages.map(m => m.id === modelMsgId ? message : m) : [...chat.messages, message],
+          updatedAt: Date.now()
+        };
+      }));
+    };
+
     try {
       // const responseText = await sendMessageToGemini([...currentHistory, userMsg], content);
-      const agentResponse = await sendToAgent(content);
+      const agentResponse = await sendToAgent(content, (token) => upsertModelMsg(existing => ({
+        id: modelMsgId,
+        role: Role.MODEL,
+        content: (existing?.content || '') + token,
+        timestamp: existing?.timestamp ?? Date.now()
+      })));
 
       // Handle Task Creation
-      if (agentResponse.id) {
+      if (agentResponse.id && agentResponse.status !== 'error') {
         setActiveTaskId(agentResponse.id);
         setActiveTaskStatus(agentResponse.status);
       }
@@ -186,45 +203,27 @@ const App: React.FC = () => {
       const duration = endTime - startTime;
 
       const modelMsg: Message = {
-        id: (Date.now() + 1).toString(),
+        id: modelMsgId,
         role: Role.MODEL,
         content: responseText,
         timestamp: Date.now(),
         latency: duration
       };
 
-      setChats(prev => prev.map(chat => {
-        if (chat.id === chatId) {
-          return {
-            ...chat,
-            messages: [...chat.messages, modelMsg],
-            updatedAt: Date.now()
-          };
-        }
-        return chat;
-      }));
+      upsertModelMsg(() => modelMsg);
     } catch (err: any) {
       console.error(err);
       const endTime = Date.now();
       const duration = endTime - startTime;
 
       const errorMsg: Message = {
-        id: (Date.now() + 1).toString(),
+        id: modelMsgId,
         role: Role.MODEL,
         content: `Error: ${err.message || "Something went wrong"}`,
         timestamp: Date.now(),
         latency: duration
       };
-      setChats(prev => prev.map(chat => {
-        if (chat.id === chatId) {
-          return {
-            ...chat,
-            messages: [...chat.messages, errorMsg],
-            updatedAt: Date.now()
-          };
-        }
-        return chat;
-      }));
+      upsertModelMsg(() => errorMsg);
     } finally {
       setIsLoading(false);
     }
@@ -2,9 +2,15 @@ import { extractDate } from '../utils/dateUtils';
 
 const AGENT_URL = import.meta.env.VITE_AGENT_URL || "http://localhost:8000";
 
-export async function sendToAgent(text: string) {
+const STREAM_IDLE_TIMEOUT_MS = 60000; // Abort only if the stream goes quiet, not on total duration (the backend pings every 15s while it waits)
+
+export async function sendToAgent(text: string, onToken?: (token: string) => void) {
     const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 310000); // 310s timeout
+    let timeoutId = setTimeout(() => controller.abort(), STREAM_IDLE_TIMEOUT_MS);
+    const resetIdleTimer = () => {
+        clearTimeout(timeoutId);
+        timeoutId = setTimeout(() => controller.abort(), STREAM_IDLE_TIMEOUT_MS);
+    };
 
     // Extract date synchronously before sending
     const extractedTime = extractDate(text);
@@ -13,7 +19,7 @@ export async function sendToAgent(text: string) {
     }
 
     try {
-        const res = await fetch(`${AGENT_URL}/agent`, {
+        const res = await fetch(`${AGENT_URL}/agent/stream`, {
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
@@ -26,11 +32,39 @@ export async function sendToAgent(text: string) {
             signal: controller.signal
         });
 
-        if (!res.ok) {
+        if (!res.ok || !res.body) {
             throw new Error(`Agent backend error: ${res.status}`);
         }
 
-        return res.json();
+        // NDJSON: one event per line -> task (id), token (plan chunk), ping (keepalive), error (generation failed), done (final task record)
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            resetIdleTimer();
+            buffer += decoder.decode(value, { stream: true });
+
+            let newline;
+            while ((newline = buffer.indexOf("\n")) >= 0) {
+                const line = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (!line) continue;
+
+                const event = JSON.parse(line);
+                if (event.event === "ping") {
+                    continue; // only there to reset the idle timer
+                } else if (event.event === "error") {
+                    console.error("Agent stream error:", event.message); // the done event carries the failed task
+                } else if (event.event === "token" && onToken) {
+                    onToken(event.text);
+                } else if (event.event === "done") {
+                    return event.task;
+                }
+            }
+        }
+        throw new Error("Agent stream ended without a result.");
     } catch (error: any) {
         if (error.name === 'AbortError') {
             throw new Error("Request timed out. The agent provided no response.");
@@ -54,6 +88,20 @@ export async function getTask(taskId: string) {
     }
 }
 
+// Pushes every status change of a task (Server-Sent Events). EventSource reconnects
+// on its own and resumes from the last revision it saw. Returns an unsubscribe function.
+export function subscribeToTask(taskId: string, onUpdate: (task: any) => void): () => void {
+    const source = new EventSource(`${AGENT_URL}/tasks/${taskId}/events`);
+    source.addEventListener("task", (event) => {
+        try {
+            onUpdate(JSON.parse((event as MessageEvent).data));
+        } catch (error) {
+            console.error("Bad task event:", error);
+        }
+    });
+    return () => source.close();
+}
+
 export async function completeTask(taskId: string, planUpdate: string, sources: any[]) {
     try {
         const res = await fetch(`${AGENT_URL}/tasks/${taskId}/complete`, {
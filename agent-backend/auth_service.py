@@ -1,5 +1,8 @@
 import os
 import json
+import logging
+import threading
+from datetime import datetime, timedelta
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
@@ -17,6 +20,15 @@ SCOPES = [
 ]
 REDIRECT_URI = "http://localhost:5173" # Must match frontend URL
 REDIRECT_URI = "http://localhost:5173" # Must match frontend URL
+REFRESH_MARGIN = timedelta(minutes=5) # Refresh this long before expiry, not after
+
+# In-memory credentials, reloaded only when token.json changes on disk.
+# `credentials_generation` bumps whenever the cached object is replaced or dropped,
+# so clients built from it (google_clients) know to rebuild.
+_creds = None
+_creds_mtime = None
+_creds_lock = threading.Lock()
+credentials_generation = 0
 
 def get_flow():
     """Initializes the OAuth flow from client secrets."""
@@ -44,27 +56,64 @@ def exchange_code_for_token(code: str):
 
 def save_credentials(creds):
     """Saves credentials to a file."""
-    with open(TOKEN_FILE, "w") as token:
-        token.write(creds.to_json())
+    global _creds, _creds_mtime, credentials_generation
+    with _creds_lock:
+        with open(TOKEN_FILE, "w") as token:
+            token.write(creds.to_json())
+        if creds is not _creds:
+            credentials_generation += 1
+        _creds = creds
+        _creds_mtime = os.path.getmtime(TOKEN_FILE)
+
+def _needs_refresh(creds) -> bool:
+    if not creds.refresh_token:
+        return False
+    if creds.expired or not creds.token:
+        return True
+    # google-auth stores expiry as naive UTC
+    return creds.expiry is not None and creds.expiry - REFRESH_MARGIN <= datetime.utcnow()
 
 def get_credentials():
-    """Loads valid credentials, refreshing if necessary."""
-    creds = None
-    if os.path.exists(TOKEN_FILE):
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-        
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-        save_credentials(creds)
-        
+    """Returns cached credentials, refreshing shortly before they expire."""
+    global _creds, _creds_mtime, credentials_generation
+    with _creds_lock:
+        mtime = os.path.getmtime(TOKEN_FILE) if os.path.exists(TOKEN_FILE) else None
+        if mtime is None:
+            if _creds is not None:
+                _creds, _creds_mtime = None, None
+                credentials_generation += 1
+            return None
+
+        if _creds is None or mtime != _creds_mtime:
+            _creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+            _creds_mtime = mtime
+            credentials_generation += 1
+
+        creds = _creds
+
+    if _needs_refresh(creds):
+        with _creds_lock:
+            # Another thread may have refreshed while we waited
+            if _needs_refresh(creds):
+                creds.refresh(Request())
+                with open(TOKEN_FILE, "w") as token:
+                    token.write(creds.to_json())
+                _creds_mtime = os.path.getmtime(TOKEN_FILE)
+
     return creds
 
 def revoke_credentials():
     """Removes the token file to revoke access."""
-    if os.path.exists(TOKEN_FILE):
-        os.remove(TOKEN_FILE)
-        return True
-    return False
+    global _creds, _creds_mtime, credentials_generation
+    with _creds_lock:
+        _creds, _creds_mtime = None, None
+        credentials_generation += 1
+        import google_clients
+        google_clients.invalidate()
+        if os.path.exists(TOKEN_FILE):
+            os.remove(TOKEN_FILE)
+            return True
+        return False
 
 def is_connected():
     """Checks if valid credentials exist."""
@@ -77,10 +126,10 @@ def get_user_info():
         return None
     
     try:
-        from googleapiclient.discovery import build
-        service = build('oauth2', 'v2', credentials=creds)
-        user_info = service.userinfo().get().execute()
+        import google_clients
+        service = google_clients.get_service('oauth2', 'v2')
+        user_info = service.userinfo().get().execute(http=google_clients.authorized_http())
         return user_info
     except Exception as e:
-        print(f"Error fetching user info: {e}")
+        logging.error(f"Error fetching user info: {e}")
         return None
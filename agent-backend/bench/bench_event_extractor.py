@@ -0,0 +1,146 @@
+"""Accuracy and latency of the rule-based event extractor against the LLM path.
+
+Runs every case in extraction_corpus.jsonl through event_extractor and scores
+summary / start_time / duration against the expected values. Cases the rules
+answer with confidence >= the threshold make up the fast path; those must all
+be right (the exit code is 1 otherwise), the rest are deferred to the LLM.
+
+    python bench/bench_event_extractor.py
+    python bench/bench_event_extractor.py --llm   # also score the Ollama path (needs Ollama at OLLAMA_URL)
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import event_extractor  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_corpus.jsonl")
+
+
+def load_corpus(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _norm_summary(value) -> str:
+    words = re.sub(r"[^\w\s:]", " ", str(value or "").lower()).split()
+    return " ".join(w for w in words if w not in ("a", "an", "the"))
+
+
+def _same_start(actual, expected: str) -> bool:
+    try:
+        a = datetime.fromisoformat(str(actual).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    e = datetime.fromisoformat(expected)
+    if a.tzinfo is None:
+        # The LLM sometimes drops the offset; the wall-clock time is what the user asked for
+        return a == e.replace(tzinfo=None)
+    return a == e
+
+
+def score(details: dict, expected: dict) -> dict:
+    details = details or {}
+    return {
+        "summary": _norm_summary(details.get("summary")) == _norm_summary(expected["summary"]),
+        "start_time": _same_start(details.get("start_time"), expected["start_time"]),
+        "duration": details.get("duration_minutes", 30) == expected["duration_minutes"],
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(seconds: list, unit: float, label: str) -> dict:
+    if not seconds:
+        return {}
+    samples = sorted(s * unit for s in seconds)
+    return {
+        f"p50_{label}": round(statistics.median(samples), 2),
+        f"p95_{label}": round(samples[int(0.95 * (len(samples) - 1))], 2),
+        f"max_{label}": round(samples[-1], 2),
+    }
+
+
+def accuracy(scores: list) -> dict:
+    if not scores:
+        return {"cases": 0}
+    out = {"cases": len(scores)}
+    for field in ("summary", "start_time", "duration"):
+        out[field] = round(sum(s[field] for s in scores) / len(scores), 3)
+    out["all_fields"] = round(sum(all(s.values()) for s in scores) / len(scores), 3)
+    return out
+
+
+def run_rules(cases: list, threshold: float, repeat: int):
+    fast, deferred, latencies, failures = [], [], [], []
+    for i, case in enumerate(cases):
+        now = event_extractor.reference_time(case["client_time"])
+        for _ in range(repeat):
+            result, elapsed = timed(event_extractor.extract, case["text"], now, case.get("extracted_time"))
+            latencies.append(elapsed)
+        s = score(result.details, case["expected"])
+        if result.confidence >= threshold:
+            fast.append(s)
+            if not all(s.values()):
+                failures.append({"text": case["text"], "got": result.details, "expected": case["expected"]})
+        else:
+            deferred.append((i, case, result))
+    return fast, deferred, latencies, failures
+
+
+def run_llm(cases: list):
+    import llm_cache
+    import main  # starts the app's background services; fine for a one-off run
+
+    llm_cache.get_cache("event_details").clear()
+    scores, latencies = [], []
+    for case in cases:
+        details, elapsed = timed(main.llm_extract_event_details, case["text"], case["client_time"], case.get("extracted_time"))
+        latencies.append(elapsed)
+        scores.append(score(details, case["expected"]))
+    return scores, latencies
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--threshold", type=float, default=event_extractor.MIN_CONFIDENCE)
+    parser.add_argument("--repeat", type=int, default=200, help="rule extractions per case, for timing")
+    parser.add_argument("--llm", action="store_true", help="also run every case through the LLM extractor")
+    args = parser.parse_args()
+
+    cases = load_corpus(args.corpus)
+    fast, deferred, latencies, failures = run_rules(cases, args.threshold, args.repeat)
+    report = {
+        "cases": len(cases),
+        "threshold": args.threshold,
+        "fast_path_coverage": round(len(fast) / len(cases), 3),
+        "rules_fast_path": {**accuracy(fast), **latency_summary(latencies, 1e6, "us")},
+        "deferred": [{"text": c["text"], "confidence": r.confidence, "reasons": r.reasons} for _, c, r in deferred],
+    }
+
+    if args.llm:
+        llm_scores, llm_latencies = run_llm(cases)
+        report["llm_all_cases"] = {**accuracy(llm_scores), **latency_summary(llm_latencies, 1e3, "ms")}
+        hybrid = fast + [llm_scores[i] for i, _, _ in deferred]
+        report["hybrid"] = accuracy(hybrid)
+
+    if failures:
+        report["fast_path_failures"] = failures
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,101 @@
+"""Benchmarks Google client construction: per-call build vs the process-wide cache.
+
+Runs fully offline: a throwaway token.json in a temp dir and a mocked HTTP
+transport that answers every Calendar insert.
+
+    python bench/bench_google_clients.py --iterations 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from googleapiclient.discovery import build  # noqa: E402
+from googleapiclient.http import HttpMock  # noqa: E402
+
+import auth_service  # noqa: E402
+import google_clients  # noqa: E402
+
+EVENT = {
+    "summary": "Bench",
+    "start": {"dateTime": "2026-02-05T15:00:00+05:30"},
+    "end": {"dateTime": "2026-02-05T15:30:00+05:30"},
+}
+
+
+def write_token(path: str):
+    with open(path, "w") as f:
+        json.dump({
+            "token": "bench-token",
+            "refresh_token": "bench-refresh",
+            "client_id": "bench.apps.googleusercontent.com",
+            "client_secret": "bench",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "scopes": auth_service.SCOPES,
+            "expiry": (datetime.utcnow() + timedelta(days=1)).isoformat() + "Z",
+        }, f)
+
+
+def mock_http(tmp_dir: str) -> HttpMock:
+    body = os.path.join(tmp_dir, "event.json")
+    with open(body, "w") as f:
+        json.dump({"id": "bench", "htmlLink": "https://calendar.google.com/event?eid=bench"}, f)
+    return HttpMock(body, {"status": "200"})
+
+
+def per_call(http):
+    """What create_event used to do: parse token.json and build the service every call."""
+    creds = Credentials.from_authorized_user_file(auth_service.TOKEN_FILE, auth_service.SCOPES)
+    service = build("calendar", "v3", credentials=creds, static_discovery=True, cache_discovery=False)
+    service.events().insert(calendarId="primary", body=EVENT).execute(http=http)
+
+
+def cached(http):
+    service = google_clients.get_service("calendar", "v3")
+    service.events().insert(calendarId="primary", body=EVENT).execute(http=http)
+
+
+def measure(fn, http, iterations: int) -> dict:
+    fn(http)  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(http)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        write_token(auth_service.TOKEN_FILE)
+        http = mock_http(tmp_dir)
+
+        results = {
+            "per_call_build": measure(per_call, http, args.iterations),
+            "cached_client": measure(cached, http, args.iterations),
+        }
+
+    print(json.dumps(results, indent=2))
+    speedup = results["per_call_build"]["p50_ms"] / max(results["cached_client"]["p50_ms"], 1e-6)
+    print(f"p50 speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Agreement and latency of the local internet classifier against the LLM prompt.
+
+Labels come from internet_corpus.jsonl (hand-labelled) plus, optionally, a
+decision log. The classifier is scored by k-fold cross-validation: overall
+agreement, and coverage/agreement above the confidence threshold (the cases
+that would skip the LLM). With --llm every case is also put to the current
+prompt, reporting its agreement with the labels, its latency, and how often
+the confident classifier answers match it.
+
+    python bench/bench_internet_classifier.py
+    python bench/bench_internet_classifier.py --log internet_decisions.jsonl --llm
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import internet_classifier  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "internet_corpus.jsonl")
+
+
+def percentiles(samples: list, scale: float, unit: str) -> dict:
+    samples = sorted(s * scale for s in samples)
+    return {
+        f"p50_{unit}": round(statistics.median(samples), 2),
+        f"p95_{unit}": round(samples[int(0.95 * (len(samples) - 1))], 2),
+    }
+
+
+def cross_validate(samples: list, folds: int, threshold: float, epochs: int):
+    """Out-of-fold predictions: [(decision, confidence)] aligned with samples, plus latencies."""
+    predictions = [None] * len(samples)
+    latencies = []
+    for fold in range(folds):
+        train = [s for i, s in enumerate(samples) if i % folds != fold]
+        model = internet_classifier.train(train, epochs=epochs)
+        for i in range(fold, len(samples), folds):
+            start = time.perf_counter()
+            predictions[i] = model.predict(samples[i][0])
+            latencies.append(time.perf_counter() - start)
+    return predictions, latencies
+
+
+def agreement(pairs: list) -> float:
+    return round(sum(a == b for a, b in pairs) / len(pairs), 3) if pairs else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--log", help="also use decisions from this log")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--threshold", type=float, default=internet_classifier.MIN_CONFIDENCE)
+    parser.add_argument("--llm", action="store_true", help="also run every case through the LLM prompt (needs Ollama)")
+    args = parser.parse_args()
+
+    samples = internet_classifier.load_samples(args.corpus)
+    if args.log:
+        samples += internet_classifier.load_samples(args.log)
+    # Interleave so every fold sees both classes
+    samples.sort(key=lambda s: s[1])
+    samples = [s for pair in zip(samples[::2], samples[1::2]) for s in pair] + (samples[-1:] if len(samples) % 2 else [])
+
+    predictions, latencies = cross_validate(samples, args.folds, args.threshold, args.epochs)
+    labels = [label for _, label in samples]
+    confident = [i for i, (_, confidence) in enumerate(predictions) if confidence >= args.threshold]
+    report = {
+        "samples": len(samples),
+        "threshold": args.threshold,
+        "classifier": {
+            "agreement_with_labels": agreement([(p[0], l) for p, l in zip(predictions, labels)]),
+            "coverage_above_threshold": round(len(confident) / len(samples), 3),
+            "agreement_above_threshold": agreement([(predictions[i][0], labels[i]) for i in confident]),
+            **percentiles(latencies, 1e6, "us"),
+        },
+    }
+
+    if args.llm:
+        import llm_cache
+        import main as app  # starts the app's background services; fine for a one-off run
+
+        llm_cache.get_cache("internet_requirement").clear()
+        llm_decisions, llm_latencies = [], []
+        for text, _ in samples:
+            start = time.perf_counter()
+            llm_decisions.append(app.llm_internet_requirement(text))
+            llm_latencies.append(time.perf_counter() - start)
+        report["llm"] = {
+            "agreement_with_labels": agreement(list(zip(llm_decisions, labels))),
+            **percentiles(llm_latencies, 1e3, "ms"),
+        }
+        report["classifier"]["agreement_with_llm_above_threshold"] = agreement(
+            [(predictions[i][0], llm_decisions[i]) for i in confident])
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Offline stand-in for the Google APIs the backend calls, at the httplib2 layer.
+
+`FakeGoogle` keeps an in-memory calendar and answers what calendar_service and
+auth_service send: event insert/get (409 on a duplicate id, like the real API),
+Calendar batch requests, userinfo and OAuth token refreshes. `install()` points
+google_clients at it and writes a throwaway token.json, so the real client code
+runs end to end without an account:
+
+    fake = FakeGoogle(latency=0.05)
+    fake.install()  # in the backend's working directory
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+import httplib2
+
+USER = {"email": "bench@example.com", "name": "Bench User", "picture": ""}
+
+_EVENTS_RE = re.compile(r"/calendar/v3/calendars/([^/]+)/events(?:/([^/?]+))?$")
+_PART_RE = re.compile(r"Content-ID: <([^>]+)>.*?\r?\n\r?\n(GET|POST) (\S+) HTTP/1\.1\r?\n(.*?)\r?\n\r?\n(.*?)(?=\r?\n--)", re.S)
+
+
+class FakeGoogle:
+    """Shared state behind any number of transports (one per thread, like httplib2.Http).
+
+    `latency` is added to every HTTP round trip (a batch counts as one).
+    `conflicts` are event ids that already exist. Counters: `round_trips`, `inserts`.
+    """
+
+    def __init__(self, latency: float = 0.0, conflicts=()):
+        self.latency = latency
+        self.events = {event_id: {"id": event_id} for event_id in conflicts}
+        self.round_trips = 0
+        self.inserts = 0
+        self._lock = threading.Lock()
+
+    def http(self):
+        """Factory for google_clients.http_factory."""
+        return FakeHttp(self)
+
+    def install(self, token_file: str = None):
+        """Routes google_clients through this fake and logs in with a fake token."""
+        import auth_service
+        import google_clients
+        from bench_google_clients import write_token
+
+        write_token(token_file or auth_service.TOKEN_FILE)
+        google_clients.http_factory = self.http
+        google_clients.invalidate()
+        return self
+
+    # --- Request handling ---
+
+    def handle(self, method: str, uri: str, body, headers: dict):
+        with self._lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+        url = urlparse(uri)
+        if isinstance(body, bytes):
+            body = body.decode()
+        if url.path == "/batch/calendar/v3":
+            return self._batch(body)
+        if url.path == "/token":
+            return 200, {"access_token": "bench-" + uuid.uuid4().hex[:8], "expires_in": 3600, "token_type": "Bearer"}
+        if url.path == "/oauth2/v2/userinfo":
+            return 200, USER
+        return self._calendar(method, url.path, body)
+
+    def _calendar(self, method: str, path: str, body: str):
+        match = _EVENTS_RE.search(path)
+        if not match:
+            return 404, _error(404, f"No fake for {method} {path}")
+        event_id = match.group(2)
+        if method == "POST" and event_id is None:
+            event = json.loads(body or "{}")
+            event_id = event.setdefault("id", uuid.uuid4().hex)
+            with self._lock:
+                if event_id in self.events:
+                    return 409, _error(409, "The requested identifier already exists.")
+                event["htmlLink"] = f"https://calendar.google.com/calendar/event?eid={event_id}"
+                self.events[event_id] = event
+                self.inserts += 1
+            return 200, event
+        if method == "GET" and event_id is not None:
+            event = self.events.get(event_id)
+            if event is None:
+                return 404, _error(404, "Not Found")
+            return 200, {"htmlLink": f"https://calendar.google.com/calendar/event?eid={event_id}", **event}
+        return 404, _error(404, f"No fake for {method} {path}")
+
+    def _batch(self, body: str):
+        boundary = "batch_" + uuid.uuid4().hex
+        parts = []
+        for content_id, method, path, _, part_body in _PART_RE.findall(body):
+            status, payload = self._calendar(method, urlparse(path).path, part_body)
+            data = json.dumps(payload)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n{data}\r\n")
+        return 200, ("".join(parts) + f"--{boundary}--").encode(), f"multipart/mixed; boundary={boundary}"
+
+
+def _error(code: int, message: str) -> dict:
+    return {"error": {"code": code, "message": message, "errors": [{"reason": "fake", "message": message}]}}
+
+
+class FakeHttp:
+    """httplib2.Http look-alike: `request()` returns (Response, content bytes)."""
+
+    def __init__(self, fake: FakeGoogle):
+        self.fake = fake
+        self.timeout = None
+        self.redirect_codes = httplib2.REDIRECT_CODES
+        self.connections = {}
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        status, payload, *content_type = self.fake.handle(method, uri, body, headers or {})
+        content = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        response = httplib2.Response({
+            "status": str(status),
+            "content-type": content_type[0] if content_type else "application/json; charset=UTF-8",
+            "content-length": str(len(content)),
+        })
+        return response, content
+
+    def close(self):
+        pass
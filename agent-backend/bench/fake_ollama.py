@@ -0,0 +1,148 @@
+"""Stand-in for the local Ollama server, for exercising the backend without a model.
+
+Serves POST /api/generate (streaming and non-streaming) with canned output and a
+configurable per-token latency. Run it on Ollama's port and start the backend:
+
+    python bench/fake_ollama.py --port 11434 --token-latency 0.02
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PLAN = "1. Understand the request. 2. Do the work. 3. Report back."
+
+
+def _needs_internet(text: str) -> bool:
+    return any(k in text.lower() for k in ("news", "weather", "latest"))
+
+
+def default_responder(payload: dict) -> str:
+    """Picks a plausible reply from the prompt shape."""
+    prompt = payload.get("prompt", "")
+    if "numbered request" in prompt:
+        requests = re.findall(r'^\s*\d+\. "(.*)"$', prompt, re.MULTILINE)
+        return json.dumps({"answers": ["YES" if _needs_internet(r) else "NO" for r in requests]})
+    if "classifier" in prompt:
+        return "YES" if any(k in prompt.lower() for k in ("news", "weather", "latest")) else "NO"
+    if "JSON extractor" in prompt:
+        return json.dumps({"summary": "Meeting", "start_time": "2026-02-05T15:00:00+05:30", "duration_minutes": 30})
+    return DEFAULT_PLAN
+
+
+class FakeOllama:
+    """Threaded fake server. `calls` records every request payload; `aborted` counts abandoned streams."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token_latency: float = 0.0,
+                 first_token_latency: float = 0.0, responder=default_responder):
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self.responder = responder
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.aborted = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.calls.append(payload)
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    text = fake.responder(payload)
+                    tokens = [t + " " for t in text.split(" ")] or [""]
+                    time.sleep(fake.first_token_latency)
+                    if payload.get("stream", True):
+                        try:
+                            self._stream(payload, tokens)
+                        except (BrokenPipeError, ConnectionResetError):
+                            with fake._lock:
+                                fake.aborted += 1  # the client stopped reading; Ollama cancels here too
+                    else:
+                        time.sleep(fake.token_latency * len(tokens))
+                        self._send_json({"model": payload.get("model"), "response": text.strip(), "done": True,
+                                         **self._counts(payload, tokens)})
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _counts(self, payload: dict, tokens: list) -> dict:
+                """Ollama's final-chunk counters (words stand in for tokens, durations in ns)."""
+                return {
+                    "prompt_eval_count": len(payload.get("prompt", "").split()),
+                    "eval_count": len(tokens),
+                    "load_duration": 0,
+                    "prompt_eval_duration": int(fake.first_token_latency * 1e9),
+                    "eval_duration": int(fake.token_latency * len(tokens) * 1e9),
+                }
+
+            def _send_json(self, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, payload: dict, tokens: list):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(fake.token_latency)
+                    self._chunk(json.dumps({"model": payload.get("model"), "response": token, "done": False}) + "\n")
+                self._chunk(json.dumps({"model": payload.get("model"), "response": "", "done": True,
+                                        **self._counts(payload, tokens)}) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, text: str):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-latency", type=float, default=0.02, help="seconds per generated token")
+    parser.add_argument("--first-token-latency", type=float, default=0.1, help="seconds before the first token")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, args.token_latency, args.first_token_latency)
+    print(f"Fake Ollama listening on {fake.url}")
+    fake.server.serve_forever()
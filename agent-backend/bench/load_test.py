@@ -0,0 +1,373 @@
+"""Load test for the backend: latency percentiles and throughput per endpoint.
+
+Runs the real app in-process (uvicorn on a free port) in a throwaway working
+directory, against fake_ollama and fake_google, so it needs no model, account
+or network. For every task-history size x concurrency level it drives:
+
+- tasks_all     GET /tasks, the full list
+- tasks_page    GET /tasks?limit=50
+- tasks_etag    GET /tasks?limit=50 with a matching If-None-Match (304)
+- task_one      GET /tasks/{id}
+- agent         POST /agent with a fresh request (plan + classify)
+- execute       POST /agent until the task is completed (job queue, extract,
+                Calendar insert through the fake transport)
+
+and reports p50/p95/p99 latency and requests per second for each.
+--background-agents keeps that many /agent requests in flight meanwhile, to
+see whether cheap endpoints stay responsive while generations queue up.
+
+    python bench/load_test.py
+    python bench/load_test.py --history 0,1000,10000 --concurrency 1,8,32 --save baseline.json
+    python bench/load_test.py --baseline baseline.json --tolerance 0.25  # exit 1 on a regression
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests  # noqa: E402
+
+from fake_google import FakeGoogle  # noqa: E402
+from fake_ollama import FakeOllama  # noqa: E402
+
+ENDPOINTS = ("tasks_all", "tasks_page", "tasks_etag", "task_one", "agent", "execute")
+REQUESTS = [
+    "Schedule a meeting with Priya tomorrow at 3pm about the launch {n}",
+    "Add an appointment with the dentist on Friday at 10am {n}",
+    "Write a short plan for cleaning up the garage {n}",
+    "Draft steps to prepare for a job interview {n}",
+]
+EXECUTE_TIMEOUT = 60.0
+
+
+class App:
+    """The backend under test, started in `workdir` with its dependencies faked."""
+
+    def __init__(self, workdir: str, ollama: FakeOllama, google: FakeGoogle, log_level: str):
+        host, port = ollama.server.server_address[:2]
+        os.chdir(workdir)
+        os.environ.update({
+            "OLLAMA_URL": ollama.url,
+            "CONNECTIVITY_PROBE_HOST": host,  # "online" as long as the fake Ollama is up
+            "CONNECTIVITY_PROBE_PORT": str(port),
+            "INTERNET_DECISION_LOG": "",
+            "DEMO_DELAY_SECONDS": "0",
+            "OLLAMA_PREWARM": "0",  # no warm-up calls in the measurements
+            "RETENTION_MAX_TASKS": "0",  # keep the seeded history live
+            "RETENTION_MAX_AGE_DAYS": "0",
+            "LOG_LEVEL": log_level,
+        })
+        google.install()
+
+        import main  # starts the app's background services in workdir
+        import uvicorn
+
+        self.main = main
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._completed = {}  # task id -> monotonic time it completed
+        self._changed = threading.Condition()
+        main.store.add_listener(self._on_change)
+
+    def start(self):
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+
+    def _on_change(self, task: dict):
+        if task.get("status") in ("completed", "error"):
+            with self._changed:
+                self._completed.setdefault(task["id"], time.perf_counter())
+                self._changed.notify_all()
+
+    def wait_finished(self, task_id: str, timeout: float = EXECUTE_TIMEOUT) -> float:
+        """perf_counter time the task completed; raises TimeoutError."""
+        with self._changed:
+            if not self._changed.wait_for(lambda: task_id in self._completed, timeout):
+                raise TimeoutError(f"task {task_id} not finished after {timeout}s")
+            return self._completed.pop(task_id)
+
+    def seed(self, size: int):
+        """Adds completed tasks until the store holds at least `size`."""
+        store = self.main.store
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        for i in range(len(store), size):
+            store.put({
+                "id": str(uuid.uuid4()),
+                "original_request": f"Seeded request {i}: meeting with the team on Monday at 10am",
+                "plan": "1. Understand the request. 2. Do the work. 3. Report back." * 3,
+                "status": "completed",
+                "requires_internet": True,
+                "model_used": self.main.FAST_MODEL,
+                "extracted_time": None,
+                "client_time": None,
+                "created_at": (start + timedelta(seconds=i)).isoformat(),
+            })
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Scenario:
+    """A request function per endpoint: `fn(session, n)`, raising on failure."""
+
+    def __init__(self, app: App):
+        self.app = app
+        self.sample_id = None
+        self.etag = None
+        self.pending = set()  # tasks created by `agent`, still executing in the background
+        self._lock = threading.Lock()
+
+    def prepare(self, session: requests.Session):
+        """Lets earlier tasks finish (so the ETag holds still), then picks a sample task."""
+        with self._lock:
+            pending, self.pending = self.pending, set()
+        for task_id in pending:
+            self.app.wait_finished(task_id)
+        page = session.get(f"{self.app.url}/tasks", params={"limit": 50})
+        page.raise_for_status()
+        tasks = page.json()
+        tasks = tasks.get("tasks", tasks) if isinstance(tasks, dict) else tasks
+        self.sample_id = tasks[0]["id"] if tasks else None
+        self.etag = page.headers.get("ETag")
+
+    def agent(self, session, n):
+        r = session.post(f"{self.app.url}/agent", json={"text": REQUESTS[n % len(REQUESTS)].format(n=n)})
+        r.raise_for_status()
+        task = r.json()
+        with self._lock:
+            self.pending.add(task["id"])
+        return task
+
+    def tasks_all(self, session, n):
+        session.get(f"{self.app.url}/tasks").raise_for_status()
+
+    def tasks_page(self, session, n):
+        session.get(f"{self.app.url}/tasks", params={"limit": 50}).raise_for_status()
+
+    def tasks_etag(self, session, n):
+        r = session.get(f"{self.app.url}/tasks", params={"limit": 50}, headers={"If-None-Match": self.etag or ""})
+        if r.status_code not in (200, 304):
+            r.raise_for_status()
+
+    def task_one(self, session, n):
+        if self.sample_id is None:
+            raise RuntimeError("no task to fetch")
+        session.get(f"{self.app.url}/tasks/{self.sample_id}").raise_for_status()
+
+    def execute(self, session, n):
+        task = self.agent(session, n)
+        with self._lock:
+            self.pending.discard(task["id"])
+        self.app.wait_finished(task["id"])
+
+
+class Background:
+    """Keeps `count` POST /agent requests in flight until stopped."""
+
+    def __init__(self, app: App, count: int):
+        self.app = app
+        self.count = count
+        self.sent = 0
+        self.created = []  # task ids, waited for on stop
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.count):
+            thread = threading.Thread(target=self._loop, args=(i,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _loop(self, i: int):
+        with requests.Session() as session:
+            n = 0
+            while not self._stop.is_set():
+                text = REQUESTS[n % len(REQUESTS)].format(n=f"bg{i}-{n}")
+                try:
+                    r = session.post(f"{self.app.url}/agent", json={"text": text}, timeout=EXECUTE_TIMEOUT)
+                    if r.ok:
+                        self.created.append(r.json()["id"])
+                except requests.RequestException:
+                    pass
+                n += 1
+                self.sent += 1
+
+    def stop(self):
+        """Stops sending and lets the created tasks finish executing."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(EXECUTE_TIMEOUT)
+        for task_id in self.created:
+            try:
+                self.app.wait_finished(task_id)
+            except TimeoutError:
+                pass
+
+
+def percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return samples[max(0, math.ceil(q * len(samples)) - 1)]
+
+
+def run(fn, concurrency: int, total: int, offset: int) -> dict:
+    """`total` calls of fn spread over `concurrency` threads, each with its own connection."""
+    latencies, errors = [], []
+    counter = iter(range(offset, offset + total))
+    lock = threading.Lock()
+
+    def worker():
+        with requests.Session() as session:
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    fn(session, n)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    result = {"requests": total, "errors": len(errors), "rps": round(len(latencies) / wall, 2)}
+    if latencies:
+        result.update({f"p{q}_ms": round(percentile(latencies, q / 100) * 1000, 2) for q in (50, 95, 99)})
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Rows that got slower (p95) or lost throughput (rps) by more than `tolerance`."""
+    base = {(r["endpoint"], r["history"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    print(f"\n{'endpoint':<12}{'history':>8}{'conc':>6}{'p95 ms':>18}{'rps':>18}")
+    for r in results:
+        b = base.get((r["endpoint"], r["history"], r["concurrency"]))
+        if b is None or "p95_ms" not in r or "p95_ms" not in b:
+            continue
+        p95_change = r["p95_ms"] / b["p95_ms"] - 1 if b["p95_ms"] else 0.0
+        rps_change = r["rps"] / b["rps"] - 1 if b["rps"] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance or r["errors"] > b["errors"]
+        print(f"{r['endpoint']:<12}{r['history']:>8}{r['concurrency']:>6}"
+              f"{r['p95_ms']:>10} ({p95_change:+.0%}){r['rps']:>10} ({rps_change:+.0%})"
+              f"{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", default="0,1000,10000", help="task-history sizes, comma separated")
+    parser.add_argument("--concurrency", default="1,8", help="concurrent clients, comma separated")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and level")
+    parser.add_argument("--execute-requests", type=int, default=20, help="requests for the (slow) execute scenario")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="fake Ollama seconds per token")
+    parser.add_argument("--first-token-latency", type=float, default=0.02)
+    parser.add_argument("--google-latency", type=float, default=0.05, help="fake Google seconds per round trip")
+    parser.add_argument("--background-agents", type=int, default=0,
+                        help="POST /agent requests kept in flight during the whole run")
+    parser.add_argument("--log-level", default="WARNING", help="backend LOG_LEVEL during the run")
+    parser.add_argument("--workdir", help="keep the backend's files here instead of a temp dir")
+    parser.add_argument("--save", help="write results to this file (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="compare with saved results; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95/rps change vs the baseline")
+    args = parser.parse_args()
+
+    histories = sorted(int(h) for h in args.history.split(","))
+    levels = [int(c) for c in args.concurrency.split(",")]
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        sys.exit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    save = os.path.abspath(args.save) if args.save else None  # the app runs with workdir as cwd
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="agent-load-")
+    os.makedirs(workdir, exist_ok=True)
+    ollama = FakeOllama(token_latency=args.token_latency, first_token_latency=args.first_token_latency).start()
+    google = FakeGoogle(latency=args.google_latency)
+    app = App(workdir, ollama, google, args.log_level).start()
+    scenario = Scenario(app)
+    background = Background(app, args.background_agents).start()
+
+    results = []
+    sent = 0
+    try:
+        print(f"{'endpoint':<12}{'history':>8}{'conc':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'errors':>8}")
+        for history in histories:
+            app.seed(max(history, 1))  # task_one needs something to fetch
+            for concurrency in levels:
+                for endpoint in endpoints:
+                    with requests.Session() as session:
+                        scenario.prepare(session)
+                    total = args.execute_requests if endpoint == "execute" else args.requests
+                    fn = getattr(scenario, endpoint)
+                    run(fn, 1, min(3, total), sent)  # warm up connections and caches
+                    row = {"endpoint": endpoint, "history": history, "concurrency": concurrency,
+                           "tasks": len(app.main.store), **run(fn, concurrency, total, sent + 3)}
+                    sent += total + 3
+                    results.append(row)
+                    print(f"{endpoint:<12}{history:>8}{concurrency:>6}{row.get('p50_ms', '-'):>10}"
+                          f"{row.get('p95_ms', '-'):>10}{row.get('p99_ms', '-'):>10}{row['rps']:>10}{row['errors']:>8}")
+                    if row["errors"]:
+                        print(f"  first error: {row['first_error']}")
+    finally:
+        background.stop()
+        app.stop()
+        ollama.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "workdir")},
+        "ollama_calls": len(ollama.calls),
+        "google_round_trips": google.round_trips,
+        "results": results,
+    }
+    if save:
+        with open(save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {save}")
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
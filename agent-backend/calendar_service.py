@@ -1,47 +1,148 @@
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-import auth_service
+import hashlib
+import logging
+from googleapiclient.errors import HttpError
+import google_clients
+import tracing
 
-def create_event(summary: str, start_time_iso: str, duration_minutes: int = 30):
-    """Creates a calendar event with specific details."""
-    creds = auth_service.get_credentials()
-    if not creds:
+BATCH_LIMIT = 50 # Calendar API maximum requests per batch
+
+def event_id_for(key: str) -> str:
+    """Maps an idempotency key to a valid Calendar event id (base32hex chars, 5-1024 long)."""
+    return "agent" + hashlib.sha1(key.encode()).hexdigest()
+
+def _error_details(e: Exception) -> str:
+    error_details = str(e)
+    if hasattr(e, 'content'):
+        try:
+            error_details = e.content.decode('utf-8')
+        except:
+            pass
+    return error_details
+
+def _event_body(summary: str, start_time_iso: str, duration_minutes: int = 30, idempotency_key: str = None):
+    # Parse ISO string (handle offset if present)
+    # datetime.fromisoformat handles offsets in Python 3.7+
+    start_dt = datetime.fromisoformat(start_time_iso.replace("Z", "+00:00"))
+    end_dt = start_dt + timedelta(minutes=duration_minutes)
+
+    event = {
+        'summary': summary,
+        'description': 'Created by Agent.',
+        'start': {
+            'dateTime': start_dt.isoformat(),
+            # 'timeZone': 'UTC', <--- REMOVED to let Google infer from offset or user's calendar setting
+        },
+        'end': {
+            'dateTime': end_dt.isoformat(),
+            # 'timeZone': 'UTC',
+        },
+    }
+    if idempotency_key:
+        event['id'] = event_id_for(idempotency_key)
+    return event
+
+def create_event(summary: str, start_time_iso: str, duration_minutes: int = 30, idempotency_key: str = None):
+    """Creates a calendar event with specific details.
+
+    With an idempotency_key the event gets a deterministic id, so retrying the
+    same key returns the existing event instead of creating a duplicate.
+    """
+    with tracing.span("calendar.create_event"):
+        return _create_event(summary, start_time_iso, duration_minutes, idempotency_key)
+
+def _create_event(summary: str, start_time_iso: str, duration_minutes: int, idempotency_key: str):
+    service = google_clients.get_service('calendar', 'v3')
+    if not service:
         return {"error": "Not authenticated"}
 
     try:
-        service = build('calendar', 'v3', credentials=creds)
-
-        # Parse ISO string (handle offset if present)
-        # datetime.fromisoformat handles offsets in Python 3.7+
-        start_dt = datetime.fromisoformat(start_time_iso.replace("Z", "+00:00"))
-        end_dt = start_dt + timedelta(minutes=duration_minutes)
-
-        event = {
-            'summary': summary,
-            'description': 'Created by Agent.',
-            'start': {
-                'dateTime': start_dt.isoformat(), 
-                # 'timeZone': 'UTC', <--- REMOVED to let Google infer from offset or user's calendar setting
-            },
-            'end': {
-                'dateTime': end_dt.isoformat(),
-                # 'timeZone': 'UTC',
-            },
-        }
-
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
+        http = google_clients.authorized_http()
+        event = _event_body(summary, start_time_iso, duration_minutes, idempotency_key)
+
+        try:
+            created_event = service.events().insert(calendarId='primary', body=event).execute(http=http)
+        except HttpError as e:
+            if not (idempotency_key and e.resp.status == 409):
+                raise
+            # Already created by an earlier attempt with the same key
+            created_event = service.events().get(calendarId='primary', eventId=event['id']).execute(http=http)
         return {"status": "success", "link": created_event.get('htmlLink')}
 
     except Exception as e:
-        error_details = str(e)
-        if hasattr(e, 'content'):
-            try:
-                error_details = e.content.decode('utf-8')
-            except:
-                pass
-        print(f"Calendar Error: {error_details}")
+        error_details = _error_details(e)
+        logging.error(f"Calendar Error: {error_details}")
         return {"error": error_details}
 
+def _run_batch(service, http, requests: dict) -> dict:
+    """Executes {key: HttpRequest} in batches of BATCH_LIMIT. Returns {key: (response, exception)}."""
+    outcomes = {}
+
+    def callback(request_id, response, exception):
+        outcomes[request_id] = (response, exception)
+
+    keys = list(requests)
+    for i in range(0, len(keys), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=callback)
+        for key in keys[i:i + BATCH_LIMIT]:
+            batch.add(requests[key], request_id=key)
+        try:
+            with tracing.span("calendar.batch_request", size=len(keys[i:i + BATCH_LIMIT])):
+                batch.execute(http=http)
+        except Exception as e:
+            # The whole batch failed (e.g. network); every item in it gets the error
+            for key in keys[i:i + BATCH_LIMIT]:
+                outcomes.setdefault(key, (None, e))
+    return outcomes
+
+def create_events_batch(events: list):
+    """Creates many events with as few round trips as possible.
+
+    `events` is a list of dicts with "key" (e.g. the task id), "summary",
+    "start_time_iso" and optional "duration_minutes". The key doubles as the
+    idempotency key. Returns {key: result}, where each result has the same shape
+    as create_event's.
+    """
+    with tracing.span("calendar.create_events_batch", events=len(events)):
+        return _create_events_batch(events)
+
+def _create_events_batch(events: list):
+    results = {}
+    service = google_clients.get_service('calendar', 'v3')
+    if not service:
+        return {e["key"]: {"error": "Not authenticated"} for e in events}
+
+    http = google_clients.authorized_http()
+    inserts = {}
+    for e in events:
+        try:
+            body = _event_body(e["summary"], e["start_time_iso"], e.get("duration_minutes", 30), idempotency_key=e["key"])
+        except Exception as ex:
+            results[e["key"]] = {"error": _error_details(ex)}
+            continue
+        inserts[e["key"]] = service.events().insert(calendarId='primary', body=body)
+
+    # Already created by an earlier attempt: look those up instead
+    lookups = {}
+    for key, (response, exception) in _run_batch(service, http, inserts).items():
+        if exception is None:
+            results[key] = {"status": "success", "link": response.get('htmlLink')}
+        elif isinstance(exception, HttpError) and exception.resp.status == 409:
+            lookups[key] = service.events().get(calendarId='primary', eventId=event_id_for(key))
+        else:
+            results[key] = {"error": _error_details(exception)}
+
+    for key, (response, exception) in _run_batch(service, http, lookups).items():
+        if exception is None:
+            results[key] = {"status": "success", "link": response.get('htmlLink')}
+        else:
+            results[key] = {"error": _error_details(exception)}
+
+    for key, result in results.items():
+        if "error" in result:
+            logging.error(f"Calendar Error ({key}): {result['error']}")
+    return results
+
 def create_test_event():
     """Creates a hardcoded test event: 'Agent Test Event' in 10 minutes."""
     start_time = datetime.utcnow() + timedelta(minutes=10)
@@ -0,0 +1,121 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+import tracing
+
+PROBE_HOST = os.environ.get("CONNECTIVITY_PROBE_HOST", "8.8.8.8")
+PROBE_PORT = int(os.environ.get("CONNECTIVITY_PROBE_PORT", "53"))
+PROBE_TIMEOUT = 3
+STATE_TTL = 5.0  # seconds a probe result is trusted by is_online() while the background thread isn't running
+MIN_INTERVAL = 1.0  # background probe interval right after a state change
+MAX_ONLINE_INTERVAL = 30.0
+MAX_OFFLINE_INTERVAL = 5.0  # keep probing briskly while offline so reconnects are noticed fast
+
+
+def tcp_probe(host: str = PROBE_HOST, port: int = PROBE_PORT, timeout: float = PROBE_TIMEOUT):
+    """Default probe: can we open a TCP connection to host:port?"""
+    def probe() -> bool:
+        try:
+            socket.create_connection((host, port), timeout=timeout).close()
+            return True
+        except OSError:
+            return False
+    return probe
+
+
+class ConnectivityMonitor:
+    """Single source of truth for "are we online?".
+
+    - Once `start()`ed, a background thread re-probes with adaptive backoff
+      (the interval doubles while the state is stable and resets on every
+      change) and `is_online()` answers from its last probe without blocking.
+      Before that, a probe result is trusted for `ttl` seconds.
+    - Concurrent callers that do need a probe share one instead of each
+      opening a socket.
+    - `report_failure()` flips the state offline at once, and `subscribe()`
+      callbacks fire on every transition, so queued work can resume immediately.
+    """
+
+    def __init__(self, probe=None, ttl: float = STATE_TTL, min_interval: float = MIN_INTERVAL,
+                 max_online_interval: float = MAX_ONLINE_INTERVAL, max_offline_interval: float = MAX_OFFLINE_INTERVAL):
+        self.probe = probe or tcp_probe()
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.max_online_interval = max_online_interval
+        self.max_offline_interval = max_offline_interval
+
+        self._online = None  # unknown until the first probe
+        self._checked_at = 0.0
+        self._probe_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = []
+        self._interval = min_interval
+        self._thread = None
+
+    @property
+    def online(self):
+        return self._online
+
+    def is_online(self) -> bool:
+        if self._online is not None and (self._thread is not None or time.monotonic() - self._checked_at < self.ttl):
+            return self._online
+        return self.check()
+
+    def check(self) -> bool:
+        """Probes now (or joins a probe already in flight) and returns the result."""
+        started = time.monotonic()
+        with self._probe_lock:
+            # Someone else probed while we waited for the lock; reuse their answer.
+            if self._checked_at >= started:
+                return self._online
+            try:
+                with tracing.span("connectivity.probe"):
+                    result = bool(self.probe())
+            except Exception as e:
+                logging.warning(f"Connectivity probe error: {e}")
+                result = False
+            self._set_state(result)
+            return result
+
+    def report_failure(self):
+        """Callers that hit a network error mark us offline and trigger fast re-probing."""
+        self._set_state(False)
+        self._wake.set()
+
+    def subscribe(self, callback):
+        """callback(online: bool) runs on every state transition."""
+        self._subscribers.append(callback)
+
+    def _set_state(self, online: bool):
+        previous = self._online
+        self._online = online
+        self._checked_at = time.monotonic()
+
+        if previous is not None and previous != online:
+            logging.info(f"Connectivity changed: {'online' if online else 'offline'}")
+            self._interval = self.min_interval
+            for callback in list(self._subscribers):
+                try:
+                    callback(online)
+                except Exception as e:
+                    logging.error(f"Connectivity subscriber error: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="connectivity", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.check()
+            cap = self.max_online_interval if self._online else self.max_offline_interval
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            self._interval = min(cap, self._interval * 2)
+
+
+monitor = ConnectivityMonitor()
@@ -0,0 +1,408 @@
+"""Rule-based event extraction: the fast path in front of the LLM extractor.
+
+Understands the phrasings most calendar requests use (today / tomorrow /
+weekdays / month-day dates, clock times and ranges, "in 2 hours", durations)
+and scores how sure it is. Anything vague, ambiguous, conflicting or left over
+unexplained costs confidence; callers fall back to the LLM below MIN_CONFIDENCE.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+MIN_CONFIDENCE = float(os.environ.get("EXTRACTOR_MIN_CONFIDENCE", "0.8"))  # > 1 disables the fast path
+DEFAULT_DURATION = 30
+DEFAULT_SUMMARY = "Event"
+
+# Confidence penalties
+AMBIGUOUS = 0.25  # "at 3": am or pm?
+VAGUE = 0.3  # "in the evening", "next week", numbers we could not place
+CONFLICT = 0.5  # two different dates/times/durations
+NO_TIME = 0.7  # nothing that looks like a time at all
+NO_TITLE = 0.5
+
+
+class Extraction(NamedTuple):
+    details: dict  # same shape as the LLM's: summary, start_time, duration_minutes
+    confidence: float
+    reasons: list  # why confidence was lost, for logs and the benchmark
+
+
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30, "forty five": 45, "forty-five": 45, "ninety": 90,
+}
+_NUM = r"\d+(?:\.\d+)?|an?|one|two|three|four|five|six|ten|fifteen|twenty|thirty|forty[- ]five|ninety"
+_UNIT = r"hours?|hrs?|minutes?|mins?|h|m"
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_MONTH = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+_AT = r"(?:at\s+|@\s*|by\s+|around\s+|from\s+|between\s+)?"
+
+_DAY_AFTER_TOMORROW_RE = re.compile(r"\b(?:on\s+)?(?:the\s+)?day\s+after\s+tomorrow\b")
+_TOMORROW_RE = re.compile(r"\b(?:tomorrow|tomorow|tommorow|tommorrow|tmrw|tmr)\b")
+_TODAY_RE = re.compile(r"\b(?:today|tonight)\b")
+_WEEKDAY_RE = re.compile(rf"\b(?:on\s+)?(?:(this|next|coming)\s+)?({'|'.join(_WEEKDAYS)})\b")
+_IN_DAYS_RE = re.compile(rf"\bin\s+({_NUM})\s+(days?|weeks?)\b")
+_ISO_DATE_RE = re.compile(r"\b(?:on\s+)?(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_MONTH_DAY_RE = re.compile(rf"\b(?:on\s+)?({_MONTH})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(\d{{4}})\b)?")
+_DAY_MONTH_RE = re.compile(rf"\b(?:on\s+)?(?:the\s+)?(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH})\b\.?(?:,?\s+(\d{{4}})\b)?")
+_ORDINAL_DAY_RE = re.compile(r"\b(?:on\s+)?the\s+(\d{1,2})(?:st|nd|rd|th)\b")
+
+_RANGE_RE = re.compile(
+    rf"\b{_AT}(\d{{1,2}})(?::([0-5]\d))?\s*([ap])?\.?(?:m\b\.?)?\s*(?:-|–|to|until|till|and)\s*"
+    r"(\d{1,2})(?::([0-5]\d))?\s*([ap])?\.?(?:m\b\.?)?(?![\w:])")
+_AMPM_RE = re.compile(rf"\b{_AT}(\d{{1,2}})(?::([0-5]\d))?\s*([ap])\.?m\b\.?")
+_CLOCK_RE = re.compile(rf"\b{_AT}([01]?\d|2[0-3]):([0-5]\d)\b")
+_BARE_HOUR_RE = re.compile(r"\b(?:at|@|around|by)\s+(\d{1,2})(?:\s*o'?clock)?\b(?![:.\d])|\b(\d{1,2})\s*o'?clock\b")
+_NAMED_TIME_RE = re.compile(r"\b(?:at\s+)?(?:12\s+)?(noon|midday|midnight)\b")
+_RELATIVE_RE = re.compile(rf"\bin\s+(?:(half\s+an\s+hour)|({_NUM})\s*(hours?|hrs?|minutes?|mins?)(\s+and\s+a\s+half)?)\b")
+_PART_OF_DAY_RE = re.compile(r"\b(?:(?:this|in\s+the|at)\s+)?(morning|afternoon|evening|tonight|night)\b")
+
+_DURATION_RE = re.compile(
+    rf"\bfor\s+(?:(half\s+an\s+hour)|({_NUM})\s*({_UNIT})(\s+and\s+a\s+half)?)\b"
+    rf"|\b({_NUM})[\s-]*({_UNIT})(?:\s+long\b|(?=\s+(?:meeting|call|session|appointment|slot|block|sync|chat|event|workout|run)\b))")
+
+_BLOCK_RE = re.compile(rf"(?<=\bblock\s)(?:out\s+)?({_NUM})\s*({_UNIT})\b")  # "block 2 hours for ..."
+
+_PART_OF_DAY_HOURS = {"morning": 9, "afternoon": 14, "evening": 18, "tonight": 20, "night": 20}
+_PM_HINTS = {"afternoon", "evening", "tonight", "night"}
+
+# Left over after everything above is taken out: things we do not understand
+_UNPLACED_RE = re.compile(
+    r"\b(?:next\s+week|this\s+week|weekend|month|year|every|daily|weekly|monthly|fortnight|"
+    r"later|soon|sometime|asap|before|after|until|till|end\s+of)\b|\d")
+
+_LEADING_RE = re.compile(
+    r"^(?:(?:hey|hi|ok|okay|please|pls|can\s+you|could\s+you|would\s+you|will\s+you|i\s+need\s+to|"
+    r"i\s+want\s+to|i'?d\s+like\s+to|i\s+would\s+like\s+to|help\s+me|let'?s|lets)\s+)*"
+    r"(?:(?:add|schedule|create|set\s+up|setup|set|book|make|put|mark|plan|arrange|organi[sz]e|insert|"
+    r"block(?:\s+out)?|remind\s+me(?:\s+to|\s+about|\s+of)?|note)\b\s*)?", re.I)
+_ARTICLE_RE = re.compile(r"^(?:(?:a|an|the|my|our|new)\s+)+", re.I)
+_LABEL_RE = re.compile(
+    r"^(?:calendar\s+)?(?:(?:event|entry|meeting|appointment)\s*(?:called|titled|named|:|-)"
+    r"|(?:event|entry|calendar)\s+for|reminder\s*(?:to|for|about|:|-))\s*", re.I)
+_CALENDAR_REF_RE = re.compile(
+    r"\b(?:to|in|on|into|onto)\s+(?:my\s+|the\s+|our\s+)?(?:google\s+)?(?:calendar|calender|schedule|agenda)\b", re.I)
+_DANGLING_RE = re.compile(r"^(?:at|on|for|from|to|by|in|and|with)\b\s*|\s*\b(?:at|on|for|from|to|by|in|and|every)$", re.I)
+
+
+def reference_time(client_time_str: str = None):
+    """Parses the client's clock as sent by the frontend (JS Date.toString()),
+    the server's fallback format or ISO 8601. None when unparseable."""
+    if not client_time_str:
+        return datetime.now().astimezone()
+    # JS: "Thu Feb 05 2026 14:30:00 GMT+0530 (India Standard Time)"
+    m = re.search(r"(\w{3}) (\d{1,2}) (\d{4}) (\d{1,2}):(\d{2}):(\d{2}) GMT([+-])(\d{2})(\d{2})", client_time_str)
+    if m:
+        sign = 1 if m.group(7) == "+" else -1
+        tz = timezone(sign * timedelta(hours=int(m.group(8)), minutes=int(m.group(9))))
+        try:
+            parsed = datetime.strptime(" ".join(m.group(1, 2, 3)), "%b %d %Y")
+        except ValueError:
+            return None
+        return parsed.replace(hour=int(m.group(4)), minute=int(m.group(5)), second=int(m.group(6)), tzinfo=tz)
+    # Server / ISO: "Thursday, 2026-02-05 14:30:00 IST+0530", "2026-02-05T14:30:00+05:30"
+    m = re.search(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}(?::\d{2})?)(?:\.\d+)?(?:\s*[A-Za-z ]*?)?([+-]\d{2}:?\d{2}|Z)?\s*$", client_time_str)
+    if m:
+        offset = m.group(3) or ""
+        if offset and offset != "Z" and ":" not in offset:
+            offset = offset[:3] + ":" + offset[3:]
+        try:
+            parsed = datetime.fromisoformat(f"{m.group(1)}T{m.group(2)}{offset.replace('Z', '+00:00')}")
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.astimezone()
+    return None
+
+
+def _number(token: str) -> float:
+    token = token.strip()
+    if token in _NUMBER_WORDS:
+        return _NUMBER_WORDS[token]
+    return float(token)
+
+
+def _minutes(amount: str, unit: str, and_a_half: str = None) -> int:
+    value = _number(amount) * (60 if unit.startswith("h") else 1)
+    if and_a_half:
+        value += 30 if unit.startswith("h") else 0.5
+    return int(round(value))
+
+
+def _to_24h(hour: int, minute: int, meridiem: str):
+    """Hour on the 24h clock from a 12h reading; None if it is not a valid time."""
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None
+    return hour, minute
+
+
+class _Scan:
+    """Consumes spans of the (lowercased) text as they are recognized."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.taken = [False] * len(text)
+
+    def free(self, span) -> bool:
+        return not any(self.taken[span[0]:span[1]])
+
+    def take(self, span):
+        for i in range(*span):
+            self.taken[i] = True
+
+    def find(self, pattern):
+        """Matches of `pattern` that do not overlap anything already taken (taking them)."""
+        for match in pattern.finditer(self.text):
+            if self.free(match.span()):
+                self.take(match.span())
+                yield match
+
+    def rest(self, original: str) -> str:
+        return "".join(" " if taken else ch for ch, taken in zip(original, self.taken))
+
+
+def _find_dates(scan: _Scan, today):
+    """Yields (date, penalty, reason) for every date phrase in the text."""
+    for _ in scan.find(_DAY_AFTER_TOMORROW_RE):
+        yield today + timedelta(days=2), 0, None
+    for _ in scan.find(_TOMORROW_RE):
+        yield today + timedelta(days=1), 0, None
+    for _ in scan.find(_TODAY_RE):
+        yield today, 0, None
+    for m in scan.find(_WEEKDAY_RE):
+        ahead = (_WEEKDAYS.index(m.group(2)) - today.weekday()) % 7
+        if m.group(1) == "next":
+            # "next friday": this coming one or the week after? Usually the former.
+            yield today + timedelta(days=ahead or 7), 0.1, "'next <weekday>' is ambiguous"
+        elif ahead == 0:
+            yield today, 0.1, "weekday named is today"
+        else:
+            yield today + timedelta(days=ahead), 0, None
+    for m in scan.find(_IN_DAYS_RE):
+        days = _number(m.group(1)) * (7 if m.group(2).startswith("week") else 1)
+        yield today + timedelta(days=int(days)), 0, None
+    for m in scan.find(_ISO_DATE_RE):
+        try:
+            yield datetime(int(m.group(1)), int(m.group(2)), int(m.group(3))).date(), 0, None
+        except ValueError:
+            yield None, CONFLICT, f"invalid date {m.group(0)!r}"
+    for pattern, day_group, month_group in ((_MONTH_DAY_RE, 2, 1), (_DAY_MONTH_RE, 1, 2)):
+        for m in scan.find(pattern):
+            month = _month_number(m.group(month_group))
+            year = int(m.group(3)) if m.group(3) else today.year
+            try:
+                date = datetime(year, month, int(m.group(day_group))).date()
+                if not m.group(3) and date < today:
+                    date = date.replace(year=year + 1)
+            except ValueError:
+                yield None, CONFLICT, f"invalid date {m.group(0)!r}"
+                continue
+            yield date, 0, None
+    for m in scan.find(_ORDINAL_DAY_RE):
+        try:
+            date = today.replace(day=int(m.group(1)))
+            if date < today:
+                month = today.month % 12 + 1
+                date = date.replace(year=today.year + (month == 1), month=month)
+        except ValueError:
+            yield None, CONFLICT, f"invalid date {m.group(0)!r}"
+            continue
+        yield date, 0.1, "day of month without a month"
+
+
+def _month_number(name: str) -> int:
+    return ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"].index(name[:3]) + 1
+
+
+def _find_times(scan: _Scan, hint: str):
+    """Yields (hour, minute, duration or None, penalty, reason) for every clock time."""
+    for m in scan.find(_RANGE_RE):
+        h1, m1, ap1, h2, m2, ap2 = m.groups()
+        if not (ap1 or ap2 or m1 or m2):
+            # "1 to 2" could be anything; give the span back
+            for i in range(*m.span()):
+                scan.taken[i] = False
+            continue
+        end = _to_24h(int(h2), int(m2 or 0), ap2 or ("p" if hint in _PM_HINTS else None))
+        start = _to_24h(int(h1), int(m1 or 0), ap1 or ap2 or ("p" if hint in _PM_HINTS else None))
+        if start and end and not ap1 and start > end:
+            start = _to_24h(int(h1), int(m1 or 0), "a")  # "11-1pm"
+        if not (start and end):
+            yield None, None, None, CONFLICT, f"invalid time range {m.group(0)!r}"
+            continue
+        duration = (end[0] * 60 + end[1]) - (start[0] * 60 + start[1])
+        if duration <= 0:
+            yield None, None, None, CONFLICT, f"time range ends before it starts {m.group(0)!r}"
+            continue
+        yield start[0], start[1], duration, 0, None
+    for m in scan.find(_AMPM_RE):
+        parsed = _to_24h(int(m.group(1)), int(m.group(2) or 0), m.group(3))
+        if parsed is None:
+            yield None, None, None, CONFLICT, f"invalid time {m.group(0)!r}"
+            continue
+        yield parsed[0], parsed[1], None, 0, None
+    for m in scan.find(_CLOCK_RE):
+        if m.group(1).startswith("0"):
+            yield int(m.group(1)), int(m.group(2)), None, 0, None  # "06:45" is a 24h reading
+            continue
+        yield _resolve_meridiem(int(m.group(1)), int(m.group(2)), hint, m.group(0))
+    for m in scan.find(_BARE_HOUR_RE):
+        yield _resolve_meridiem(int(m.group(1) or m.group(2)), 0, hint, m.group(0), bare=True)
+    for m in scan.find(_NAMED_TIME_RE):
+        yield (0 if m.group(1) == "midnight" else 12), 0, None, 0, None
+
+
+def _resolve_meridiem(hour: int, minute: int, hint: str, phrase: str, bare: bool = False):
+    """A clock reading without am/pm: the part of day decides, else a (penalized) guess."""
+    if hour > 23 or minute > 59:
+        return None, None, None, CONFLICT, f"invalid time {phrase!r}"
+    if hour >= 13 or hour == 0:
+        return hour, minute, None, 0, None
+    if hint in _PM_HINTS:
+        return hour % 12 + 12, minute, None, 0, None
+    if hint == "morning":
+        return hour % 12, minute, None, 0, None
+    if hour == 12:
+        return 12, minute, None, 0, None
+    # Office hours: "at 3" is 15:00, "at 9" is 09:00
+    guess = hour + 12 if hour <= 6 else hour
+    if bare or hour <= 6:
+        return guess, minute, None, AMBIGUOUS, f"no am/pm in {phrase.strip()!r}"
+    return guess, minute, None, 0, None
+
+
+def _find_durations(scan: _Scan):
+    for m in scan.find(_DURATION_RE):
+        half, amount, unit, and_a_half, amount2, unit2 = m.groups()
+        if half:
+            yield 30
+        elif amount:
+            yield _minutes(amount, unit, and_a_half)
+        else:
+            yield _minutes(amount2, unit2)
+    for m in scan.find(_BLOCK_RE):
+        yield _minutes(m.group(1), m.group(2))
+
+
+def _is_title_word(scan: _Scan, match) -> bool:
+    """Whether a part-of-day match is a bare word that follows untaken text ("movie night")."""
+    if match.group(0) != match.group(1):
+        return False  # "this evening", "in the morning", "at night"
+    i = match.start() - 1
+    while i >= 0 and scan.text[i].isspace():
+        i -= 1
+    return i >= 0 and scan.text[i].isalnum() and not scan.taken[i]
+
+
+def _summary(rest: str):
+    title = re.sub(r"\s+", " ", _CALENDAR_REF_RE.sub(" ", rest)).strip(" .,!?;:-")
+    title = _LEADING_RE.sub("", title, count=1)
+    title = _ARTICLE_RE.sub("", title)
+    title = _LABEL_RE.sub("", title)
+    title = _ARTICLE_RE.sub("", title)
+    previous = None
+    while previous != title:
+        previous = title
+        title = _DANGLING_RE.sub("", title.strip(" .,!?;:-\"'")).strip(" .,!?;:-\"'")
+    return title[:1].upper() + title[1:]
+
+
+def extract(text: str, now, extracted_time: str = None) -> Extraction:
+    """Extracts summary, start_time and duration_minutes from `text`.
+
+    `now` is the client's aware datetime (see reference_time); `extracted_time`
+    is the frontend's parsed start time, which is trusted as-is. Follows the
+    LLM prompt's rules: no date means today, and "today" stays today even if
+    the time has passed.
+    """
+    reasons = []
+    penalty = 0.0
+
+    def lose(amount, reason, timing=True):
+        # With the frontend's start time locked in, date/time doubts do not matter
+        nonlocal penalty
+        if amount and not (timing and extracted_time):
+            penalty += amount
+            reasons.append(reason)
+
+    if now is None:
+        return Extraction({}, 0.0, ["unparseable client time"])
+
+    lowered = text.lower()
+    scan = _Scan(lowered)
+    today = now.date()
+    # Part of day is only a hint when a clock time is given, otherwise a vague time
+    part_of_day = _PART_OF_DAY_RE.search(lowered)
+    hint = part_of_day.group(1) if part_of_day else None
+
+    dates = set()
+    relative = None
+    for m in scan.find(_RELATIVE_RE):
+        half, amount, unit, and_a_half = m.groups()
+        relative = now + timedelta(minutes=30 if half else _minutes(amount, unit, and_a_half))
+        relative = relative.replace(second=0, microsecond=0)
+    for date, cost, reason in _find_dates(scan, today):
+        lose(cost, reason)
+        if date:
+            dates.add(date)
+
+    durations = set(_find_durations(scan))
+
+    times = set()
+    for hour, minute, duration, cost, reason in _find_times(scan, hint):
+        lose(cost, reason)
+        if hour is not None:
+            times.add((hour, minute))
+        if duration:
+            durations.add(duration)
+    if hint:
+        # "Movie night at 9pm": a bare period word right after a title word names the
+        # event; with a clock time saying when, it stays in the title
+        if not (times and _is_title_word(scan, part_of_day)):
+            scan.take(part_of_day.span())
+        if not times and relative is None:
+            times.add((_PART_OF_DAY_HOURS[hint], 0))
+            lose(VAGUE, f"vague time {hint!r}")
+
+    rest = scan.rest(text)
+    unplaced = _UNPLACED_RE.search(rest.lower())
+    if unplaced:
+        lose(VAGUE, f"unrecognized {unplaced.group(0)!r}")
+
+    if len(durations) > 1:
+        lose(CONFLICT, f"several durations {sorted(durations)}", timing=False)
+    duration = min(durations) if durations else DEFAULT_DURATION
+
+    summary = _summary(rest)
+    if not summary:
+        summary = DEFAULT_SUMMARY
+        lose(NO_TITLE, "no title", timing=False)
+    elif len(summary.split()) > 10:
+        lose(VAGUE, "title is too long to trust", timing=False)
+
+    if extracted_time:
+        start_time = extracted_time
+    else:
+        if relative is not None:
+            if (dates and dates != {relative.date()}) or times:
+                lose(CONFLICT, "relative time alongside an explicit date/time")
+            start = relative
+        else:
+            if len(dates) > 1:
+                lose(CONFLICT, f"several dates {sorted(str(d) for d in dates)}")
+            if len(times) > 1:
+                lose(CONFLICT, f"several times {sorted(times)}")
+            if not times:
+                lose(NO_TIME, "no time")
+            date = min(dates) if dates else today
+            hour, minute = min(times) if times else (9, 0)
+            start = datetime(date.year, date.month, date.day, hour, minute, tzinfo=now.tzinfo)
+        start_time = start.isoformat()
+
+    details = {"summary": summary, "start_time": start_time, "duration_minutes": duration}
+    return Extraction(details, round(max(0.0, 1.0 - penalty), 2), reasons)
@@ -0,0 +1,47 @@
+import os
+import time
+
+
+class FileWatch:
+    """Notices when a file that is reloaded without a restart has changed.
+
+    `changed()` stats the file at most every `interval` seconds (or now, with
+    force) and compares its (inode, mtime, size) with the last look, so edits,
+    atomic replacements, creation and removal all count. Callers serialize it
+    with their own lock and reload when it returns True; a file that fails to
+    load is not retried until it changes again.
+    """
+
+    def __init__(self, path: str, interval: float):
+        self.path = path
+        self.interval = interval
+        self.exists = False
+        self._key = ()  # (inode, mtime, size) last seen; None = no file; () = not looked yet
+        self._checked_at = 0.0
+
+    def due(self) -> bool:
+        """Whether the next changed() would actually look at the file. Cheap, needs no lock."""
+        return time.monotonic() - self._checked_at >= self.interval
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def changed(self, force: bool = False) -> bool:
+        if not force and not self.due():
+            return False
+        self._checked_at = time.monotonic()
+        key = self._stat()
+        if key == self._key:
+            return False
+        self._key = key
+        self.exists = key is not None
+        return True
+
+    def mark(self):
+        """Records the file as seen in its current state, e.g. after the caller wrote it itself."""
+        self._key = self._stat()
+        self.exists = self._key is not None
@@ -0,0 +1,53 @@
+import threading
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+
+import auth_service
+
+# Discovery documents ship with google-api-python-client (>= 2.0), so building a
+# service needs no network fetch. Set to False to always fetch the live document.
+STATIC_DISCOVERY = True
+http_factory = httplib2.Http  # transport under the auth layer; the benchmarks swap in a fake
+
+_services = {}  # (api, version) -> (credentials_generation, Resource)
+_services_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_service(api: str, version: str):
+    """Returns a process-wide service object, built once per credentials generation.
+
+    The Resource is only a request factory; execute requests with
+    `authorized_http()` since httplib2 connections are not thread-safe.
+    Returns None when not authenticated.
+    """
+    creds = auth_service.get_credentials()
+    if not creds:
+        return None
+    generation = auth_service.credentials_generation
+    key = (api, version)
+    with _services_lock:
+        cached = _services.get(key)
+        if cached and cached[0] == generation:
+            return cached[1]
+        service = build(api, version, credentials=creds, static_discovery=STATIC_DISCOVERY, cache_discovery=False)
+        _services[key] = (generation, service)
+        return service
+
+
+def authorized_http():
+    """Per-thread authorized HTTP transport bound to the current credentials."""
+    creds = auth_service.get_credentials()
+    generation = auth_service.credentials_generation
+    if getattr(_local, "generation", None) != generation or getattr(_local, "http", None) is None:
+        _local.http = google_auth_httplib2.AuthorizedHttp(creds, http=http_factory())
+        _local.generation = generation
+    return _local.http
+
+
+def invalidate():
+    """Drops all cached services (per-thread transports notice the generation change)."""
+    with _services_lock:
+        _services.clear()
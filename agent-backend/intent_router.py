@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import re
+import threading
+
+from file_watch import FileWatch
+
+INTENTS_FILE = os.environ.get("INTENTS_FILE", "intents.json")
+RELOAD_CHECK_SECONDS = 2.0  # how often match() looks at the config file's mtime
+
+# Used when intents.json is missing. "word*" matches any word starting with
+# "word"; everything else matches whole words/phrases only (unless the intent
+# sets "word_boundary": false, which makes its keywords plain substrings).
+DEFAULT_INTENTS = {
+    "smart_model": {"keywords": ["plan*", "workflow*", "steps", "analy*", "after that", "then"]},
+    "calendar": {"keywords": ["calendar*", "calender*", "meeting*", "appointment*", "event*", "remind*", "mark"]},
+    "internet": {"keywords": ["news", "weather", "stock*", "price of", "current event*", "latest", "bse", "nse", "crypto*", "bitcoin*"]},
+    # Only consulted when the LLM internet check itself fails
+    "internet_fallback": {"keywords": ["research*", "search*", "find*", "who", "what", "where"]},
+}
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class _Compiled:
+    """All keywords of all intents, matched in one pass over the text's words.
+
+    Each word of the text costs a dict lookup or three: whole-word keywords,
+    "word*" prefixes (indexed by their first letters) and phrases (indexed by
+    their first word). Intents with word_boundary false use plain substring
+    checks instead.
+    """
+
+    def __init__(self, intents: dict):
+        self.words = {}  # word -> [(keyword, intent)]
+        self.prefixes = {}  # first PREFIX_KEY letters -> [(prefix, keyword, intent)]
+        self.phrases = {}  # first word -> [(words, last word is a prefix, keyword, intent)]
+        self.substrings = []  # (keyword, intent)
+        prefixes = []
+        for intent, config in intents.items():
+            for keyword in config.get("keywords", []):
+                if not config.get("word_boundary", True):
+                    self.substrings.append((keyword.lower(), intent))
+                    continue
+                words = tuple(_WORD_RE.findall(keyword.rstrip("*").lower()))
+                prefix = keyword.endswith("*")
+                if len(words) > 1:
+                    self.phrases.setdefault(words[0], []).append((words, prefix, keyword, intent))
+                elif words and prefix:
+                    prefixes.append((words[0], keyword, intent))
+                elif words:
+                    self.words.setdefault(words[0], []).append((keyword, intent))
+        self.prefix_key = min([len(p[0]) for p in prefixes] + [3])
+        for entry in prefixes:
+            self.prefixes.setdefault(entry[0][:self.prefix_key], []).append(entry)
+
+    def match(self, text: str) -> dict:
+        hits = []
+        lowered = text.lower()
+        tokens = _WORD_RE.findall(lowered)
+        for i, token in enumerate(tokens):
+            if token in self.words:
+                hits.extend(self.words[token])
+            for prefix, keyword, intent in self.prefixes.get(token[:self.prefix_key], ()):
+                if token.startswith(prefix):
+                    hits.append((keyword, intent))
+            for words, prefix, keyword, intent in self.phrases.get(token, ()):
+                candidate = tokens[i:i + len(words)]
+                if len(candidate) == len(words) and candidate[1:-1] == list(words[1:-1]) and (
+                        candidate[-1] == words[-1] or (prefix and candidate[-1].startswith(words[-1]))):
+                    hits.append((keyword, intent))
+        hits.extend((keyword, intent) for keyword, intent in self.substrings if keyword in lowered)
+
+        found = {}
+        for keyword, intent in hits:
+            keywords = found.setdefault(intent, [])
+            if keyword not in keywords:
+                keywords.append(keyword)
+        return found
+
+
+class IntentRouter:
+    """Keyword intent detection from a hot-reloadable JSON config.
+
+    The config maps intent name -> {"keywords": [...], "word_boundary": bool}.
+    Edits to the file are picked up without a restart; a broken file keeps the
+    last good configuration.
+    """
+
+    def __init__(self, path: str = INTENTS_FILE, defaults: dict = None):
+        self.path = path
+        self.defaults = defaults or DEFAULT_INTENTS
+        self._watch = FileWatch(path, RELOAD_CHECK_SECONDS)
+        self._lock = threading.Lock()
+        self._compiled = _Compiled(self.defaults)
+        self.reload()
+
+    def reload(self) -> bool:
+        """Recompiles from the config file if it changed. Returns True if it did."""
+        with self._lock:
+            if not self._watch.changed(force=True):
+                return False
+            if not self._watch.exists:
+                self._compiled = _Compiled(self.defaults)
+                return True
+            try:
+                with open(self.path) as f:
+                    intents = json.load(f)
+                self._compiled = _Compiled(intents)
+            except Exception as e:
+                logging.error(f"Intent config {self.path} not loaded, keeping the previous one: {e}")
+                return False
+            logging.info(f"Intent config loaded from {self.path}: {', '.join(intents)}")
+            return True
+
+    def match(self, text: str) -> dict:
+        """Every intent in `text`, with the keywords that triggered it: {intent: [keyword, ...]}."""
+        if self._watch.due():
+            self.reload()
+        return self._compiled.match(text)
+
+    def has(self, text: str, intent: str) -> bool:
+        return intent in self.match(text)
+
+
+router = IntentRouter()
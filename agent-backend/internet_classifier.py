@@ -0,0 +1,241 @@
+"""Local YES/NO classifier for "does this request need the internet?".
+
+Hashed word/bigram/char-trigram features with logistic regression, in plain
+Python: a prediction is a few dict lookups (tens of microseconds), so the LLM
+is only asked when the model is unsure. The model is trained offline from the
+decisions analyze_internet_requirement logs (when INTERNET_LOG_DECISIONS=1;
+the log holds raw request text, so it is off by default):
+
+    python internet_classifier.py train                 # internet_decisions.jsonl -> internet_model.json
+    python internet_classifier.py train --extra bench/internet_corpus.jsonl
+    python internet_classifier.py predict "what's the weather in Pune"
+
+Model file (JSON): {"format": "hashed-ngram-logreg", "version": 1,
+"n_features": int, "bias": float, "weights": {"<feature index>": float, ...},
+"samples": int, "trained_at": iso}.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime
+
+from file_watch import FileWatch
+
+MODEL_PATH = os.environ.get("INTERNET_MODEL_PATH", "internet_model.json")
+DECISION_LOG = os.environ.get("INTERNET_DECISION_LOG", "internet_decisions.jsonl")
+LOG_DECISIONS = os.environ.get("INTERNET_LOG_DECISIONS", "0") == "1"  # opt-in: the log holds raw request text
+MIN_CONFIDENCE = float(os.environ.get("INTERNET_CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+N_FEATURES = 2 ** 18
+MODEL_FORMAT = "hashed-ngram-logreg"
+MODEL_VERSION = 1
+TRAINED_SOURCES = ("llm", "keyword")  # the classifier's own answers are never trained on
+RELOAD_CHECK_SECONDS = 5.0
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def features(text: str, n_features: int = N_FEATURES) -> set:
+    """Hashed feature indices: words, word bigrams and char trigrams of each word."""
+    words = _WORD_RE.findall(text.lower())
+    grams = ["w:" + w for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        grams += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    return {zlib.crc32(g.encode()) % n_features for g in grams}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class InternetClassifier:
+    def __init__(self, weights: dict, bias: float = 0.0, n_features: int = N_FEATURES, samples: int = 0, trained_at: str = None):
+        self.weights = weights
+        self.bias = bias
+        self.n_features = n_features
+        self.samples = samples
+        self.trained_at = trained_at
+
+    def probability(self, text: str) -> float:
+        """P(needs internet)."""
+        weights = self.weights
+        return _sigmoid(self.bias + sum(weights.get(i, 0.0) for i in features(text, self.n_features)))
+
+    def predict(self, text: str):
+        """(decision, confidence), confidence being the probability of the chosen answer."""
+        p = self.probability(text)
+        return p >= 0.5, max(p, 1.0 - p)
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "format": MODEL_FORMAT,
+                "version": MODEL_VERSION,
+                "n_features": self.n_features,
+                "bias": self.bias,
+                "weights": {str(i): round(w, 6) for i, w in self.weights.items() if abs(w) >= 1e-4},
+                "samples": self.samples,
+                "trained_at": self.trained_at,
+            }, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format") != MODEL_FORMAT or data.get("version") != MODEL_VERSION:
+            raise ValueError(f"unsupported model format {data.get('format')} v{data.get('version')}")
+        weights = {int(i): w for i, w in data["weights"].items()}
+        return cls(weights, data["bias"], data["n_features"], data.get("samples", 0), data.get("trained_at"))
+
+
+def train(samples: list, epochs: int = 30, learning_rate: float = 0.1, l2: float = 1e-3, seed: int = 0,
+          n_features: int = N_FEATURES) -> InternetClassifier:
+    """SGD logistic regression over (text, bool) samples."""
+    rng = random.Random(seed)
+    data = [(features(text, n_features), 1.0 if label else 0.0) for text, label in samples]
+    weights, bias = {}, 0.0
+    for epoch in range(epochs):
+        rng.shuffle(data)
+        rate = learning_rate / (1 + epoch * 0.2)
+        for feats, y in data:
+            p = _sigmoid(bias + sum(weights.get(i, 0.0) for i in feats))
+            gradient = p - y
+            bias -= rate * gradient
+            for i in feats:
+                w = weights.get(i, 0.0)
+                weights[i] = w - rate * (gradient + l2 * w)
+    return InternetClassifier(weights, bias, n_features, len(samples), datetime.now().isoformat())
+
+
+def load_samples(path: str) -> list:
+    """(text, label) pairs from a decision log or a labelled corpus (JSONL).
+
+    Log lines are {"text", "decision", "source"}; corpus lines {"text", "label"}.
+    Later decisions for the same text win.
+    """
+    latest = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if "label" in row:
+                label = row["label"]
+            elif row.get("source") in TRAINED_SOURCES:
+                label = row["decision"]
+            else:
+                continue
+            latest[re.sub(r"\s+", " ", row["text"]).strip().lower()] = (row["text"], bool(label))
+    return list(latest.values())
+
+
+# Runtime: the app's model, loaded lazily and reloaded when the file changes
+
+_model = None
+_model_watch = FileWatch(MODEL_PATH, RELOAD_CHECK_SECONDS)
+_lock = threading.Lock()
+_log_queue = queue.SimpleQueue()
+_log_writer = None
+
+
+def get_model():
+    """The trained model at MODEL_PATH, or None if there is none (or it is unreadable)."""
+    global _model
+    if not _model_watch.due():
+        return _model
+    with _lock:
+        if not _model_watch.changed():
+            return _model
+        if not _model_watch.exists:
+            _model = None
+        else:
+            try:
+                _model = InternetClassifier.load(MODEL_PATH)
+                logging.info(f"Internet classifier loaded from {MODEL_PATH} ({_model.samples} samples)")
+            except Exception as e:
+                logging.error(f"Internet classifier not loaded from {MODEL_PATH}: {e}")
+                _model = None
+        return _model
+
+
+def classify(text: str):
+    """(decision, confidence) from the local model, or None without one."""
+    model = get_model()
+    if model is None:
+        return None
+    return model.predict(text)
+
+
+def log_decision(text: str, decision: bool, source: str):
+    """Queues a decision for DECISION_LOG, the training data for the next model, if LOG_DECISIONS is on.
+
+    A background thread does the writing, so callers never wait on the disk.
+    """
+    global _log_writer
+    if not LOG_DECISIONS or not DECISION_LOG:
+        return
+    _log_queue.put(json.dumps({"text": text, "decision": decision, "source": source, "at": datetime.now().isoformat()}))
+    if _log_writer is None:
+        with _lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(target=_write_decisions, name="internet-decisions", daemon=True)
+                _log_writer.start()
+
+
+def _write_decisions():
+    while True:
+        lines = [_log_queue.get()]
+        while not _log_queue.empty():  # whatever else piled up goes in the same write
+            lines.append(_log_queue.get())
+        try:
+            with open(DECISION_LOG, "a") as f:
+                f.write("".join(line + "\n" for line in lines))
+        except OSError as e:
+            logging.warning(f"{len(lines)} internet decisions not logged: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or try the local internet-requirement classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="train a model from logged decisions")
+    train_cmd.add_argument("--log", default=DECISION_LOG, help="decision log to learn from")
+    train_cmd.add_argument("--extra", action="append", default=[], help="extra labelled JSONL ({text, label}), repeatable")
+    train_cmd.add_argument("--out", default=MODEL_PATH)
+    train_cmd.add_argument("--epochs", type=int, default=30)
+    predict_cmd = sub.add_parser("predict", help="classify a request with the saved model")
+    predict_cmd.add_argument("text")
+    predict_cmd.add_argument("--model", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        samples = []
+        for path in ([args.log] if args.log and os.path.exists(args.log) else []) + args.extra:
+            samples += load_samples(path)
+        if not samples:
+            sys.exit("No training samples: log some decisions first or pass --extra")
+        model = train(samples, epochs=args.epochs)
+        model.save(args.out)
+        positives = sum(label for _, label in samples)
+        print(f"Trained on {len(samples)} samples ({positives} need internet) -> {args.out}")
+    else:
+        decision, confidence = InternetClassifier.load(args.model).predict(args.text)
+        print(json.dumps({"requires_internet": decision, "confidence": round(confidence, 3)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+JOB_WORKERS = 4
+JOB_LEASE_SECONDS = 600
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 2.0  # seconds; doubles per attempt
+JOB_BACKOFF_MAX = 300.0
+
+
+class JobQueue:
+    """Fixed-size worker pool over task ids, backed by the task store's leases.
+
+    - `submit` is idempotent per task id while the job is pending.
+    - A worker only runs a task after atomically claiming its lease in the store,
+      so a task can't execute twice concurrently even if submitted twice.
+    - `handler(task_id)` returns True (done) or False (parked, e.g. waiting for
+      internet). Exceptions are retried with exponential backoff up to
+      `max_attempts`, after which `on_give_up(task_id, error)` is called.
+    - Pending jobs are held in memory only. Task statuses in the store are the
+      durable record: callers re-submit unfinished tasks at startup.
+    """
+
+    def __init__(self, store, handler, workers: int = JOB_WORKERS, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, backoff_base: float = JOB_BACKOFF_BASE,
+                 backoff_max: float = JOB_BACKOFF_MAX, on_give_up=None):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_give_up = on_give_up
+        self.owner = uuid.uuid4().hex[:8]
+
+        self._heap = []  # (ready_at, seq, task_id, attempt)
+        self._pending = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._stats = {"submitted": 0, "completed": 0, "parked": 0, "retried": 0, "failed": 0, "skipped": 0}
+        self._finished_at = deque(maxlen=1000)  # completion timestamps for throughput
+        self._run_times = deque(maxlen=500)
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, task_id: str, delay: float = 0.0, attempt: int = 0) -> bool:
+        """Queues a task. Returns False if it is already pending."""
+        with self._cond:
+            if task_id in self._pending:
+                return False
+            self._pending.add(task_id)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), task_id, attempt))
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return True
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    ready_at, _, task_id, attempt = self._heap[0]
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        self._pending.discard(task_id)
+                        self._running += 1
+                        return task_id, attempt
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _worker(self):
+        while True:
+            task_id, attempt = self._next_job()
+            try:
+                self._run(task_id, attempt)
+            except Exception as e:
+                logging.error(f"Job worker error on task {task_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running -= 1
+
+    def _run(self, task_id: str, attempt: int):
+        lease = f"{self.owner}:{uuid.uuid4().hex[:8]}"
+        if not self.store.claim(task_id, lease, self.lease_seconds):
+            logging.info(f"Job {task_id}: already claimed or gone, skipping")
+            self._bump("skipped")
+            return
+
+        start = time.monotonic()
+        try:
+            done = self.handler(task_id)
+        except Exception as e:
+            attempt += 1
+            if attempt >= self.max_attempts:
+                logging.error(f"Job {task_id}: giving up after {attempt} attempts: {e}")
+                self._bump("failed")
+                if self.on_give_up:
+                    self.on_give_up(task_id, e)
+            else:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                logging.warning(f"Job {task_id}: attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                self._bump("retried")
+                self.store.release(task_id, lease)
+                self.submit(task_id, delay=delay, attempt=attempt)
+                return
+        else:
+            self._run_times.append(time.monotonic() - start)
+            if done:
+                self._bump("completed")
+                self._finished_at.append(time.monotonic())
+            else:
+                self._bump("parked")
+        self.store.release(task_id, lease)
+
+    def _bump(self, key: str):
+        with self._cond:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            recent = sum(1 for t in self._finished_at if now - t <= 60)
+            return {
+                "workers": self.workers,
+                "queue_depth": len(self._heap),
+                "ready": sum(1 for ready_at, *_ in self._heap if ready_at <= now),
+                "running": self._running,
+                **self._stats,
+                "throughput_per_min": recent,
+                "avg_run_seconds": round(sum(self._run_times) / len(self._run_times), 3) if self._run_times else None,
+            }
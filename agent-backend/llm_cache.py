@@ -0,0 +1,153 @@
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH")  # unset = memory only
+SAVE_EVERY = 32  # persisted caches flush after this many writes (and at exit)
+
+def normalize_text(text: str) -> str:
+    """Case/whitespace/trailing punctuation insensitive form of a prompt input."""
+    return re.sub(r"\s+", " ", text).strip().rstrip(".!?").lower()
+
+
+def date_bucket(time_context: str) -> str:
+    """Drops the time of day from a client/server time string, keeping date and zone.
+
+    "Thu Feb 05 2026 14:23:11 GMT+0530 (IST)" -> "Thu Feb 05 2026 GMT+0530 (IST)"
+    """
+    return re.sub(r"\s+", " ", re.sub(r"\b\d{1,2}:\d{2}(:\d{2})?\b", "", time_context or "")).strip()
+
+
+def make_key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LLMCache:
+    """Bounded LRU cache with per-entry TTL and optional JSON persistence.
+
+    Expiry is wall-clock so entries stay valid (or expire) across restarts.
+    Values must be JSON-serializable when persistence is on.
+    """
+
+    def __init__(self, name: str, max_entries: int = LLM_CACHE_SIZE, ttl_seconds: float = LLM_CACHE_TTL,
+                 persist_path: str = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._dirty = 0  # puts since last save
+        if persist_path:
+            self._load()
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty += 1
+            flush = self.persist_path and self._dirty >= SAVE_EVERY
+        if flush:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+    # --- Persistence ---
+
+    def _load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as f:
+                data = json.load(f).get(self.name, [])
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"LLM cache '{self.name}': could not load {self.persist_path}: {e}")
+            return
+        now = time.time()
+        for key, expires_at, value in data[-self.max_entries:]:
+            if expires_at >= now:
+                self._entries[key] = (expires_at, value)
+
+    def save(self):
+        """Writes live entries to `persist_path`, merged with other caches sharing the file."""
+        if not self.persist_path or not self._dirty:
+            return
+        with self._lock:
+            now = time.time()
+            entries = [[k, exp, v] for k, (exp, v) in self._entries.items() if exp >= now]
+            self._dirty = 0
+        with _persist_lock:
+            try:
+                with open(self.persist_path, "r") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = {}
+            data[self.name] = entries
+            tmp_path = self.persist_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.persist_path)
+
+
+_persist_lock = threading.Lock()
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(name: str) -> LLMCache:
+    """Process-wide named cache, persisted to LLM_CACHE_PATH when set."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LLMCache(name, persist_path=LLM_CACHE_PATH)
+        return _registry[name]
+
+
+def all_stats() -> dict:
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def save_all():
+    for cache in _registry.values():
+        cache.save()
+
+
+atexit.register(save_all)
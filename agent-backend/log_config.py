@@ -0,0 +1,171 @@
+"""Logging setup: callers only enqueue; a background listener formats and writes.
+
+Records go through a QueueHandler, so request threads never touch the disk.
+The listener thread writes JSON lines to a size-rotated file (and, for
+warnings and up, plain text to the console). Messages longer than
+LOG_MAX_MESSAGE characters, such as raw model output, are truncated.
+
+Levels can be set per module or logger name. Most of this code logs through
+the root logger, so the module a record came from is matched too:
+
+    LOG_LEVEL=INFO LOG_LEVELS="ollama_client=DEBUG,task_store=WARNING,urllib3=ERROR"
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+import tracing
+
+LOG_FILE = os.environ.get("LOG_FILE", "debug.log")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")  # "module=LEVEL,..."
+LOG_CONSOLE_LEVEL = os.environ.get("LOG_CONSOLE_LEVEL", "WARNING")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+LOG_MAX_MESSAGE = int(os.environ.get("LOG_MAX_MESSAGE", "2000"))  # chars; 0 = never truncate
+LOG_QUEUE_SIZE = 10000  # records buffered before new ones are dropped
+
+_listener = None
+
+
+def parse_level(value: str):
+    """The numeric level for a name like "debug" (or a number), or None if it isn't one."""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    return level if isinstance(level, int) else None  # unknown names come back as "Level X"
+
+
+def parse_levels(spec: str) -> dict:
+    """{name: level} from "name=LEVEL,..."; entries with an unknown level are skipped with a warning."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            level = parse_level(value)
+            if level is None:
+                logging.warning(f"LOG_LEVELS: unknown level {value.strip()!r} for {name.strip()}, ignored")
+                continue
+            levels[name.strip()] = level
+    return levels
+
+
+def _level_setting(var: str, value: str, fallback: int) -> int:
+    level = parse_level(value)
+    if level is None:
+        logging.warning(f"{var}: unknown level {value!r}, using {logging.getLevelName(fallback)}")
+        return fallback
+    return level
+
+
+class ModuleLevelFilter(logging.Filter):
+    """Drops records below the level configured for their logger or source module."""
+
+    def __init__(self, default: int, levels: dict):
+        super().__init__()
+        self.default = default
+        self.levels = levels
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = self.levels.get(record.name, self.levels.get(record.module, self.default))
+        return record.levelno >= level
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the current trace id while still on the caller's thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = tracing.current_trace()
+        record.trace_id = current.id if current is not None else None
+        return True
+
+
+def truncate(message: str, limit: int = None) -> str:
+    limit = LOG_MAX_MESSAGE if limit is None else limit
+    if not limit or len(message) <= limit:
+        return message
+    return f"{message[:limit]}... [truncated {len(message) - limit} chars]"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "msg": truncate(record.getMessage()),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TruncatingFormatter(logging.Formatter):
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(record.message)
+        return super().formatMessage(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge args into the message here; JSON formatting happens on the listener
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # never block the caller on a backed-up disk
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Installs the queue-based pipeline on the root logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    default = _level_setting("LOG_LEVEL", LOG_LEVEL, logging.INFO)
+    levels = parse_levels(LOG_LEVELS)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(_level_setting("LOG_CONSOLE_LEVEL", LOG_CONSOLE_LEVEL, logging.WARNING))
+    console_handler.setFormatter(TruncatingFormatter("%(asctime)s - %(levelname)s - %(module)s - %(message)s"))
+
+    handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(ModuleLevelFilter(default, levels))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    # The root logger has to let through the most verbose level anyone asked for;
+    # the filter applies the per-module levels.
+    root.setLevel(min([default, *levels.values()]))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)  # named third-party loggers
+
+    _listener = logging.handlers.QueueListener(handler.queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # drain the queue on shutdown
+    return _listener
@@ -1,28 +1,43 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request, Response
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import auth_service # Import the new service
+import asyncio
+import contextvars
+import functools
 import threading
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
 from typing import List, Optional
 import uuid
 import settings_service
 import calendar_service
+import task_store
+import task_archive
+import ollama_client
+import prompts
+import structured_output
+import llm_cache
+import job_queue
+import connectivity_service
+import event_extractor
+import intent_router
+import internet_classifier
+import task_pipeline
+import task_events
+import tracing
+import micro_batch
+import log_config
 from datetime import datetime  # Added missing import
 import logging
+import re
+import zlib
 
-# Setup logging
-# Setup logging
-# Setup logging
-logging.basicConfig(
-    filename='debug.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    force=True
-)
+# Setup logging (queued JSON lines in debug.log, rotated; see log_config)
+log_config.setup_logging()
 
 class SettingUpdate(BaseModel):
     key: str
@@ -39,8 +54,25 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Server-Timing"],
 )
 
+HTTP_REQUEST_SECONDS = tracing.histogram("agent_http_request_seconds", "HTTP request latency.", ("method", "route", "status"))
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """One trace per request: spans inside show up in /traces and the Server-Timing header."""
+    start = time.perf_counter()
+    with tracing.trace("http", method=request.method, path=request.url.path) as trace:
+        response = await call_next(request)
+        route = getattr(request.scope.get("route"), "path", "unmatched")  # template, not the raw path
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+        trace.attrs.update(route=route, status=response.status_code)
+        response.headers["X-Trace-Id"] = trace.id
+        if trace.spans:
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
 class UserInput(BaseModel):
     text: str
     client_time: Optional[str] = None # Capture client-side time string
@@ -52,13 +84,22 @@ from fastapi.encoders import jsonable_encoder
 # Configuration
 FAST_MODEL = "llama3.2"
 SMART_MODEL = "llama3.2" 
-TASKS_FILE = "tasks.json"
+MONITOR_SWEEP_SECONDS = 60
+DEMO_DELAY_SECONDS = float(os.environ.get("DEMO_DELAY_SECONDS", "0")) # Artificial pause before execution, for demos
+TASKS_FILE = "tasks.json" # Legacy format, imported into the task store on first run
+TASK_STORE_BACKEND = os.environ.get("TASK_STORE_BACKEND", "journal") # journal | sqlite
+TASK_STORE_PATH = os.environ.get("TASK_STORE_PATH", "tasks.db" if TASK_STORE_BACKEND == "sqlite" else "tasks.journal")
+GOOGLE_WORKERS = int(os.environ.get("GOOGLE_WORKERS", "4")) # Threads for Google API calls made by request handlers
+IO_WORKERS = int(os.environ.get("IO_WORKERS", "4")) # Threads for task store and settings writes made by request handlers
+INTERNET_BATCH_MAX = int(os.environ.get("INTERNET_BATCH_MAX", "8")) # Internet checks answered per LLM call
+INTERNET_BATCH_WAIT_MS = float(os.environ.get("INTERNET_BATCH_WAIT_MS", "5")) # How long a check waits for others to join its batch
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get("STREAM_KEEPALIVE_SECONDS", "15")) # Idle gap before /agent/stream sends a ping
 
 class Task(BaseModel):
     id: str
     original_request: str
     plan: str
-    status: str # planned | waiting_for_internet | executing | completed
+    status: str # planning | planned | waiting_for_internet | executing | completed | error
     requires_internet: bool = False
     model_used: str = FAST_MODEL
     sources: Optional[List[dict]] = []
@@ -67,107 +108,165 @@ class Task(BaseModel):
 class ResumeRequest(BaseModel):
     api_key: str
 
-# File Lock
-file_lock = threading.Lock()
+# Task Store
+# Indexed in memory; every change is a single journal append (or SQLite row write).
+# Existing tasks.json files are imported the first time the store is opened.
+store = task_store.open_store(TASK_STORE_BACKEND, path=TASK_STORE_PATH, legacy_json=TASKS_FILE)
+# Every save/status change is pushed to /tasks/events subscribers
+store.add_listener(task_events.broker.publish)
+# Finished tasks past the retention limits move to gzip segments (see task_archive)
+archive = task_archive.TaskArchive()
+retention = task_archive.Retention(store, archive)
+
+# Async handlers never block the event loop: blocking work goes to a bounded
+# executor of its own, so slow Google calls or disk writes can't use up the
+# threadpool that the sync endpoints (/tasks, ...) run on.
+google_executor = ThreadPoolExecutor(max_workers=GOOGLE_WORKERS, thread_name_prefix="google")
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+async def run_in(executor, fn, *args, **kwargs):
+    """Awaits fn(*args, **kwargs) on `executor`, in the caller's context (so spans join its trace)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
 
 def load_tasks() -> List[dict]:
-    with file_lock:
-        if not os.path.exists(TASKS_FILE):
-            return []
-        try:
-            with open(TASKS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return []
+    with tracing.span("store.load_tasks"):
+        return store.all()
+
+def get_task_by_id(task_id: str) -> Optional[dict]:
+    return store.get(task_id)
 
 def save_task(task: dict):
-    with file_lock:
-        # We need to re-read inside the lock to ensure we have latest state
-        if not os.path.exists(TASKS_FILE):
-             tasks = []
-        else:
-             try:
-                with open(TASKS_FILE, "r") as f:
-                    tasks = json.load(f)
-             except:
-                tasks = []
-
-        # Check if task already exists and update it
-        existing_index = next((index for (index, d) in enumerate(tasks) if d["id"] == task["id"]), None)
-        if existing_index is not None:
-            tasks[existing_index] = task
-        else:
-            tasks.append(task)
-            
-        with open(TASKS_FILE, "w") as f:
-            json.dump(tasks, f, indent=2)
+    with tracing.span("store.save_task"):
+        store.put(task)
+
+def mutate_task(task_id: str, fn) -> Optional[dict]:
+    """Applies fn(task) -> fields to a task in one locked store operation (see TaskStore.mutate)."""
+    with tracing.span("store.mutate_task"):
+        return store.mutate(task_id, fn)
 
 def update_task_status(task_id: str, status: str, plan_update: str = None):
-    # This function combines load/save, so we need the lock to generate the full sequence
-    # However, save_task already takes lock. To avoid deadlock (if we used recursive lock) or complexity,
-    # let's just implement the logic here directly or ensure save_task logic is safe.
-    # Actually, best to just use the lock here and call a helper that doesn't lock? 
-    # Or simply:
-    with file_lock:
-        if not os.path.exists(TASKS_FILE):
-            return
-        
-        try:
-             with open(TASKS_FILE, "r") as f:
-                tasks = json.load(f)
-        except:
-             return
+    fields = {"status": status}
+    if plan_update:
+        fields["plan"] = plan_update
+    with tracing.span("store.update_task_status"):
+        store.update(task_id, **fields)
 
-        for task in tasks:
-            if task["id"] == task_id:
-                task["status"] = status
-                if plan_update:
-                    task["plan"] = plan_update
-                
-                # Save immediately
-                with open(TASKS_FILE, "w") as f:
-                    json.dump(tasks, f, indent=2)
-                break
-
-def call_ollama(prompt: str, model: str = FAST_MODEL):
+def call_ollama(prompt: str, model: str = FAST_MODEL, priority: int = ollama_client.PRIORITY_USER):
     try:
         logging.info(f"Calling Ollama with model: {model}")
-        print(f"Calling Ollama with model: {model}")
-        res = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-            },
-            timeout=300  
-        )
-        logging.info(f"Ollama Status: {res.status_code}")
-        
-        if not res.ok:
-            logging.error(f"Ollama Error: {res.text}")
-            return f"Error connecting to Ollama: Status {res.status_code}, Response: {res.text}"
-        
-        try:
-            data = res.json()
-            response_text = data.get("response", "Error: No response key in Ollama output")
-            logging.info("Ollama Response received")
-            return response_text
-        except json.JSONDecodeError:
-            logging.error("Failed to parse Ollama response")
-            return "Error: Failed to parse Ollama response"
-            
+        with tracing.span("ollama.generate", model=model):
+            start = time.perf_counter()
+            data = ollama_client.client.generate(prompt, model, priority=priority)
+            prompts.record(prompt, data, time.perf_counter() - start)
+        response_text = data.get("response", "Error: No response key in Ollama output")
+        logging.info("Ollama Response received")
+        return response_text
+    except ollama_client.OllamaError as e:
+        logging.error(f"Ollama Error: {e}")
+        return f"Error connecting to Ollama: {e}"
+    except Exception as e:
+        logging.error(f"Ollama Exception: {str(e)}")
+        return f"Error: Unexpected error calling Ollama: {str(e)}"
+
+
+def call_ollama_json(prompt: str, schema: dict, model: str = FAST_MODEL, priority: int = ollama_client.PRIORITY_USER,
+                     max_tokens: int = structured_output.EXTRACT_MAX_TOKENS):
+    """Schema-constrained generation: returns the first JSON object the model writes, or None.
+
+    Streams so reading (and with it generation: closing the response aborts it
+    on the server) stops as soon as the object closes.
+    """
+    reader = structured_output.JsonObjectReader()
+    start = time.perf_counter()
+    first_token = None
+    counters = {"eval_count": 0}
+    try:
+        logging.info(f"Calling Ollama (JSON) with model: {model}")
+        with tracing.span("ollama.generate_json", model=model):
+            chunks = ollama_client.client.stream(prompt, model, priority=priority, format=schema,
+                                                 options={"num_predict": max_tokens, "temperature": 0})
+            try:
+                for chunk in chunks:
+                    if chunk.get("done"):
+                        counters = chunk
+                    elif chunk.get("response"):
+                        first_token = first_token or time.perf_counter() - start
+                        counters["eval_count"] += 1
+                        if reader.feed(chunk["response"]):
+                            break
+            finally:
+                chunks.close()
+    except ollama_client.OllamaError as e:
+        logging.error(f"Ollama Error: {e}")
+        return None
+    prompts.record(prompt, counters, time.perf_counter() - start, first_token)
+    if not reader.complete:
+        logging.warning(f"No complete JSON object in the response: {reader.text[:200]!r}")
+    return reader.value()
+
+
+async def call_ollama_async(prompt: str, model: str = FAST_MODEL, priority: int = ollama_client.PRIORITY_USER):
+    """call_ollama for async handlers: same contract, no thread held while generating."""
+    try:
+        logging.info(f"Calling Ollama with model: {model}")
+        with tracing.span("ollama.generate", model=model):
+            start = time.perf_counter()
+            data = await ollama_client.client.agenerate(prompt, model, priority=priority)
+            prompts.record(prompt, data, time.perf_counter() - start)
+        response_text = data.get("response", "Error: No response key in Ollama output")
+        logging.info("Ollama Response received")
+        return response_text
+    except ollama_client.OllamaError as e:
+        logging.error(f"Ollama Error: {e}")
+        return f"Error connecting to Ollama: {e}"
     except Exception as e:
         logging.error(f"Ollama Exception: {str(e)}")
         return f"Error: Unexpected error calling Ollama: {str(e)}"
 
 
+async def call_ollama_stream(prompt: str, model: str = FAST_MODEL, priority: int = ollama_client.PRIORITY_USER):
+    """Yields response tokens from Ollama as they are generated.
+
+    Unlike call_ollama, errors are raised (as OllamaError), never yielded: they
+    can happen after tokens have gone out, and must not read as plan text.
+    """
+    try:
+        logging.info(f"Streaming from Ollama with model: {model}")
+        with tracing.span("ollama.stream", model=model):
+            start = time.perf_counter()
+            first_token = None
+            async for chunk in ollama_client.client.astream(prompt, model, priority=priority):
+                if chunk.get("response"):
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    prompts.record(prompt, chunk, time.perf_counter() - start, first_token)
+    except ollama_client.OllamaError as e:
+        logging.error(f"Ollama Error: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Ollama Stream Exception: {str(e)}")
+        raise ollama_client.OllamaError(f"Unexpected error calling Ollama: {e}") from e
+
+
 # Search service removed
 
 
 
 
 def extract_event_details(text: str, client_time_str: str = None, extracted_time_override: str = None):
+    """Extracts structured event data from text: rules first, Ollama when they are unsure."""
+    now = event_extractor.reference_time(client_time_str)
+    result = event_extractor.extract(text, now, extracted_time_override)
+    if result.confidence >= event_extractor.MIN_CONFIDENCE:
+        logging.info(f"Rule-based extraction ({result.confidence}): {result.details}")
+        return result.details
+    logging.info(f"Rule-based extraction unsure ({result.confidence}: {', '.join(result.reasons)}), asking the LLM")
+    return llm_extract_event_details(text, client_time_str, extracted_time_override)
+
+def llm_extract_event_details(text: str, client_time_str: str = None, extracted_time_override: str = None):
     """Uses Ollama to extract structured event data from text."""
     
     # 1. Frontend Override (Highest Priority)
@@ -175,26 +274,9 @@ def extract_event_details(text: str, client_time_str: str = None, extracted_time
     # We only ask the LLM to extract the Summary (Title).
     if extracted_time_override:
         logging.info(f"Using Frontend Extracted Time: {extracted_time_override}")
-        prompt = f"""
-        [INST]
-        You are a JSON extractor.
-        
-        Task: Extract the "summary" (Event Title) from the text.
-        
-        Input: "{text}"
-        Locked Start Time: "{extracted_time_override}"
-        
-        Output JSON:
-        {{
-            "summary": "Short event title",
-            "start_time": "{extracted_time_override}",
-            "duration_minutes": 30
-        }}
-        
-        Response (JSON ONLY):
-        [/INST]
-        """
+        prompt = prompts.render("extract_title", text=text, start_time=extracted_time_override)
         model_to_use = FAST_MODEL # Use fast model since logic is simple now
+        cache_key = llm_cache.make_key("override", llm_cache.normalize_text(text), extracted_time_override, model_to_use)
     else: 
         # ... Fallback to full LLM extraction (Old Logic) ...
         if client_time_str:
@@ -207,197 +289,290 @@ def extract_event_details(text: str, client_time_str: str = None, extracted_time
             current_time_context = f"{current_day}, {current_time_str}"
             logging.info(f"Using Server Time: {current_time_context}")
         
-        prompt = f"""
-        [INST] 
-        You are a precise JSON extractor. You do NOT write code. Do not explain.
-        
-        Task: Extract event details from the user text.
-        User's Current Time: {current_time_context}
-        
-        Rules for Date Selection (Follow Hierarchy):
-        1. **Explicit Keyword "Today"**: You MUST use the "Current Date" ({current_time_context.split(',')[1].strip().split(' ')[0] if ',' in current_time_context else 'TODAY'}). DO NOT shift to tomorrow, even if the time is in the past.
-        2. **Explicit Keyword "Tomorrow"**: Add 1 day to "Current Date".
-        3. **No Date Specified**: Assume "Today".
-        4. **Time Logic**: Only shift to tomorrow if the user literally says "tomorrow" or a specific future date.
-        
-        Task Rules:
-        - "summary": Short title.
-        - "start_time": Exact ISO 8601 (YYYY-MM-DDTHH:MM:SS+HH:MM). Use User's Year/Month/Day.
-        - "duration_minutes": Default 30.
-        
-        User Request: "{text}"
-        
-        Response (JSON ONLY):
-        [/INST]
-        """
+        current_date = current_time_context.split(',')[1].strip().split(' ')[0] if ',' in current_time_context else 'TODAY'
+        # Time and request go last so the rules stay a cacheable prefix
+        prompt = prompts.render("extract_event", current_time=current_time_context, current_date=current_date, text=text)
         model_to_use = SMART_MODEL
+        # Usually only the date matters to the answer, so requests on the same day share an entry.
+        # Times relative to now ("in 2 hours") keep the full timestamp.
+        relative = re.search(r"\b(now|in an? |in \d+|hours?|minutes?|mins?)\b", text.lower())
+        time_key = current_time_context if relative else llm_cache.date_bucket(current_time_context)
+        cache_key = llm_cache.make_key("full", llm_cache.normalize_text(text), time_key, model_to_use)
+
+    cache = llm_cache.get_cache("event_details")
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logging.info(f"Extraction cache hit: {cached}")
+        return cached
 
     try:
         logging.info("--- Starting Extraction ---")
-        response = call_ollama(prompt, model=model_to_use) 
-        logging.info(f"Ollama Raw Response: {response}")
-        
-        # Clean response (remove markdown code blocks)
-        cleaned_response = response.replace("```json", "").replace("```python", "").replace("```", "").strip()
-        
-        # Try finding JSON object
-        import re
-        json_match = re.search(r'\{.*\}', cleaned_response, re.DOTALL)
-        if json_match:
-            try:
-                data = json.loads(json_match.group(0))
-                logging.info(f"Successfully parsed JSON: {data}")
-                return data
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON Parse Error: {e}")
-                return None
-        
-        logging.warning("No JSON found in response")
-        return None
+        # Extraction only runs from background execution, so it yields to user-facing calls
+        raw = call_ollama_json(prompt, structured_output.EVENT_DETAILS_SCHEMA, model=model_to_use,
+                               priority=ollama_client.PRIORITY_BACKGROUND)
+        logging.debug(f"Ollama Raw Response: {raw}")
+        if raw is not None and extracted_time_override:
+            raw["start_time"] = extracted_time_override  # locked, whatever the model copied
+        data = structured_output.validate(structured_output.EventDetails, raw)
+        if data is None:
+            return None
+        logging.info(f"Successfully parsed JSON: {data}")
+        cache.put(cache_key, data)
+        return data
     except Exception as e:
-        print(f"Extraction Error: {e}")
+        logging.error(f"Extraction Error: {e}")
         return None
 
 def check_internet():
-    """Checks for internet connectivity by attempting to connect to 8.8.8.8."""
-    try:
-        import socket
-        # Connect to Google DNS
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
-        return True
-    except OSError:
-        return False
+    """Checks for internet connectivity (cached; probed in the background)."""
+    with tracing.span("connectivity.check"):
+        return connectivity_service.monitor.is_online()
+
+def is_calendar_request(text: str) -> bool:
+    # Trigger words live in intents.json ("calendar")
+    return intent_router.router.has(text, "calendar")
 
-def execute_task_logic(task_id: str, task_text: str, client_time: str = None, requires_internet: bool = True, extracted_time: str = None):
+def execute_task_logic(task_id: str, task_text: str, client_time: str = None, requires_internet: bool = True, extracted_time: str = None, idempotency_key: str = None, event_details: dict = None):
     """
     Executes the actual task logic (Calendar API, etc.).
-    Returns True if completed, False if paused due to network/error.
+    Returns True if completed, False if paused due to network.
+    Unexpected errors propagate so the job queue can retry them.
+
+    Safe to call more than once: an already completed task is a no-op, and side
+    effects are keyed by `idempotency_key` (defaults to the task id).
+    `event_details` from the pipeline's extract stage skips re-extraction.
     """
-    try:
-        # Double check internet before starting heavy lifting
-        if requires_internet and not check_internet():
-             logging.warning(f"Task {task_id}: Internet lost before execution. Re-queueing.")
-             update_task_status(task_id, "waiting_for_internet")
-             return False
+    idempotency_key = idempotency_key or task_id
+    existing = get_task_by_id(task_id)
+    if existing is not None and existing.get("status") == "completed":
+        logging.info(f"Task {task_id}: already completed, skipping")
+        return True
+
+    # Double check internet before starting heavy lifting
+    if requires_internet and not check_internet():
+         logging.warning(f"Task {task_id}: Internet lost before execution. Re-queueing.")
+         update_task_status(task_id, "waiting_for_internet")
+         return False
 
-        update_task_status(task_id, "executing")
+    update_task_status(task_id, "executing")
+    
+    # --- REAL ACTION EXECUTION ---
+    result_update = ""
+    if is_calendar_request(task_text) and settings_service.calendar_sync_enabled():
+        logging.info(f"Executing Calendar Action for task {task_id}")
+        
+        # 1. Extract Details (usually already done by the pipeline's extract stage)
+        # Pass extracted_time to override LLM date logic
+        details = event_details or extract_event_details(task_text, client_time_str=client_time, extracted_time_override=extracted_time)
+        logging.info(f"Extracted details: {details}")
         
-        # --- REAL ACTION EXECUTION ---
-        result_update = ""
-        triggers = ["calendar", "calender", "meeting", "appointment", "event", "remind", "mark"]
-        if any(valid_trigger in task_text.lower() for valid_trigger in triggers):
-            logging.info(f"Executing Calendar Action for task {task_id}")
+        if details:
+            # 2. Create Event
+            # Calendar creation definitely needs internet
+            # We do a Just-In-Time check here even if requires_internet was False (though logically it should be True for calendar)
             
-            # 1. Extract Details
-            # Pass extracted_time to override LLM date logic
-            details = extract_event_details(task_text, client_time_str=client_time, extracted_time_override=extracted_time)
-            logging.info(f"Extracted details: {details}")
+            # If the task originally claimed it didn't need internet but now we know it does (calendar), we check again.
+            if not check_internet(): 
+                 logging.warning(f"Task {task_id}: Needs internet for Calendar API. Re-queueing.")
+                 # Make sure to update the task to require internet for next time
+                 store.update(task_id, requires_internet=True, status="waiting_for_internet", event_details=details)
+                 return False
+
+            cal_result = calendar_service.create_event(
+                summary=details.get("summary", "New Event"),
+                start_time_iso=details.get("start_time"),
+                duration_minutes=details.get("duration_minutes", 30),
+                idempotency_key=idempotency_key
+            )
+            return finish_calendar_task(task_id, details, cal_result)
+        else:
+            result_update = "\n\n❌ Could not understand event details."
             
-            if details:
-                # 2. Create Event
-                # Calendar creation definitely needs internet
-                # We do a Just-In-Time check here even if requires_internet was False (though logically it should be True for calendar)
-                
-                # If the task originally claimed it didn't need internet but now we know it does (calendar), we check again.
-                if not check_internet(): 
-                     logging.warning(f"Task {task_id}: Needs internet for Calendar API. Re-queueing.")
-                     # Make sure to update the task to require internet for next time
-                     tasks = load_tasks()
-                     idx = next((i for i, t in enumerate(tasks) if t["id"] == task_id), None)
-                     if idx is not None:
-                         tasks[idx]["requires_internet"] = True
-                         tasks[idx]["status"] = "waiting_for_internet"
-                         save_task(tasks[idx])
-                     else:
-                        update_task_status(task_id, "waiting_for_internet")
-                     return False
-
-                cal_result = calendar_service.create_event(
-                    summary=details.get("summary", "New Event"),
-                    start_time_iso=details.get("start_time"),
-                    duration_minutes=details.get("duration_minutes", 30)
-                )
-                
-                # Check for network-related errors in the result
-                error_msg = str(cal_result.get("error", "")).lower()
-                network_keywords = [
-                    "network", "socket", "connection", "timeout", 
-                    "unable to find the server", "getaddrinfo", "client_connector_error", 
-                    "server disconnected"
-                ]
-                
-                if "error" in cal_result and any(k in error_msg for k in network_keywords):
-                        logging.warning(f"Task {task_id}: Network error ({cal_result['error']}). Re-queueing.")
-                        update_task_status(task_id, "waiting_for_internet")
-                        return False # Exit, do not complete
-                
-                # Success or non-retriable error
-                logging.info(f"Calendar Result: {cal_result}")
-                
-                if "link" in cal_result:
-                        result_update = f"\n\n✅ Event Created: **{details.get('summary')}**\n[View on Google Calendar]({cal_result['link']})"
-                else:
-                        result_update = f"\n\n❌ Event Creation Failed: {cal_result.get('error')}"
-            else:
-                result_update = "\n\n❌ Could not understand event details."
-                
-        # -----------------------------
-
-        # Update the task with the result
-        tasks = load_tasks()
-        existing_index = next((index for (index, d) in enumerate(tasks) if d["id"] == task_id), None)
-        if existing_index is not None:
-            tasks[existing_index]["plan"] += result_update
-            save_task(tasks[existing_index])
-
-        update_task_status(task_id, "completed")
-        return True
+    # -----------------------------
 
-    except Exception as e:
-        logging.error(f"Critical error executing task {task_id}: {e}")
-        # Optionally set to 'error' state, but for now just leave it or set complete with error
-        return False
-
-def background_task_simulation(task_id: str, requires_internet: bool, task_text: str, client_time: str = None, extracted_time: str = None):
-    """Initial entry point for new tasks."""
-    # Simulate thinking/planning time
-    time.sleep(2)
+    complete_task_with_result(task_id, result_update)
+    return True
+
+def is_network_error(cal_result: dict) -> bool:
+    error_msg = str(cal_result.get("error", "")).lower()
+    network_keywords = [
+        "network", "socket", "connection", "timeout", 
+        "unable to find the server", "getaddrinfo", "client_connector_error", 
+        "server disconnected"
+    ]
+    return "error" in cal_result and any(k in error_msg for k in network_keywords)
+
+def finish_calendar_task(task_id: str, details: dict, cal_result: dict) -> bool:
+    """Records a create_event result on the task. Returns False if it was re-queued."""
+    # Check for network-related errors in the result
+    if is_network_error(cal_result):
+            logging.warning(f"Task {task_id}: Network error ({cal_result['error']}). Re-queueing.")
+            # Keep the details so the resume path can batch this insert
+            store.update(task_id, status="waiting_for_internet", event_details=details)
+            # Our cached state was stale; re-probe so the queue resumes on reconnect
+            connectivity_service.monitor.report_failure()
+            return False # Exit, do not complete
     
-    if requires_internet and not check_internet():
+    # Success or non-retriable error
+    logging.info(f"Calendar Result: {cal_result}")
+    
+    if "link" in cal_result:
+            result_update = f"\n\n✅ Event Created: **{details.get('summary')}**\n[View on Google Calendar]({cal_result['link']})"
+    else:
+            result_update = f"\n\n❌ Event Creation Failed: {cal_result.get('error')}"
+    complete_task_with_result(task_id, result_update)
+    return True
+
+def complete_task_with_result(task_id: str, result_update: str):
+    # Append the result and complete in one change, so nobody sees one without the other
+    mutate_task(task_id, lambda task: {"plan": task["plan"] + result_update, "status": "completed"})
+
+def execute_calendar_batch(tasks: List[dict]):
+    """Creates events for many queued calendar tasks in Calendar batch requests.
+
+    Only tasks whose details were already extracted are batched; each is leased
+    first so a job worker can't run it at the same time.
+    """
+    lease = f"batch:{uuid.uuid4().hex[:8]}"
+    claimed = [t for t in tasks if store.claim(t["id"], lease, job_queue.JOB_LEASE_SECONDS)]
+    try:
+        # Re-read under the lease: a worker may have finished some of them meanwhile
+        claimed = [t for t in (get_task_by_id(t["id"]) for t in claimed) if t and t.get("status") == "waiting_for_internet"]
+        if not claimed:
+            return
+        logging.info(f"Monitor: Creating {len(claimed)} calendar events in batch")
+        for task in claimed:
+            update_task_status(task["id"], "executing")
+
+        results = calendar_service.create_events_batch([
+            {
+                "key": task["id"],
+                "summary": task["event_details"].get("summary", "New Event"),
+                "start_time_iso": task["event_details"].get("start_time"),
+                "duration_minutes": task["event_details"].get("duration_minutes", 30),
+            }
+            for task in claimed
+        ])
+        for task in claimed:
+            result = results.get(task["id"], {"error": "No result from batch"})
+            finish_calendar_task(task["id"], task["event_details"], result)
+    finally:
+        for task in tasks:
+            store.release(task["id"], lease)
+
+def run_task_job(task_id: str) -> bool:
+    """Job queue handler: executes a stored task with its saved context."""
+    task = get_task_by_id(task_id)
+    if task is None:
+        return True
+    start = time.perf_counter()
+    with tracing.trace("job", task_id=task_id):
+        done = execute_task_logic(
+            task_id,
+            task["original_request"],
+            task.get("client_time"),
+            task.get("requires_internet", True),
+            task.get("extracted_time"),
+            event_details=task.get("event_details")
+        )
+    if done:
+        timings = {**(task.get("timings") or {}), "execute": round((time.perf_counter() - start) * 1000, 1)}
+        store.update(task_id, timings=timings)
+        logging.info(f"Task {task_id} stage timings (ms): {timings}")
+    return done
+
+def give_up_task(task_id: str, error: Exception):
+    logging.error(f"Critical error executing task {task_id}: {error}")
+    mutate_task(task_id, lambda task: {"status": "error", "plan": task["plan"] + f"\n\n❌ Task failed: {error}"})
+
+# Fixed-size worker pool; replaces a thread per task. Leases in the task store
+# guarantee a task only runs in one worker at a time.
+jobs = job_queue.JobQueue(store, run_task_job, on_give_up=give_up_task).start()
+
+def dispatch_task(task_id: str):
+    """Execute stage entry point for new tasks."""
+    task = get_task_by_id(task_id)
+    if task is None:
+        return
+
+    if task.get("requires_internet") and not check_internet():
         logging.info(f"Task {task_id}: Offline. Queueing.")
         update_task_status(task_id, "waiting_for_internet")
         return # EXIT. Monitor will pick it up later.
         
-    # If we have internet (or don't need it), run immediately
-    execute_task_logic(task_id, task_text, client_time, requires_internet, extracted_time)
+    # If we have internet (or don't need it), run as soon as a worker is free.
+    # DEMO_DELAY_SECONDS optionally adds visible "thinking" time without holding a thread.
+    jobs.submit(task_id, delay=DEMO_DELAY_SECONDS)
+
+def resume_waiting_tasks():
+    queued_tasks = [t for t in load_tasks() if t.get("status") == "waiting_for_internet"]
+    if queued_tasks:
+        logging.info(f"Monitor: Found {len(queued_tasks)} queued tasks. Resuming...")
+        # Calendar inserts that are ready to go share batch requests instead of
+        # one round trip each; everything else goes through the job queue.
+        sync = settings_service.calendar_sync_enabled()
+        batchable = [t for t in queued_tasks if sync and t.get("event_details") and is_calendar_request(t["original_request"])]
+        for task in queued_tasks:
+            if task not in batchable:
+                # Already-pending jobs are ignored by submit, and the lease
+                # stops a task that is mid-run from starting again.
+                jobs.submit(task["id"])
+        if batchable:
+            execute_calendar_batch(batchable)
+
+# Set by the connectivity monitor on reconnect to wake the queue monitor immediately
+reconnected = threading.Event()
 
 def monitor_internet_queue():
-    """Global thread that checks for internet and resumes queued tasks."""
+    """Global thread that resumes queued tasks.
+
+    Reconnects are pushed by the connectivity monitor, so the queue drains as soon
+    as we're back online. The slow sweep only catches tasks parked while online.
+    """
     logging.info("Starting Internet Monitor Thread")
+    connectivity_service.monitor.subscribe(lambda online: online and reconnected.set())
     while True:
         try:
-            time.sleep(10) # Check every 10 seconds
-            
+            reconnected.wait(MONITOR_SWEEP_SECONDS)
+            reconnected.clear()
             if check_internet():
-                tasks = load_tasks()
-                queued_tasks = [t for t in tasks if t.get("status") == "waiting_for_internet"]
-                
-                if queued_tasks:
-                    logging.info(f"Monitor: Found {len(queued_tasks)} queued tasks. Resuming...")
-                    for task in queued_tasks:
-                        # Spawn a thread so we don't block the monitor
-                        # Pass requires_internet=True (or read from task) because if it was queued, it likely needs internet
-                        # But safer to read from task if property exists
-                        req_net = task.get("requires_internet", True)
-                        
-                        threading.Thread(
-                            target=execute_task_logic, 
-                            args=(task["id"], task["original_request"], None, req_net) 
-                        ).start()
+                resume_waiting_tasks()
         except Exception as e:
             logging.error(f"Monitor Thread Error: {e}")
 
+def recover_interrupted_tasks():
+    """Re-queues the jobs the process had pending or running when it last stopped.
+
+    The job queue only lives in memory; the store is its durable record. A task
+    still "planned" never finished executing (queued, delayed, in backoff or
+    waiting on its extract stage) and one "executing" was cut off, so both are
+    submitted again. Any lease still on disk belongs to the previous process,
+    so it is dropped. Tasks still "planning" lost their plan generation with it
+    and are marked failed.
+    """
+    store.clear_leases()
+    tasks = load_tasks()
+    interrupted = [t for t in tasks if t.get("status") in ("planned", "executing")]
+    for task in interrupted:
+        jobs.submit(task["id"])
+    if interrupted:
+        logging.info(f"Recovered {len(interrupted)} interrupted tasks")
+    unplanned = [t for t in tasks if t.get("status") == "planning"]
+    for task in unplanned:
+        mutate_task(task["id"], lambda t: {"status": "error", "plan": t["plan"] + "\n\n❌ Planning was interrupted by a restart."})
+    if unplanned:
+        logging.info(f"Marked {len(unplanned)} tasks interrupted while planning as failed")
+
+recover_interrupted_tasks()
+
 # Start the monitor thread
+connectivity_service.monitor.start()
+retention.start()
+if prompts.PREWARM:
+    prompts.prewarm(ollama_client.client, [
+        (FAST_MODEL, "plan"), (FAST_MODEL, "internet_check"), (FAST_MODEL, "internet_check_batch"), (FAST_MODEL, "extract_title"),
+        (SMART_MODEL, "plan"), (SMART_MODEL, "extract_event"),
+    ])
 threading.Thread(target=monitor_internet_queue, daemon=True).start()
 
 def choose_model(text: str) -> str:
@@ -405,8 +580,7 @@ def choose_model(text: str) -> str:
     if len(text) > 120:
         return SMART_MODEL
     
-    keywords = ["plan", "workflow", "steps", "analyze", "after that", "then"]
-    if any(k in text.lower() for k in keywords):
+    if intent_router.router.has(text, "smart_model"):
         return SMART_MODEL
         
     return FAST_MODEL
@@ -414,105 +588,245 @@ def choose_model(text: str) -> str:
 class AuthCode(BaseModel):
     code: str
 
+@app.on_event("shutdown")
+async def close_clients():
+    await ollama_client.client.aclose()
+
 @app.post("/auth/google")
-def google_auth(auth_data: AuthCode):
+async def google_auth(auth_data: AuthCode):
     try:
-        return auth_service.exchange_code_for_token(auth_data.code)
+        return await run_in(google_executor, auth_service.exchange_code_for_token, auth_data.code)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/auth/status")
-def auth_status():
+async def auth_status():
     return {"connected": auth_service.is_connected()}
 
 @app.get("/auth/user")
-def get_user():
-    info = auth_service.get_user_info()
+async def get_user():
+    info = await run_in(google_executor, auth_service.get_user_info)
     if not info:
         raise HTTPException(status_code=401, detail="Not connected")
     return info
 
 @app.post("/auth/logout")
-def logout():
-    auth_service.revoke_credentials()
+async def logout():
+    await run_in(google_executor, auth_service.revoke_credentials)
     return {"status": "logged_out"}
 
 @app.get("/settings")
-def get_settings():
-    return settings_service.load_settings()
+async def get_settings():
+    return await run_in(io_executor, settings_service.load_settings)
 
 @app.post("/settings")
-def update_settings(update: SettingUpdate):
-    return settings_service.update_setting(update.key, update.value)
+async def update_settings(update: SettingUpdate):
+    return await run_in(io_executor, settings_service.update_setting, update.key, update.value)
+
+@app.get("/ollama/metrics")
+async def get_ollama_metrics():
+    return {**ollama_client.client.metrics(), "templates": prompts.stats(),
+            "batching": {"internet_check": internet_batcher.stats()}}
+
+@app.get("/connectivity")
+async def get_connectivity():
+    return {"online": connectivity_service.monitor.online}
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    return jobs.stats()
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return llm_cache.all_stats()
+
+def collect_app_metrics():
+    """Gauges and counters for /metrics from the components' own stats."""
+    ollama = ollama_client.client.metrics()
+    models = ollama["models"].items()
+    yield "agent_ollama_queue_depth", "gauge", "Requests waiting for an Ollama slot.", [({}, ollama["queue_depth"])]
+    yield "agent_ollama_in_flight", "gauge", "Ollama requests running.", [({"model": m}, s["in_flight"]) for m, s in models]
+    for key in ("requests", "errors", "coalesced"):
+        yield f"agent_ollama_{key}_total", "counter", f"Ollama {key} by model.", [({"model": m}, s[key]) for m, s in models]
+
+    job_stats = jobs.stats()
+    for key in ("queue_depth", "ready", "running"):
+        yield f"agent_jobs_{key}", "gauge", f"Job queue {key.replace('_', ' ')}.", [({}, job_stats[key])]
+    for key in ("submitted", "completed", "parked", "retried", "failed", "skipped"):
+        yield f"agent_jobs_{key}_total", "counter", f"Jobs {key}.", [({}, job_stats.get(key))]
+
+    caches = llm_cache.all_stats().items()
+    yield "agent_cache_entries", "gauge", "LLM cache entries.", [({"cache": n}, c["entries"]) for n, c in caches]
+    yield "agent_cache_hits_total", "counter", "LLM cache hits.", [({"cache": n}, c["hits"]) for n, c in caches]
+    yield "agent_cache_misses_total", "counter", "LLM cache misses.", [({"cache": n}, c["misses"]) for n, c in caches]
+
+    yield "agent_online", "gauge", "1 if the internet is reachable.", [({}, 1 if connectivity_service.monitor.online else 0)]
+    yield "agent_tasks", "gauge", "Tasks in the store.", [({}, len(store))]
+    yield "agent_task_store_revision", "counter", "Task store revision.", [({}, store.revision)]
+    yield "agent_tasks_archived_total", "counter", "Tasks moved to the archive.", [({}, retention.stats["archived"])]
+    yield "agent_retention_errors_total", "counter", "Failed retention runs.", [({}, retention.stats["errors"])]
+    yield "agent_task_event_subscribers", "gauge", "Open task event streams.", [({}, task_events.broker.subscriber_count)]
+
+tracing.add_collector(collect_app_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of every histogram, counter and gauge."""
+    return Response(tracing.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/traces")
+async def get_traces(limit: int = Query(50, ge=1, le=tracing.TRACE_HISTORY)):
+    """Most recent request/job traces with their spans, newest first."""
+    return tracing.recent_traces(limit)
 
 @app.post("/test/calendar")
-def test_calendar():
-    return calendar_service.create_test_event()
+async def test_calendar():
+    return await run_in(google_executor, calendar_service.create_test_event)
 
 def analyze_internet_requirement(text: str) -> bool:
-    """Uses LLM to decide if a request requires internet."""
-    lowered = text.lower()
-    
-    # 1. STRICT OVERRIDE: Certain keywords ALWAYS mean internet.
+    """Decides if a request requires internet: keywords, then the local classifier, then the LLM."""
+    # 1. STRICT OVERRIDE: Certain keywords ALWAYS mean internet ("internet" in intents.json).
     # Don't trust the AI to not overthink it.
-    strict_keywords = ["news", "weather", "stock", "price of", "current event", "latest", "bse", "nse", "crypto", "bitcoin"]
-    if any(k in lowered for k in strict_keywords):
-        logging.info(f"Internet Check: Keyword '{next(k for k in strict_keywords if k in lowered)}' found. strict=True")
+    strict = intent_router.router.match(text).get("internet")
+    if strict:
+        logging.info(f"Internet Check: Keyword '{strict[0]}' found. strict=True")
+        internet_classifier.log_decision(text, True, "keyword")
         return True
 
+    # 2. Local classifier (trained from logged decisions), when one is installed and sure
+    prediction = internet_classifier.classify(text)
+    if prediction and prediction[1] >= internet_classifier.MIN_CONFIDENCE:
+        logging.info(f"Internet Check: classifier says {prediction[0]} ({prediction[1]:.2f})")
+        return prediction[0]
+
+    return llm_internet_requirement(text)
+
+def llm_internet_requirement(text: str) -> bool:
+    """Uses LLM to decide if a request requires internet."""
+    cache = llm_cache.get_cache("internet_requirement")
+    cache_key = llm_cache.make_key(llm_cache.normalize_text(text), FAST_MODEL)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logging.info(f"Internet Check: cache hit ({cached})")
+        return cached
+
     try:
-        # Improved prompt to be more aggressive about needing internet for info retrieval
-        prompt = f"""
-        [INST]
-        You are a classifier that determines if a user request requires external tools/internet to be answered *accurately* and *fully*.
-        
-        Rules:
-        1. If the user asks for "news", "weather", "stocks", "sports scores", or "current events", answer YES.
-        2. If the user asks for specific facts that might be outdated in your training data, answer YES.
-        3. If the user asks for a creative task (poem, email, code) that relies on internal knowledge, answer NO.
-        4. If the user asks "how to" do something general (e.g. "how to tie a tie"), answer NO.
-        5. If the user asks "what is the latest...", answer YES.
-
-        Request: "{text}"
-        
-        Does this request require real-time internet access? Answer ONLY "YES" or "NO".
-        [/INST]
-        """
-        # Use FAST_MODEL for speed
-        response = call_ollama(prompt, model=FAST_MODEL)
-        
-        logging.info(f"Internet Check AI Response: {response}")
-        
-        # Check for YES
-        if "YES" in response.upper():
-            return True
-        return False
+        # Checks arriving together share one model call (see classify_internet_batch)
+        decision, answered = internet_batcher(text)
+        if answered:
+            cache.put(cache_key, decision)
+            internet_classifier.log_decision(text, decision, "llm")
+        return decision
     except Exception as e:
         logging.error(f"AI Internet Check failed: {e}")
         # Fallback to general keywords
-        keywords = ["research", "search", "find", "who", "what", "where"]
-        return any(k in lowered for k in keywords)
+        return intent_router.router.has(text, "internet_fallback")
+
+def ask_internet_requirement(text: str) -> tuple:
+    """One internet check, one call. Returns (decision, whether the model actually answered)."""
+    prompt = prompts.render("internet_check", text=text)
+    # Use FAST_MODEL for speed
+    response = call_ollama(prompt, model=FAST_MODEL)
+
+    logging.info(f"Internet Check AI Response: {response}")
+
+    # Check for YES
+    return "YES" in response.upper(), not response.startswith("Error")
+
+def classify_internet_batch(texts: list) -> list:
+    """Answers a micro-batch of internet checks with one numbered prompt; (decision, answered) per text.
+
+    A batch of one keeps the single-request prompt. If the batched answer
+    doesn't line up with the requests, each one is asked on its own, all at once.
+    """
+    unique = list(dict.fromkeys(texts))
+    if len(unique) == 1:
+        return [ask_internet_requirement(unique[0])] * len(texts)
+    numbered = "\n".join(f'        {i}. "{text}"' for i, text in enumerate(unique, 1))
+    prompt = prompts.render("internet_check_batch", requests=numbered)
+    raw = call_ollama_json(prompt, structured_output.INTERNET_ANSWERS_SCHEMA, model=FAST_MODEL,
+                           max_tokens=8 * len(unique) + 16)
+    parsed = structured_output.validate(structured_output.InternetAnswers, raw)
+    if parsed is None or len(parsed["answers"]) != len(unique):
+        logging.warning(f"Batched internet check did not answer all {len(unique)} requests, asking one by one")
+        answers = dict(zip(unique, internet_fallback_pool.map(ask_internet_requirement, unique)))
+    else:
+        logging.info(f"Internet Check AI Response ({len(unique)} requests): {parsed['answers']}")
+        answers = {text: (answer == "YES", True) for text, answer in zip(unique, parsed["answers"])}
+    return [answers[text] for text in texts]
+
+# Single-request fallback for malformed batch answers. Its own pool: the batch
+# runs on behalf of stage threads that are waiting on it.
+internet_fallback_pool = ThreadPoolExecutor(max_workers=INTERNET_BATCH_MAX, thread_name_prefix="internet-fallback")
+
+internet_batcher = micro_batch.MicroBatcher(
+    classify_internet_batch, "internet_check", max_batch=INTERNET_BATCH_MAX,
+    max_wait=INTERNET_BATCH_WAIT_MS / 1000, concurrency=ollama_client.client.limiter.limit)
+
+# Request pipeline stages (classify, extract) run on this pool; execution runs on the job queue.
+# The plan is generated on the event loop with the async Ollama client.
+llm_stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-stage")
+
+def plan_prompt(text: str) -> str:
+    return prompts.render("plan", text=text)
+
+def prepare_event_details(text: str, client_time: str = None, extracted_time: str = None):
+    """Extract stage: runs ahead of execution for calendar requests (None otherwise)."""
+    if not is_calendar_request(text) or not settings_service.calendar_sync_enabled():
+        return None
+    try:
+        return extract_event_details(text, client_time_str=client_time, extracted_time_override=extracted_time)
+    except Exception as e:
+        # Execution extracts again if this comes back empty
+        logging.error(f"Early extraction failed: {e}")
+        return None
+
+def start_pipeline(input: UserInput) -> task_pipeline.Pipeline:
+    """Starts the stages that only need the request itself: classify and extract.
+
+    The caller generates the plan meanwhile, and schedule_execution adds dispatch
+    once the task has been saved.
+    """
+    pipeline = task_pipeline.Pipeline(llm_stage_pool)
+    pipeline.add("classify", lambda: analyze_internet_requirement(input.text))
+    pipeline.add("extract", lambda: prepare_event_details(input.text, input.client_time, input.extracted_time))
+    return pipeline
+
+def schedule_execution(pipeline: task_pipeline.Pipeline, task_id: str):
+    """Dispatches the saved task as soon as its extract stage is done."""
+    def dispatch(extract):
+        store.update(task_id, event_details=extract, timings=dict(pipeline.timings))
+        dispatch_task(task_id)
+    pipeline.add("dispatch", dispatch, deps=("extract",))
 
 @app.post("/agent")
-def agent(input: UserInput, background_tasks: BackgroundTasks):
+async def agent(input: UserInput):
     logging.info(f"Received Agent Request: {input.text} | Client Time: {input.client_time} | Extracted Time: {input.extracted_time}")
     
     # 0. Choose Model
     selected_model = choose_model(input.text)
     
-    # 1. Generate plan with Ollama
-    prompt = f"Break this request into steps. Keep it very brief and concise (under 100 words):\n{input.text}"
-    plan_text = call_ollama(prompt, model=selected_model)
-    
-    # 2. Check for errors
+    # 1. Generate plan, check if internet is required (AI Classification) and, for
+    # calendar requests, extract event details. All only depend on the request, so
+    # they run concurrently; the response waits for plan and classify only.
+    pipeline = start_pipeline(input)
+    plan_start = time.perf_counter()
+    with tracing.span("stage.plan"):
+        plan_text = await call_ollama_async(plan_prompt(input.text), model=selected_model)
+    pipeline.timings["plan"] = round((time.perf_counter() - plan_start) * 1000, 1)
+
+    # 2. Check for errors; without a plan there is no task, so classify and extract can stop
     if "Error connecting" in plan_text:
-         return {"plan": plan_text, "status": "error"}
-    
-    # 3. Check if internet is required (AI Classification)
-    requires_internet = analyze_internet_requirement(input.text)
+         pipeline.cancel()
+         return {"plan": plan_text, "status": "error", "timings": dict(pipeline.timings)}
+
+    requires_internet = await pipeline.result_async("classify")
+    timings = dict(pipeline.timings)
+    logging.info(f"Agent stage timings (ms): {timings}")
+
     logging.info(f"Task '{input.text}' requires internet: {requires_internet}")
 
-    # 4. Create Task object
+    # 3. Create Task object
     new_task = {
         "id": str(uuid.uuid4()),
         "original_request": input.text,
@@ -520,24 +834,119 @@ def agent(input: UserInput, background_tasks: BackgroundTasks):
         "status": "planned",
         "requires_internet": requires_internet,
         "model_used": selected_model,
-        "extracted_time": input.extracted_time
+        "extracted_time": input.extracted_time,
+        "client_time": input.client_time,
+        "timings": timings
     }
 
     # 4. Save to disk
-    save_task(new_task)
-
-    # Start background task simulation
-    background_tasks.add_task(
-        background_task_simulation, 
-        new_task["id"], 
-        requires_internet, 
-        input.text,
-        input.client_time,
-        input.extracted_time # Pass the extracted time
-    )
+    await run_in(io_executor, save_task, new_task)
+
+    # 5. Execute as soon as extraction (if any) is done
+    schedule_execution(pipeline, new_task["id"])
 
     return new_task
 
+def _stream_event(event: str, data: dict, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+@app.post("/agent/stream")
+async def agent_stream(input: UserInput, format: str = "ndjson"):
+    """Streaming variant of /agent.
+
+    Emits a `task` event with the new task id, one `token` event per plan chunk
+    (or an `error` event if generation fails, possibly after some tokens), then
+    a `done` event carrying the final task record. `format` is "ndjson"
+    (default) or "sse". While nothing else is sent (waiting for an Ollama slot
+    or the classify stage) a keepalive goes out every STREAM_KEEPALIVE_SECONDS:
+    a `ping` event in NDJSON, a comment line in SSE.
+
+    The plan is generated by a background task, so a client that disconnects
+    doesn't leave the task half planned: it is still saved and dispatched.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    logging.info(f"Received Streaming Agent Request: {input.text} | Client Time: {input.client_time} | Extracted Time: {input.extracted_time}")
+
+    selected_model = choose_model(input.text)
+    task_id = str(uuid.uuid4())
+    await run_in(io_executor, save_task, {
+        "id": task_id,
+        "original_request": input.text,
+        "plan": "",
+        "status": "planning",
+        "requires_internet": False,
+        "model_used": selected_model,
+        "extracted_time": input.extracted_time,
+        "client_time": input.client_time
+    })
+
+    # Classify and extract don't depend on the plan, so they run while tokens stream.
+    pipeline = start_pipeline(input)
+    queue = asyncio.Queue()
+    planner = asyncio.create_task(plan_streamed_task(input, selected_model, task_id, pipeline, queue))
+    planning_tasks.add(planner)
+    planner.add_done_callback(planning_tasks.discard)
+
+    async def events():
+        yield _stream_event("task", {"id": task_id}, format)
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n" if format == "sse" else _stream_event("ping", {}, format)
+                continue
+            yield _stream_event(event, data, format)
+            if event == "done":
+                return
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+# Streamed plans in progress; holding a reference keeps them alive after their client is gone
+planning_tasks = set()
+
+async def plan_streamed_task(input: UserInput, model: str, task_id: str, pipeline: task_pipeline.Pipeline,
+                             queue: asyncio.Queue):
+    """Generates, saves and dispatches a streamed task, putting its events on `queue`.
+
+    Runs whether or not anyone still reads the queue. The task always leaves
+    "planning": planned and dispatched, or error.
+    """
+    timings = pipeline.timings
+    try:
+        plan_start = time.perf_counter()
+        chunks = []
+        try:
+            async for token in call_ollama_stream(plan_prompt(input.text), model=model):
+                chunks.append(token)
+                queue.put_nowait(("token", {"text": token}))
+        except ollama_client.OllamaError as e:
+            # Possibly mid-plan: the tokens already sent are dropped with the task
+            pipeline.cancel()
+            message = f"Error connecting to Ollama: {e}"
+            await run_in(io_executor, update_task_status, task_id, "error", plan_update=message)
+            queue.put_nowait(("error", {"message": message}))
+            return
+        plan_text = "".join(chunks)
+        pipeline.timings["plan"] = round((time.perf_counter() - plan_start) * 1000, 1)
+
+        requires_internet = await pipeline.result_async("classify")
+        timings = dict(pipeline.timings)
+        logging.info(f"Agent stream stage timings (ms): {timings}")
+        logging.info(f"Task '{input.text}' requires internet: {requires_internet}")
+        await run_in(io_executor, store.update, task_id, plan=plan_text, status="planned",
+                     requires_internet=requires_internet, timings=timings)
+        schedule_execution(pipeline, task_id)
+    except Exception as e:
+        logging.error(f"Streamed planning for task {task_id} failed: {e}")
+        pipeline.cancel()
+        await run_in(io_executor, update_task_status, task_id, "error", plan_update=f"❌ Planning failed: {e}")
+    finally:
+        queue.put_nowait(("done", {"task": task_store.public_view(get_task_by_id(task_id)), "timings": dict(timings)}))
+
 @app.post("/tasks/{task_id}/resume")
 def resume_task(task_id: str, req: ResumeRequest, background_tasks: BackgroundTasks):
     # This endpoint is kept for compatibility but effectively deprecated for search
@@ -549,30 +958,129 @@ class CompleteTaskRequest(BaseModel):
 
 @app.post("/tasks/{task_id}/complete")
 def complete_task(task_id: str, req: CompleteTaskRequest):
-    update_task_status(task_id, "completed", plan_update=req.plan_update)
-    
-    # Update sources if provided
-    tasks = load_tasks()
-    for task in tasks:
-        if task["id"] == task_id:
-            if req.sources:
-                task["sources"] = req.sources
-            save_task(task)
-            break
-            
+    def complete(task):
+        fields = {"status": "completed"}
+        if req.plan_update:
+            fields["plan"] = req.plan_update
+        if req.sources:
+            fields["sources"] = req.sources
+        return fields
+
+    mutate_task(task_id, complete)
     return {"status": "success"}
 
+def _set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # Browsers then revalidate every poll with If-None-Match instead of refetching
+    response.headers["Cache-Control"] = "no-cache"
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")])
+
+def _parse_time_param(name: str, value: Optional[str]):
+    if value is not None and task_store._parse_iso(value) is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp")
+
 @app.get("/tasks")
-def get_tasks():
-    return load_tasks()
+def get_tasks(
+    request: Request,
+    response: Response,
+    status: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    since: Optional[int] = None,
+):
+    """Lists tasks.
+
+    With no parameters this returns the plain list of all tasks (legacy shape).
+    Otherwise it returns {"tasks", "revision", "next_cursor"}:
+    - status (repeatable), created_after/created_before: filters
+    - cursor/limit: pagination; pass back next_cursor for the following page
+    - since=<revision>: only tasks changed after that revision
+    Responses carry an ETag; a matching If-None-Match returns 304 without touching the store.
+    """
+    _parse_time_param("created_after", created_after)
+    _parse_time_param("created_before", created_before)
+    etag = f'"{store.revision}-{zlib.crc32(str(request.query_params).encode()):x}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    _set_etag(response, etag)
+
+    if not request.query_params:
+        return [task_store.public_view(t) for t in load_tasks()]
+
+    revision = store.revision
+    if since is not None:
+        tasks = store.changed_since(since)
+        if status:
+            tasks = [t for t in tasks if t.get("status") in status]
+        return {"tasks": [task_store.public_view(t) for t in tasks], "revision": revision, "next_cursor": None}
+
+    tasks, next_cursor = store.query(status=status, created_after=created_after, created_before=created_before,
+                                     cursor=cursor, limit=limit)
+    return {"tasks": [task_store.public_view(t) for t in tasks], "revision": revision, "next_cursor": next_cursor}
+
+@app.get("/tasks/archive")
+def get_archived_tasks(
+    status: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    q: Optional[str] = None,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Searches tasks moved out by retention, oldest first: {"tasks", "next_cursor"}.
+
+    Only the day segments within created_after/created_before are read; `q`
+    matches the request or plan text.
+    """
+    _parse_time_param("created_after", created_after)
+    _parse_time_param("created_before", created_before)
+    with tracing.span("archive.query"):
+        tasks, next_cursor = archive.query(status, created_after, created_before, q, cursor, limit)
+    return {"tasks": tasks, "next_cursor": next_cursor}
+
+@app.post("/tasks/archive/run")
+def run_retention():
+    """Applies the retention limits now instead of waiting for the next sweep."""
+    return {"archived": retention.run(), "live": len(store)}
+
+def _resume_revision(request: Request, since: Optional[int]) -> Optional[int]:
+    """Resume point: explicit ?since= wins, else the EventSource Last-Event-ID header."""
+    if since is not None:
+        return since
+    last_event_id = request.headers.get("last-event-id")
+    return int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+def _event_response(body) -> StreamingResponse:
+    return StreamingResponse(body, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/tasks/events")
+async def task_events_all(request: Request, since: Optional[int] = None):
+    """Server-Sent Events for every task change. Event ids are task revisions."""
+    return _event_response(task_events.event_stream(store, since=_resume_revision(request, since)))
+
+@app.get("/tasks/{task_id}/events")
+async def task_events_one(task_id: str, request: Request, since: Optional[int] = None):
+    """Server-Sent Events for one task; starts with its current state."""
+    if get_task_by_id(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return _event_response(task_events.event_stream(store, task_id=task_id, since=_resume_revision(request, since)))
 
 @app.get("/tasks/{task_id}")
-def get_task(task_id: str):
-    tasks = load_tasks()
-    task = next((t for t in tasks if t["id"] == task_id), None)
+def get_task(task_id: str, request: Request, response: Response):
+    task = get_task_by_id(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    etag = f'"{task.get("revision", 0)}"'
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    _set_etag(response, etag)
+    return task_store.public_view(task)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import tracing
+
+BATCH_SIZE = tracing.histogram("agent_batch_size", "Items per micro-batch.", ("batcher",),
+                               buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32))
+
+
+class MicroBatcher:
+    """Groups calls that arrive close together into one `fn(items)` call.
+
+    `fn` takes a list of items and returns a list of results in the same
+    order. A batch closes when it holds `max_batch` items or `max_wait`
+    seconds after its first item arrived, whichever comes first. At most
+    `concurrency` batches run at once; while they are all busy new items keep
+    queueing, so the next batch comes out fuller the more loaded we are.
+    """
+
+    def __init__(self, fn, name: str, max_batch: int = 8, max_wait: float = 0.005, concurrency: int = 2):
+        self.fn = fn
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = deque()  # (item, Future)
+        self._cond = threading.Condition()
+        self._slots = threading.Semaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"batch-{name}")
+        self._thread = None
+        self._stats = {"items": 0, "batches": 0, "largest": 0, "errors": 0}
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+            self._queue.append((item, future))
+            self._cond.notify()
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        while True:
+            self._slots.acquire()  # held by the batch from here until it has run
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            try:
+                self._pool.submit(self._run, batch)
+            except RuntimeError as e:
+                # The pool is gone (interpreter shutdown): fail the callers instead of leaving them waiting
+                self._slots.release()
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def _run(self, batch: list):
+        try:
+            BATCH_SIZE.observe(len(batch), self.name)
+            with self._cond:
+                self._stats["items"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["largest"] = max(self._stats["largest"], len(batch))
+            try:
+                results = self.fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"{len(results)} results for {len(batch)} items")
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                logging.error(f"Batch {self.name} ({len(batch)} items) failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        return {
+            **stats,
+            "queued": queued,
+            "avg_batch": round(stats["items"] / batches, 2) if batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
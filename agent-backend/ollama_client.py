@@ -0,0 +1,405 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "2"))
+OLLAMA_TIMEOUT = 300
+# How long Ollama keeps a model loaded after a request ("30m", "-1" = forever); every request renews it
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Lower value = served first. User-facing calls jump ahead of background work.
+PRIORITY_USER = 0
+PRIORITY_BACKGROUND = 10
+
+
+class OllamaError(Exception):
+    pass
+
+
+class PriorityLimiter:
+    """Concurrency cap whose waiters are released in (priority, arrival) order.
+
+    Threads (`acquire`) and coroutines (`acquire_async`) share the same slots.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, wake)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority: int = PRIORITY_USER):
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            event = threading.Event()
+            heapq.heappush(self._waiters, (priority, next(self._seq), event.set))
+        # The releasing thread hands its slot over directly, so _active is already counted.
+        event.wait()
+
+    async def acquire_async(self, priority: int = PRIORITY_USER):
+        """acquire() for coroutines: waits without holding a thread."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            granted = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(hand_over)
+
+            def hand_over():
+                if granted.cancelled():
+                    self.release()  # the waiter is gone; pass the slot on
+                else:
+                    granted.set_result(None)
+
+            entry = (priority, next(self._seq), wake)
+            heapq.heappush(self._waiters, entry)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = entry in self._waiters
+                if queued:  # not woken yet: just leave the queue
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+            if not queued and granted.done() and not granted.cancelled():
+                self.release()  # the slot arrived just as we were cancelled
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                _, _, wake = heapq.heappop(self._waiters)
+                wake()
+            else:
+                self._active -= 1
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class ModelStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.latencies_ms = deque(maxlen=500)
+        self.queue_waits_ms = deque(maxlen=500)
+
+    def incr(self, field: str, delta: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def snapshot(self) -> dict:
+        def percentile(values, pct):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "latency_ms_p50": percentile(self.latencies_ms, 50),
+            "latency_ms_p95": percentile(self.latencies_ms, 95),
+            "queue_wait_ms_p50": percentile(self.queue_waits_ms, 50),
+            "queue_wait_ms_p95": percentile(self.queue_waits_ms, 95),
+        }
+
+
+class OllamaClient:
+    """Shared client for the local Ollama server.
+
+    - One pooled keep-alive `requests.Session` for every call, and an
+      `httpx.AsyncClient` for the async variants (`agenerate`, `astream`)
+      used by request handlers.
+    - At most `max_concurrency` generations in flight, sync and async together;
+      the rest queue by priority.
+    - Identical in-flight non-streaming requests, sync or async, share a
+      single generation.
+    - Per-model queue depth / latency stats via `metrics()`.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_URL, max_concurrency: int = OLLAMA_MAX_CONCURRENCY):
+        self.base_url = base_url.rstrip("/")
+        self._pool_size = max(4, max_concurrency * 2)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiter = PriorityLimiter(max_concurrency)
+        self.keep_alive = OLLAMA_KEEP_ALIVE
+        self._async_client = None
+        self._async_loop = None
+        self._inflight = {}  # coalescing key -> Future, shared by generate() and agenerate()
+        self._inflight_lock = threading.Lock()
+        self._leaders = set()  # running agenerate() requests, referenced until done
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _model_stats(self, model: str) -> ModelStats:
+        with self._stats_lock:
+            if model not in self._stats:
+                self._stats[model] = ModelStats()
+            return self._stats[model]
+
+    def _acquire(self, model: str, priority: int):
+        stats = self._model_stats(model)
+        stats.incr("queued")
+        start = time.perf_counter()
+        try:
+            self.limiter.acquire(priority)
+        finally:
+            stats.incr("queued", -1)
+        stats.queue_waits_ms.append((time.perf_counter() - start) * 1000)
+        stats.incr("in_flight")
+
+    async def _acquire_async(self, model: str, priority: int):
+        stats = self._model_stats(model)
+        stats.incr("queued")
+        start = time.perf_counter()
+        try:
+            await self.limiter.acquire_async(priority)
+        finally:
+            stats.incr("queued", -1)
+        stats.queue_waits_ms.append((time.perf_counter() - start) * 1000)
+        stats.incr("in_flight")
+
+    def _release(self, model: str):
+        self._model_stats(model).incr("in_flight", -1)
+        self.limiter.release()
+
+    def _http_async(self) -> httpx.AsyncClient:
+        """The AsyncClient for the running event loop (connections can't cross loops)."""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            if self._async_client is not None:
+                self._close_async_client(self._async_client, self._async_loop)
+            limits = httpx.Limits(max_connections=self._pool_size, max_keepalive_connections=self._pool_size)
+            self._async_client = httpx.AsyncClient(timeout=OLLAMA_TIMEOUT, limits=limits)
+            self._async_loop = loop
+        return self._async_client
+
+    @staticmethod
+    def _close_async_client(client: httpx.AsyncClient, loop):
+        """Closes a replaced AsyncClient on the loop it belongs to, if that loop can still run it."""
+        if loop.is_closed():
+            logging.warning("Ollama AsyncClient outlived its event loop; its connections can't be closed")
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        except RuntimeError as e:
+            logging.warning(f"Could not close the previous Ollama AsyncClient: {e}")
+
+    async def aclose(self):
+        """Closes the AsyncClient of the running loop (call on shutdown)."""
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            client, self._async_client, self._async_loop = self._async_client, None, None
+            await client.aclose()
+
+    def _payload(self, model: str, prompt: str, stream: bool, options: dict) -> dict:
+        keep_alive = self.keep_alive
+        if keep_alive.lstrip("-").isdigit():
+            keep_alive = int(keep_alive)  # Ollama reads a bare string as a duration and wants units
+        return {"model": model, "prompt": prompt, "stream": stream, "keep_alive": keep_alive, **options}
+
+    def _join(self, payload: dict):
+        """(key, future, leader) for a non-streaming request: followers share the leader's future."""
+        key = json.dumps(payload, sort_keys=True)
+        with self._inflight_lock:
+            leader = key not in self._inflight
+            if leader:
+                self._inflight[key] = Future()
+            return key, self._inflight[key], leader
+
+    def _settle(self, key: str, future: Future, result=None, error: Exception = None):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error if isinstance(error, OllamaError) else OllamaError(str(error)))
+
+    def generate(self, prompt: str, model: str, priority: int = PRIORITY_USER, **options) -> dict:
+        """Non-streaming /api/generate. Returns Ollama's JSON body; raises OllamaError."""
+        payload = self._payload(model, prompt, False, options)
+        key, future, leader = self._join(payload)
+        if not leader:
+            self._model_stats(model).incr("coalesced")
+            return future.result()
+
+        try:
+            self._settle(key, future, self._post(payload, model, priority))
+        except Exception as e:
+            self._settle(key, future, error=e)
+        return future.result()
+
+    def _post(self, payload: dict, model: str, priority: int) -> dict:
+        stats = self._model_stats(model)
+        self._acquire(model, priority)
+        start = time.perf_counter()
+        stats.incr("requests")
+        try:
+            res = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT)
+            if not res.ok:
+                stats.incr("errors")
+                raise OllamaError(f"Status {res.status_code}, Response: {res.text}")
+            try:
+                return res.json()
+            except json.JSONDecodeError:
+                stats.incr("errors")
+                raise OllamaError("Failed to parse Ollama response")
+        except requests.RequestException as e:
+            stats.incr("errors")
+            raise OllamaError(str(e))
+        finally:
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            self._release(model)
+
+    def stream(self, prompt: str, model: str, priority: int = PRIORITY_USER, **options):
+        """Streaming /api/generate. Yields parsed chunks; holds a slot until exhausted."""
+        stats = self._model_stats(model)
+        payload = self._payload(model, prompt, True, options)
+        self._acquire(model, priority)
+        start = time.perf_counter()
+        stats.incr("requests")
+        try:
+            with self.session.post(f"{self.base_url}/api/generate", json=payload, stream=True, timeout=OLLAMA_TIMEOUT) as res:
+                if not res.ok:
+                    stats.incr("errors")
+                    raise OllamaError(f"Status {res.status_code}, Response: {res.text}")
+                for line in res.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line)
+                    except json.JSONDecodeError:
+                        logging.error("Failed to parse Ollama stream chunk")
+                        continue
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+        except requests.RequestException as e:
+            stats.incr("errors")
+            raise OllamaError(str(e))
+        finally:
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            self._release(model)
+
+    async def agenerate(self, prompt: str, model: str, priority: int = PRIORITY_USER, **options) -> dict:
+        """Async generate(). Coalesces with identical in-flight requests, sync or async."""
+        payload = self._payload(model, prompt, False, options)
+        key, future, leader = self._join(payload)
+        if leader:
+            # Its own task, so a caller that goes away doesn't cancel the generation others wait on
+            task = asyncio.ensure_future(self._apost_shared(key, future, payload, model, priority))
+            self._leaders.add(task)
+            task.add_done_callback(self._leaders.discard)
+        else:
+            self._model_stats(model).incr("coalesced")
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def _apost_shared(self, key: str, future: Future, payload: dict, model: str, priority: int):
+        try:
+            result = await self._apost(payload, model, priority)
+        except asyncio.CancelledError:
+            self._settle(key, future, error=OllamaError("Request cancelled"))
+            raise
+        except Exception as e:
+            self._settle(key, future, error=e)
+        else:
+            self._settle(key, future, result)
+
+    async def _apost(self, payload: dict, model: str, priority: int) -> dict:
+        stats = self._model_stats(model)
+        await self._acquire_async(model, priority)
+        start = time.perf_counter()
+        stats.incr("requests")
+        try:
+            res = await self._http_async().post(f"{self.base_url}/api/generate", json=payload)
+            if res.is_error:
+                stats.incr("errors")
+                raise OllamaError(f"Status {res.status_code}, Response: {res.text}")
+            try:
+                return res.json()
+            except json.JSONDecodeError:
+                stats.incr("errors")
+                raise OllamaError("Failed to parse Ollama response")
+        except httpx.HTTPError as e:
+            stats.incr("errors")
+            raise OllamaError(str(e) or type(e).__name__)
+        finally:
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            self._release(model)
+
+    async def astream(self, prompt: str, model: str, priority: int = PRIORITY_USER, **options):
+        """Async stream(). Yields parsed chunks; holds a slot until exhausted or closed."""
+        stats = self._model_stats(model)
+        payload = self._payload(model, prompt, True, options)
+        await self._acquire_async(model, priority)
+        start = time.perf_counter()
+        stats.incr("requests")
+        try:
+            async with self._http_async().stream("POST", f"{self.base_url}/api/generate", json=payload) as res:
+                if res.is_error:
+                    stats.incr("errors")
+                    raise OllamaError(f"Status {res.status_code}, Response: {(await res.aread()).decode(errors='replace')}")
+                async for line in res.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line)
+                    except json.JSONDecodeError:
+                        logging.error("Failed to parse Ollama stream chunk")
+                        continue
+                    yield chunk
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPError as e:
+            stats.incr("errors")
+            raise OllamaError(str(e) or type(e).__name__)
+        finally:
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            self._release(model)
+
+    def warm(self, model: str, prompt: str = "") -> dict:
+        """Loads `model` at background priority; with a prompt, also leaves it in the KV cache."""
+        if not prompt:
+            return self.generate("", model, priority=PRIORITY_BACKGROUND)  # load only, no generation
+        return self.generate(prompt, model, priority=PRIORITY_BACKGROUND, options={"num_predict": 1})
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            models = {model: stats.snapshot() for model, stats in self._stats.items()}
+        return {
+            "max_concurrency": self.limiter.limit,
+            "queue_depth": self.limiter.waiting,
+            "models": models,
+        }
+
+
+client = OllamaClient()
@@ -0,0 +1,198 @@
+"""Prompt templates for the Ollama calls.
+
+Every template is a static prefix (instructions, rules, examples) followed by
+a short suffix holding the per-request values. Consecutive calls with the
+same template share the prefix token for token, so Ollama reuses the KV cache
+it computed for it and only evaluates the suffix. Keep anything that varies
+per request (user text, times) out of the prefix.
+
+`render()` returns a `Prompt`, a str that remembers its template, so
+main.call_ollama can attribute token counts and latency to it:
+agent_prompt_tokens_total / agent_prompt_seconds in /metrics, and `stats()`.
+"""
+import logging
+import os
+import threading
+
+import tracing
+
+PREWARM = os.environ.get("OLLAMA_PREWARM", "1") == "1"
+
+PROMPT_SECONDS = tracing.histogram(
+    "agent_prompt_seconds", "Ollama time per template and phase (load, prompt_eval, first_token, total).",
+    ("template", "phase"))
+PROMPT_TOKENS = tracing.counter("agent_prompt_tokens_total", "Tokens per template (prompt or completion).", ("template", "kind"))
+
+
+class Prompt(str):
+    template = None
+
+
+class PromptTemplate:
+    def __init__(self, name: str, prefix: str, suffix: str):
+        if "{" in prefix.replace("{{", "").replace("}}", ""):
+            raise ValueError(f"Template {name}: the prefix must be static")
+        self.name = name
+        self.prefix = prefix.replace("{{", "{").replace("}}", "}")
+        self.suffix = suffix
+
+    def render(self, **values) -> Prompt:
+        prompt = Prompt(self.prefix + self.suffix.format(**values))
+        prompt.template = self.name
+        return prompt
+
+
+TEMPLATES = {}
+
+
+def register(name: str, prefix: str, suffix: str) -> PromptTemplate:
+    TEMPLATES[name] = PromptTemplate(name, prefix, suffix)
+    return TEMPLATES[name]
+
+
+def render(name: str, **values) -> Prompt:
+    return TEMPLATES[name].render(**values)
+
+
+register("plan", "Break this request into steps. Keep it very brief and concise (under 100 words):\n", "{text}")
+
+_INTERNET_RULES = """
+        [INST]
+        You are a classifier that determines if a user request requires external tools/internet to be answered *accurately* and *fully*.
+
+        Rules:
+        1. If the user asks for "news", "weather", "stocks", "sports scores", or "current events", answer YES.
+        2. If the user asks for specific facts that might be outdated in your training data, answer YES.
+        3. If the user asks for a creative task (poem, email, code) that relies on internal knowledge, answer NO.
+        4. If the user asks "how to" do something general (e.g. "how to tie a tie"), answer NO.
+        5. If the user asks "what is the latest...", answer YES.
+
+"""
+
+register("internet_check", _INTERNET_RULES + """        Does the request below require real-time internet access? Answer ONLY "YES" or "NO".
+
+""", """        Request: "{text}"
+        [/INST]
+        """)
+
+# Several requests in one call (see main.classify_internet_batch); answered as {{"answers": [...]}}
+register("internet_check_batch", _INTERNET_RULES + """        Does each numbered request below require real-time internet access?
+        Reply with JSON: {{"answers": [...]}}, one "YES" or "NO" per request, in order.
+
+""", """{requests}
+        [/INST]
+        """)
+
+register("extract_title", """
+        [INST]
+        You are a JSON extractor.
+
+        Task: Extract the "summary" (Event Title) from the text. The start time is locked: copy it as given.
+
+        Output JSON:
+        {{
+            "summary": "Short event title",
+            "start_time": "<Locked Start Time>",
+            "duration_minutes": 30
+        }}
+
+""", """        Input: "{text}"
+        Locked Start Time: "{start_time}"
+
+        Response (JSON ONLY):
+        [/INST]
+        """)
+
+register("extract_event", """
+        [INST]
+        You are a precise JSON extractor. You do NOT write code. Do not explain.
+
+        Task: Extract event details from the user text.
+
+        Rules for Date Selection (Follow Hierarchy):
+        1. **Explicit Keyword "Today"**: You MUST use the "Current Date" given below. DO NOT shift to tomorrow, even if the time is in the past.
+        2. **Explicit Keyword "Tomorrow"**: Add 1 day to "Current Date".
+        3. **No Date Specified**: Assume "Today".
+        4. **Time Logic**: Only shift to tomorrow if the user literally says "tomorrow" or a specific future date.
+
+        Task Rules:
+        - "summary": Short title.
+        - "start_time": Exact ISO 8601 (YYYY-MM-DDTHH:MM:SS+HH:MM). Use User's Year/Month/Day.
+        - "duration_minutes": Default 30.
+
+""", """        User's Current Time: {current_time}
+        Current Date: {current_date}
+        User Request: "{text}"
+
+        Response (JSON ONLY):
+        [/INST]
+        """)
+
+
+# --- Stats ---
+
+_stats = {}  # template -> {"calls", "prompt_tokens", "completion_tokens", "seconds"}
+_stats_lock = threading.Lock()
+
+
+def record(prompt: str, data: dict, seconds: float, first_token_seconds: float = None):
+    """Records one call's Ollama counters (durations are in ns) against the prompt's template."""
+    name = getattr(prompt, "template", None) or "untemplated"
+    prompt_tokens = data.get("prompt_eval_count") or 0
+    completion_tokens = data.get("eval_count") or 0
+    PROMPT_TOKENS.inc(name, "prompt", amount=prompt_tokens)
+    PROMPT_TOKENS.inc(name, "completion", amount=completion_tokens)
+    PROMPT_SECONDS.observe(seconds, name, "total")
+    if data.get("load_duration") is not None:
+        PROMPT_SECONDS.observe(data["load_duration"] / 1e9, name, "load")
+    if data.get("prompt_eval_duration") is not None:
+        PROMPT_SECONDS.observe(data["prompt_eval_duration"] / 1e9, name, "prompt_eval")
+    if first_token_seconds is None and data.get("prompt_eval_duration") is not None:
+        # Non-streaming: the server's own load + prompt evaluation is the time to first token
+        first_token_seconds = ((data.get("load_duration") or 0) + data["prompt_eval_duration"]) / 1e9
+    if first_token_seconds is not None:
+        PROMPT_SECONDS.observe(first_token_seconds, name, "first_token")
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+        entry["seconds"] += seconds
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {
+            name: {
+                "calls": s["calls"],
+                "avg_prompt_tokens": round(s["prompt_tokens"] / s["calls"], 1),
+                "avg_completion_tokens": round(s["completion_tokens"] / s["calls"], 1),
+                "avg_latency_ms": round(s["seconds"] / s["calls"] * 1000, 1),
+            }
+            for name, s in _stats.items()
+        }
+
+
+# --- Warm-up ---
+
+def prewarm(client, pairs: list):
+    """Loads each model and evaluates its templates' prefixes, so the first real call skips both.
+
+    `pairs` are (model, template name). Runs in the background; failures
+    (Ollama not up yet) are only logged.
+    """
+    models = {}
+    for model, name in dict.fromkeys(pairs):  # FAST_MODEL and SMART_MODEL may be the same model
+        models.setdefault(model, []).append(name)
+
+    def warm():
+        for model, names in models.items():
+            try:
+                client.warm(model)
+                for name in names:
+                    client.warm(model, TEMPLATES[name].prefix)
+                logging.info(f"Prewarmed {model}: {', '.join(names)}")
+            except Exception as e:
+                logging.warning(f"Prewarming {model} failed: {e}")
+
+    threading.Thread(target=warm, name="prewarm", daemon=True).start()
@@ -1,33 +1,105 @@
 import json
+import logging
 import os
+import threading
 
-SETTINGS_FILE = "settings.json"
+from file_watch import FileWatch
+
+SETTINGS_FILE = os.environ.get("SETTINGS_FILE", "settings.json")
+RELOAD_CHECK_SECONDS = 2.0  # how often reads look at the file for outside edits
 
 DEFAULT_SETTINGS = {
     "calendar_sync_enabled": True
 }
 
+
+class Settings:
+    """Parsed settings.json kept in memory.
+
+    Reads come from the snapshot; the file is only re-read when its inode,
+    mtime or size changed (checked at most every RELOAD_CHECK_SECONDS), so
+    hand edits are still picked up. Updates are a locked read-modify-write
+    that replaces the file atomically (temp file + rename).
+    """
+
+    def __init__(self, path: str = SETTINGS_FILE, defaults: dict = None):
+        self.path = path
+        self.defaults = dict(defaults or DEFAULT_SETTINGS)
+        self._values = dict(self.defaults)
+        self._watch = FileWatch(path, RELOAD_CHECK_SECONDS)
+        self._lock = threading.Lock()
+
+    def _refresh(self, force: bool = False):
+        """Re-reads the file if it changed (force: check now). Call with the lock held."""
+        if not self._watch.changed(force):
+            return
+        if not self._watch.exists:
+            try:
+                self._write({**self.defaults, **self._values})
+            except OSError as e:
+                logging.error(f"Settings file {self.path} not written: {e}")
+            return
+        try:
+            with open(self.path) as f:
+                values = json.load(f)
+            if not isinstance(values, dict):
+                raise ValueError("not a JSON object")
+        except Exception as e:
+            logging.error(f"Settings file {self.path} not loaded, keeping the previous settings: {e}")
+            return
+        self._values = {**self.defaults, **values}
+
+    def _write(self, values: dict):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(values, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._values = {**self.defaults, **values}
+        self._watch.mark()
+
+    def all(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return dict(self._values)
+
+    def get(self, key: str, default=None):
+        if self._watch.due():
+            with self._lock:
+                self._refresh()
+        return self._values.get(key, default)
+
+    def get_bool(self, key: str) -> bool:
+        """Typed read: a non-bool value in the file falls back to the default."""
+        value = self.get(key)
+        if isinstance(value, bool):
+            return value
+        logging.warning(f"Setting {key}={value!r} is not a boolean, using the default")
+        return bool(self.defaults.get(key, False))
+
+    def update(self, key: str, value) -> dict:
+        with self._lock:
+            self._refresh(force=True)  # don't lose an edit made since the last check
+            self._write({**self._values, key: value})
+            return dict(self._values)
+
+
+settings = Settings()
+
+
 def load_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        save_settings(DEFAULT_SETTINGS)
-        return DEFAULT_SETTINGS
-    
-    try:
-        with open(SETTINGS_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return DEFAULT_SETTINGS
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=4)
+    return settings.all()
+
+def save_settings(values):
+    with settings._lock:
+        settings._write(values)
 
 def get_setting(key):
-    settings = load_settings()
     return settings.get(key, DEFAULT_SETTINGS.get(key))
 
 def update_setting(key, value):
-    settings = load_settings()
-    settings[key] = value
-    save_settings(settings)
-    return settings
+    return settings.update(key, value)
+
+def calendar_sync_enabled() -> bool:
+    return settings.get_bool("calendar_sync_enabled")
@@ -0,0 +1,113 @@
+"""Schema-constrained LLM output.
+
+The Pydantic models here are both the JSON schema handed to Ollama's `format`
+parameter (the server then only samples tokens that fit it) and the
+validation applied to what comes back. `JsonObjectReader` consumes the
+streamed tokens and reports the moment the top-level object closes, so the
+caller can stop generation there instead of waiting for the model to end.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from typing import List, Literal
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+EXTRACT_MAX_TOKENS = int(os.environ.get("EXTRACT_MAX_TOKENS", "128"))  # num_predict cap; the object is ~40 tokens
+
+
+class EventDetails(BaseModel):
+    summary: str = Field(min_length=1, max_length=200)
+    start_time: str = Field(description="ISO 8601 with offset, e.g. 2026-02-05T15:00:00+05:30")
+    duration_minutes: int = Field(default=30, ge=1, le=24 * 60)
+
+    @field_validator("summary")
+    @classmethod
+    def _strip(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("empty summary")
+        return value
+
+    @field_validator("start_time")
+    @classmethod
+    def _iso(cls, value: str) -> str:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))  # what calendar_service will parse
+        return value
+
+
+EVENT_DETAILS_SCHEMA = EventDetails.model_json_schema()
+
+
+class InternetAnswers(BaseModel):
+    answers: List[Literal["YES", "NO"]]
+
+
+INTERNET_ANSWERS_SCHEMA = InternetAnswers.model_json_schema()
+
+
+class JsonObjectReader:
+    """Feeds on text chunks; complete once the first top-level JSON object has closed.
+
+    Anything before the opening brace is skipped. Braces inside strings
+    (and escaped quotes) are tracked, so only structural ones count.
+    """
+
+    def __init__(self):
+        self._buf = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.complete = False
+
+    def feed(self, text: str) -> bool:
+        """Consumes `text`; returns True once the object is complete (the rest is ignored)."""
+        for ch in text:
+            if self.complete:
+                break
+            if self._depth == 0:
+                if ch != "{":
+                    continue
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            if not self._in_string:
+                if ch == "{":
+                    self._depth += 1
+                elif ch == "}":
+                    self._depth -= 1
+                    self.complete = self._depth == 0
+            self._buf.append(ch)
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buf)
+
+    def value(self):
+        """The parsed object, or None if it never closed or isn't valid JSON."""
+        if not self.complete:
+            return None
+        try:
+            return json.loads(self.text)
+        except json.JSONDecodeError as e:
+            logging.error(f"JSON Parse Error: {e}")
+            return None
+
+
+def validate(model: type, data) -> dict:
+    """`data` checked against `model`, as a plain dict; None if it doesn't fit."""
+    if data is None:
+        return None
+    try:
+        return model.model_validate(data).model_dump()
+    except ValidationError as e:
+        logging.error(f"{model.__name__} validation failed: {e.errors(include_url=False)}")
+        return None
@@ -0,0 +1,243 @@
+"""Task retention: finished tasks move out of the live store into compressed archive segments.
+
+Completed and errored tasks are archived once they are older than
+RETENTION_MAX_AGE_DAYS, or, oldest first, while the store holds more than
+RETENTION_MAX_TASKS. Segments are gzip JSONL partitioned by creation date,
+`<TASK_ARCHIVE_DIR>/tasks-YYYY-MM-DD.jsonl.gz`. Every run appends a new gzip
+member to a segment, which gzip readers see as one stream.
+
+A batch is written and fsynced before it is removed from the store, so a
+crash in between leaves a duplicate in the archive at worst; queries keep the
+last copy of each id. The writing happens outside the store lock; a task that
+changed meanwhile stays live, and its stale archived copy is superseded if it
+is archived again.
+
+    python task_archive.py run                       # apply retention now
+    python task_archive.py query --text dentist --after 2026-01-01
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import task_store
+
+TASK_ARCHIVE_DIR = os.environ.get("TASK_ARCHIVE_DIR", "archive")
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("RETENTION_MAX_AGE_DAYS", "30"))  # 0 = no age limit
+RETENTION_MAX_TASKS = int(os.environ.get("RETENTION_MAX_TASKS", "500"))  # live tasks kept; 0 = no limit
+RETENTION_INTERVAL_SECONDS = float(os.environ.get("RETENTION_INTERVAL_SECONDS", "3600"))
+ARCHIVE_BATCH = 500  # tasks per archive write
+FINISHED = ("completed", "error")
+
+_SEGMENT_RE = re.compile(r"^tasks-(\d{4}-\d{2}-\d{2})\.jsonl\.gz$")
+
+
+def _day(task: dict) -> str:
+    created = task_store._parse_iso(task.get("created_at")) or task_store._parse_iso(task.get("updated_at"))
+    return (created or datetime.now(timezone.utc)).astimezone(timezone.utc).date().isoformat()
+
+
+class TaskArchive:
+    def __init__(self, directory: str = TASK_ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def segment_path(self, day: str) -> str:
+        return os.path.join(self.directory, f"tasks-{day}.jsonl.gz")
+
+    def append(self, tasks: list):
+        """Appends tasks to their day segments and fsyncs them."""
+        by_day = {}
+        for task in tasks:
+            by_day.setdefault(_day(task), []).append(task)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for day, day_tasks in by_day.items():
+                data = "".join(json.dumps(task) + "\n" for task in day_tasks).encode("utf-8")
+                with open(self.segment_path(day), "ab") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                        f.write(data)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+
+    def segments(self, first_day: str = None, last_day: str = None) -> list:
+        """(day, path) of segments within [first_day, last_day], oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            match = _SEGMENT_RE.match(name)
+            if match and (first_day is None or match.group(1) >= first_day) and (last_day is None or match.group(1) <= last_day):
+                found.append((match.group(1), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def read_segment(self, path: str) -> list:
+        """Tasks in one segment, in creation order, one copy per id (the last written)."""
+        tasks = {}
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        task = json.loads(line)
+                        tasks[task["id"]] = task
+        except (EOFError, OSError, zlib.error, json.JSONDecodeError) as e:
+            # A torn final member after a crash; the members before it are intact
+            logging.warning(f"Task archive {path}: stopped at a damaged record: {e}")
+        return sorted(tasks.values(), key=lambda t: t.get("created_at") or "")
+
+    def query(self, status: list = None, created_after: str = None, created_before: str = None,
+              text: str = None, cursor: int = 0, limit: int = 50):
+        """Archived tasks matching the filters, oldest first. Returns (tasks, next_cursor).
+
+        Only the day segments in the created_after/created_before range are
+        read. `cursor` is the number of matches to skip (the previous page's
+        next_cursor); next_cursor is None on the last page.
+        """
+        after_dt = task_store._parse_iso(created_after)
+        before_dt = task_store._parse_iso(created_before)
+        first_day = after_dt.astimezone(timezone.utc).date().isoformat() if after_dt else None
+        last_day = before_dt.astimezone(timezone.utc).date().isoformat() if before_dt else None
+        needle = text.lower() if text else None
+
+        page, matched = [], 0
+        for _, path in self.segments(first_day, last_day):
+            for task in self.read_segment(path):
+                if status and task.get("status") not in status:
+                    continue
+                if after_dt or before_dt:
+                    created = task_store._parse_iso(task.get("created_at"))
+                    if created is None or (after_dt and created < after_dt) or (before_dt and created >= before_dt):
+                        continue
+                if needle and needle not in f"{task.get('original_request', '')}\n{task.get('plan', '')}".lower():
+                    continue
+                matched += 1
+                if matched <= cursor:
+                    continue
+                if len(page) == limit:
+                    return page, cursor + limit
+                page.append(task)
+        return page, None
+
+
+class Retention:
+    """Moves finished tasks from the store to the archive, on a timer and on demand."""
+
+    def __init__(self, store, archive: TaskArchive, max_age_days: float = RETENTION_MAX_AGE_DAYS,
+                 max_tasks: int = RETENTION_MAX_TASKS, interval: float = RETENTION_INTERVAL_SECONDS):
+        self.store = store
+        self.archive = archive
+        self.max_age_days = max_age_days
+        self.max_tasks = max_tasks
+        self.interval = interval
+        self.stats = {"runs": 0, "archived": 0, "errors": 0, "last_run": None}
+        self._run_lock = threading.Lock()
+
+    def select(self, finished: list, live_count: int, now: datetime) -> list:
+        """Ids to archive from `finished` (finished tasks, oldest first)."""
+        selected = set()
+        if self.max_age_days:
+            cutoff = now - timedelta(days=self.max_age_days)
+            for task in finished:
+                changed = task_store._parse_iso(task.get("updated_at")) or task_store._parse_iso(task.get("created_at"))
+                if changed is not None and changed < cutoff:
+                    selected.add(task["id"])
+        if self.max_tasks and live_count - len(selected) > self.max_tasks:
+            excess = live_count - len(selected) - self.max_tasks
+            for task in finished:
+                if excess <= 0:
+                    break
+                if task["id"] not in selected:
+                    selected.add(task["id"])
+                    excess -= 1
+        return [task["id"] for task in finished if task["id"] in selected]
+
+    def _unchanged(self, archived: dict) -> bool:
+        """Whether the live task is still the copy that was archived (call under the store lock)."""
+        current = self.store.get(archived["id"])
+        return (current is not None and current.get("revision") == archived.get("revision")
+                and not current.get("lease_owner"))
+
+    def run(self) -> int:
+        """Applies retention now. Returns the number of tasks archived."""
+        with self._run_lock:
+            finished, _ = self.store.query(status=list(FINISHED))
+            ids = self.select(finished, len(self.store), datetime.now(timezone.utc))
+            archived = 0
+            try:
+                for i in range(0, len(ids), ARCHIVE_BATCH):
+                    with self.store.lock:
+                        batch = [t for t in (self.store.get(task_id) for task_id in ids[i:i + ARCHIVE_BATCH])
+                                 if t is not None and t.get("status") in FINISHED and not t.get("lease_owner")]
+                    if not batch:
+                        continue
+                    # The slow part (gzip, fsync) runs without blocking the store
+                    self.archive.append(batch)
+                    with self.store.lock:
+                        unchanged = [t["id"] for t in batch if self._unchanged(t)]
+                        archived += self.store.remove(unchanged)
+                    if len(unchanged) < len(batch):
+                        logging.info(f"Retention: {len(batch) - len(unchanged)} tasks changed while archiving, kept live")
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.error(f"Retention run failed after archiving {archived} tasks: {e}")
+            self.stats["runs"] += 1
+            self.stats["archived"] += archived
+            self.stats["last_run"] = datetime.now().isoformat()
+            if archived:
+                logging.info(f"Retention: archived {archived} tasks to {self.archive.directory}, {len(self.store)} live")
+                self.store.compact()
+            return archived
+
+    def start(self):
+        threading.Thread(target=self._loop, name="retention", daemon=True).start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.run()
+            except Exception as e:
+                logging.error(f"Retention thread error: {e}")
+            time.sleep(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply task retention or search the task archive.")
+    parser.add_argument("--backend", default=os.environ.get("TASK_STORE_BACKEND", "journal"))
+    parser.add_argument("--store", help="task store path (defaults to the backend's)")
+    parser.add_argument("--archive", default=TASK_ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="archive tasks past the retention limits (stop the server first)")
+    query_cmd = sub.add_parser("query", help="print archived tasks as JSON lines")
+    query_cmd.add_argument("--status", action="append")
+    query_cmd.add_argument("--after", help="created at or after (ISO)")
+    query_cmd.add_argument("--before", help="created before (ISO)")
+    query_cmd.add_argument("--text")
+    query_cmd.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    archive = TaskArchive(args.archive)
+    if args.command == "query":
+        tasks, _ = archive.query(args.status, args.after, args.before, args.text, limit=args.limit)
+        for task in tasks:
+            print(json.dumps(task))
+        return
+
+    path = args.store or ("tasks.db" if args.backend == "sqlite" else "tasks.journal")
+    store = task_store.open_store(args.backend, path=path)
+    start = time.perf_counter()
+    archived = Retention(store, archive).run()
+    store.close()
+    print(f"Archived {archived} tasks in {time.perf_counter() - start:.2f}s; {len(store)} live")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import threading
+
+import task_store
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class TaskEventBroker:
+    """In-process pub/sub for task changes.
+
+    `publish` is called from any thread (the task store calls it on every
+    visible change); subscribers are asyncio queues, fed thread-safely on their
+    own event loop. A subscriber either follows one task or all of them.
+    """
+
+    def __init__(self):
+        self._subscribers = set()  # (loop, queue, task_id or None)
+        self._lock = threading.Lock()
+
+    def publish(self, task: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for handle in subscribers:
+            loop, queue, task_id = handle
+            if task_id is None or task_id == task["id"]:
+                try:
+                    loop.call_soon_threadsafe(self._offer, queue, task)
+                except RuntimeError:
+                    # Its event loop is closed: the stream is gone without unsubscribing
+                    self.unsubscribe(handle)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, task: dict):
+        try:
+            queue.put_nowait(task)
+        except asyncio.QueueFull:
+            # A stalled client: drop the event, it can resync from its last revision
+            logging.warning("Task event subscriber queue full; dropping event")
+
+    def subscribe(self, task_id: str = None):
+        """Must be called from the subscriber's event loop. Returns a handle for unsubscribe."""
+        handle = (asyncio.get_running_loop(), asyncio.Queue(SUBSCRIBER_QUEUE_SIZE), task_id)
+        with self._lock:
+            self._subscribers.add(handle)
+        return handle
+
+    def unsubscribe(self, handle):
+        with self._lock:
+            self._subscribers.discard(handle)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+broker = TaskEventBroker()
+
+
+def _sse(task: dict) -> str:
+    return f"id: {task.get('revision', 0)}\nevent: task\ndata: {json.dumps(task_store.public_view(task))}\n\n"
+
+
+async def event_stream(store, task_id: str = None, since: int = None):
+    """SSE body: backlog of changes after `since`, then live changes.
+
+    Event ids are task revisions, so a reconnecting EventSource resumes from
+    Last-Event-ID without gaps or duplicates.
+    """
+    handle = broker.subscribe(task_id)
+    _, queue, _ = handle
+    try:
+        # Subscribe before reading the backlog so nothing falls between the two
+        last_sent = since if since is not None else store.revision
+        if since is not None:
+            for task in store.changed_since(since):
+                if task_id is None or task["id"] == task_id:
+                    yield _sse(task)
+                    last_sent = max(last_sent, task.get("revision", 0))
+        elif task_id is not None:
+            # Fresh per-task subscribers get the current state first
+            task = store.get(task_id)
+            if task is not None:
+                yield _sse(task)
+                # It may be newer than the revision read above; don't send that change again
+                last_sent = max(last_sent, task.get("revision", 0))
+
+        while True:
+            try:
+                task = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if task.get("revision", 0) <= last_sent:
+                continue
+            last_sent = task["revision"]
+            yield _sse(task)
+    finally:
+        broker.unsubscribe(handle)
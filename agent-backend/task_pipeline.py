@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import tracing
+
+
+class Pipeline:
+    """A small dependency-driven stage runner.
+
+    Stages are added with the names of the stages they depend on. Each one is
+    submitted to the executor the moment its last dependency finishes, and is
+    called with the dependency results as keyword arguments. Per-stage
+    wall-clock durations (ms) accumulate in `timings`. Stages run in the
+    context of the code that added them, so they join its trace. `cancel()`
+    stops stages that haven't started.
+
+        p = Pipeline(executor)
+        p.add("plan", make_plan)
+        p.add("classify", classify)
+        p.add("execute", execute, deps=("plan", "classify"))
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.stages = {}
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._submitted = []  # executor futures, cancelled with the pipeline
+
+    def add(self, name: str, fn, deps=()) -> Future:
+        out = Future()
+        self.stages[name] = out
+        dep_futures = {dep: self.stages[dep] for dep in deps}
+        remaining = [len(dep_futures)]
+        context = contextvars.copy_context()
+
+        def start():
+            with self._lock:
+                if self._cancelled:
+                    out.cancel()
+                    return
+            try:
+                kwargs = {dep: f.result() for dep, f in dep_futures.items()}
+            except Exception as e:
+                _settle(out.set_exception, e)
+                return
+            with self._lock:
+                self._submitted.append(self.executor.submit(context.run, self._run, name, fn, kwargs, out))
+
+        def on_dep_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                start()
+
+        if not dep_futures:
+            start()
+        for f in dep_futures.values():
+            f.add_done_callback(on_dep_done)
+        return out
+
+    def _run(self, name: str, fn, kwargs: dict, out: Future):
+        started = time.perf_counter()
+        try:
+            with tracing.span(f"stage.{name}"):
+                result = fn(**kwargs)
+        except Exception as e:
+            logging.error(f"Pipeline stage '{name}' failed: {e}")
+            _settle(out.set_exception, e)
+            return
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        _settle(out.set_result, result)
+
+    def cancel(self):
+        """Stops the pipeline: queued and future stages never run, and every stage result is cancelled.
+
+        Stages already running finish, but their results are dropped.
+        """
+        with self._lock:
+            self._cancelled = True
+            submitted = list(self._submitted)
+        for f in submitted:
+            f.cancel()
+        for out in self.stages.values():
+            out.cancel()
+
+    async def result_async(self, name: str):
+        """result() for coroutines: awaits the stage without blocking the event loop."""
+        return await asyncio.wrap_future(self.stages[name])
+
+
+def _settle(setter, value):
+    """Sets a stage result unless the pipeline was cancelled meanwhile."""
+    try:
+        setter(value)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,467 @@
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import tracing
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class TaskStore:
+    """In-memory id -> task index over a durable backend.
+
+    Reads never touch disk. Writes go to the index and are then persisted
+    by the backend, one record per change.
+
+    Every visible change bumps the store-wide `revision` and stamps the task
+    with it (plus `created_at`/`updated_at`), which backs incremental reads
+    (`changed_since`) and cheap ETags. Removing tasks (retention) is a change
+    too: `changed_since` reports each as a tombstone, {"id", "revision",
+    "archived": True}, for the last TOMBSTONE_LIMIT removals since startup.
+    """
+
+    TOMBSTONE_LIMIT = 10000
+
+    def __init__(self):
+        self.lock = tracing.TimedLock(threading.RLock(), "task_store")  # wait time shows up in /metrics
+        self._tasks = {}  # id -> task, insertion ordered
+        self._seq = {}  # id -> insertion sequence number (pagination cursor), persisted so cursors survive restarts
+        self._next_seq = 0
+        self._by_revision = OrderedDict()  # id -> revision, oldest change first
+        self.revision = 0
+        self._revision_floor = 0  # highest revision persisted for removed tasks
+        self._tombstones = OrderedDict()  # removed id -> revision, oldest first
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(task) runs after every visible change, inside the store lock. Keep it cheap."""
+        self._listeners.append(callback)
+
+    def _notify(self, task: dict):
+        if not self._listeners:
+            return
+        snapshot = copy.deepcopy(task)
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logging.error(f"Task store listener error: {e}")
+
+    def _rebuild_indexes(self):
+        """Recomputes derived indexes after a backend has loaded `_tasks` (and their `_seq`)."""
+        # Records written before seq was persisted are numbered after the rest, in load order
+        self._seq = {task_id: seq for task_id, seq in self._seq.items() if task_id in self._tasks}
+        self._next_seq = max(self._next_seq, max(self._seq.values(), default=-1) + 1)
+        for task_id in self._tasks:
+            if task_id not in self._seq:
+                self._seq[task_id] = self._next_seq
+                self._next_seq += 1
+        self._tasks = dict(sorted(self._tasks.items(), key=lambda item: self._seq[item[0]]))
+        ordered = sorted(self._tasks.values(), key=lambda t: t.get("revision", 0))
+        self._by_revision = OrderedDict((t["id"], t.get("revision", 0)) for t in ordered)
+        # Never reuse a revision, even if the task that had it was removed
+        self.revision = max(max(self._by_revision.values(), default=0), self._revision_floor)
+
+    def _stamp(self, task_id: str, fields: dict):
+        self.revision += 1
+        fields["revision"] = self.revision
+        fields["updated_at"] = _now_iso()
+        self._by_revision[task_id] = self.revision
+        self._by_revision.move_to_end(task_id)
+
+    # --- Reads ---
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self.lock:
+            task = self._tasks.get(task_id)
+            return copy.deepcopy(task) if task is not None else None
+
+    def all(self) -> List[dict]:
+        with self.lock:
+            return copy.deepcopy(list(self._tasks.values()))
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def query(self, status: List[str] = None, created_after: str = None, created_before: str = None,
+              cursor: int = None, limit: int = None):
+        """Filtered page of tasks in creation order.
+
+        Returns (tasks, next_cursor); next_cursor is None on the last page.
+        `created_after`/`created_before` are ISO timestamps compared to `created_at`.
+        """
+        after_dt = _parse_iso(created_after)
+        before_dt = _parse_iso(created_before)
+        page = []
+        with self.lock:
+            for task_id, task in self._tasks.items():
+                if cursor is not None and self._seq[task_id] <= cursor:
+                    continue
+                if status and task.get("status") not in status:
+                    continue
+                if after_dt or before_dt:
+                    created = _parse_iso(task.get("created_at"))
+                    if created is None or (after_dt and created < after_dt) or (before_dt and created >= before_dt):
+                        continue
+                if limit is not None and len(page) == limit:
+                    return copy.deepcopy(page), self._seq[page[-1]["id"]]
+                page.append(task)
+            return copy.deepcopy(page), None
+
+    def changed_since(self, revision: int) -> List[dict]:
+        """Tasks changed after `revision`, oldest change first. Cost is O(changes)."""
+        changed = []
+        with self.lock:
+            for task_id, rev in reversed(self._by_revision.items()):
+                if rev <= revision:
+                    break
+                task = self._tasks.get(task_id)
+                changed.append(task if task is not None else {"id": task_id, "revision": rev, "archived": True})
+            return copy.deepcopy(changed[::-1])
+
+    # --- Writes ---
+
+    def put(self, task: dict):
+        """Inserts or replaces a whole task."""
+        task = copy.deepcopy(task)
+        with self.lock:
+            existing = self._tasks.get(task["id"])
+            if existing is None:
+                self._seq[task["id"]] = self._next_seq
+                self._next_seq += 1
+                task.setdefault("created_at", _now_iso())
+            else:
+                task.setdefault("created_at", existing.get("created_at"))
+            self._stamp(task["id"], task)
+            self._tasks[task["id"]] = task
+            with tracing.span("store.persist"):
+                self._persist_put(task)
+            self._notify(task)
+
+    def update(self, task_id: str, **fields) -> bool:
+        """Patches fields of an existing task. Returns False if the id is unknown."""
+        return self._patch(task_id, fields, stamp=True)
+
+    def mutate(self, task_id: str, fn) -> Optional[dict]:
+        """Read-modify-write of one task as a single change.
+
+        fn(task) gets a copy of the current task and returns the fields to set
+        (or None to leave it alone); it runs under the store lock, so nothing
+        can change the task in between. The result is one revision, one
+        persisted record and one notification. Returns the updated task, or
+        None if the id is unknown or fn made no change.
+        """
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            fields = fn(copy.deepcopy(task))
+            if not fields:
+                return None
+            self._patch(task_id, fields, stamp=True)
+            return copy.deepcopy(self._tasks[task_id])
+
+    def _patch(self, task_id: str, fields: dict, stamp: bool) -> bool:
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return False
+            fields = copy.deepcopy(fields)
+            if stamp:
+                self._stamp(task_id, fields)
+            task.update(fields)
+            with tracing.span("store.persist"):
+                self._persist_patch(task_id, fields, task)
+            if stamp:
+                self._notify(task)
+            return True
+
+    def remove(self, task_ids: list) -> int:
+        """Deletes tasks (after archiving them, say) as one change. Returns how many existed."""
+        with self.lock:
+            task_ids = [task_id for task_id in task_ids if task_id in self._tasks]
+            if not task_ids:
+                return 0
+            self.revision += 1
+            for task_id in task_ids:
+                del self._tasks[task_id]
+                self._seq.pop(task_id, None)
+                self._by_revision[task_id] = self.revision
+                self._by_revision.move_to_end(task_id)
+                self._tombstones[task_id] = self.revision
+            while len(self._tombstones) > self.TOMBSTONE_LIMIT:
+                old_id, _ = self._tombstones.popitem(last=False)
+                if old_id not in self._tasks:
+                    self._by_revision.pop(old_id, None)
+            self._revision_floor = self.revision
+            with tracing.span("store.persist"):
+                self._persist_remove(task_ids, self.revision)
+            for task_id in task_ids:
+                self._notify({"id": task_id, "revision": self.revision, "archived": True})
+            return len(task_ids)
+
+    def claim(self, task_id: str, owner: str, lease_seconds: float) -> bool:
+        """Atomically takes the execution lease on a task.
+
+        Fails if the task is unknown or holds an unexpired lease. Leases are
+        wall-clock so they survive (and expire across) restarts.
+        """
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return False
+            if task.get("lease_owner") is not None and (task.get("lease_expires") or 0) > time.time():
+                return False
+            # Leases are internal bookkeeping, not a visible change: no revision bump
+            return self._patch(task_id, {"lease_owner": owner, "lease_expires": time.time() + lease_seconds}, stamp=False)
+
+    def release(self, task_id: str, owner: str):
+        with self.lock:
+            task = self._tasks.get(task_id)
+            if task is not None and task.get("lease_owner") == owner:
+                self._patch(task_id, {"lease_owner": None, "lease_expires": None}, stamp=False)
+
+    def clear_leases(self) -> int:
+        """Drops every lease (at startup, when they all belong to a dead process). Returns how many.
+
+        Like claim/release this isn't a visible change: no revisions, no notifications.
+        """
+        with self.lock:
+            leased = [task_id for task_id, task in self._tasks.items() if task.get("lease_owner") is not None]
+            for task_id in leased:
+                self._patch(task_id, {"lease_owner": None, "lease_expires": None}, stamp=False)
+            return len(leased)
+
+    def import_json(self, path: str) -> int:
+        """Imports a legacy tasks.json list. Returns the number of tasks imported.
+
+        Afterwards the file is renamed to `<path>.imported`, so it can't be
+        imported a second time.
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r") as f:
+                tasks = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Task import from {path} failed: {e}")
+            return 0
+
+        with self.lock:
+            for task in tasks:
+                if isinstance(task, dict) and "id" in task:
+                    self.put(task)
+            self.compact()
+        logging.info(f"Imported {len(tasks)} tasks from {path}")
+        try:
+            os.replace(path, path + ".imported")
+        except OSError as e:
+            logging.warning(f"Could not rename {path} after importing it: {e}")
+        return len(tasks)
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+    # --- Backend hooks ---
+
+    def _persist_put(self, task: dict):
+        raise NotImplementedError
+
+    def _persist_patch(self, task_id: str, fields: dict, task: dict):
+        raise NotImplementedError
+
+    def _persist_remove(self, task_ids: list, revision: int):
+        raise NotImplementedError
+
+
+class JournalTaskStore(TaskStore):
+    """Append-only JSONL journal, rewritten as a snapshot on compaction.
+
+    Each line is one of {"op": "put", "task": {...}, "seq": n},
+    {"op": "patch", "id": ..., "fields": {...}},
+    {"op": "remove", "ids": [...], "revision": n} or
+    {"op": "meta", "revision": n, "next_seq": n} (the snapshot's first line, so
+    revisions and sequence numbers of removed tasks aren't reused).
+    Compaction runs once the journal holds more than `compact_ratio` records
+    per live task.
+    """
+
+    def __init__(self, path: str, compact_ratio: int = 4, compact_min_records: int = 500):
+        super().__init__()
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        self._records = 0
+        self._replay()
+        self._rebuild_indexes()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final write after a crash; everything before it is intact.
+                    logging.warning(f"Task journal: skipping corrupt line {line_no}")
+                    continue
+                self._records += 1
+                if record.get("op") == "put":
+                    task = record["task"]
+                    self._tasks[task["id"]] = task
+                    if "seq" in record:
+                        self._seq[task["id"]] = record["seq"]
+                        self._next_seq = max(self._next_seq, record["seq"] + 1)
+                elif record.get("op") == "patch" and record.get("id") in self._tasks:
+                    self._tasks[record["id"]].update(record["fields"])
+                elif record.get("op") == "remove":
+                    for task_id in record["ids"]:
+                        self._tasks.pop(task_id, None)
+                    self._revision_floor = max(self._revision_floor, record["revision"])
+                elif record.get("op") == "meta":
+                    self._revision_floor = max(self._revision_floor, record["revision"])
+                    self._next_seq = max(self._next_seq, record.get("next_seq", 0))
+
+    def _append(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self._records += 1
+        if self._records > max(self.compact_min_records, self.compact_ratio * len(self._tasks)):
+            self.compact()
+
+    def _persist_put(self, task: dict):
+        self._append({"op": "put", "task": task, "seq": self._seq[task["id"]]})
+
+    def _persist_patch(self, task_id: str, fields: dict, task: dict):
+        self._append({"op": "patch", "id": task_id, "fields": fields})
+
+    def _persist_remove(self, task_ids: list, revision: int):
+        self._append({"op": "remove", "ids": task_ids, "revision": revision})
+
+    def compact(self):
+        """Rewrites the journal as one put per live task (atomic rename)."""
+        with self.lock, tracing.span("store.compact"):
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "meta", "revision": self.revision, "next_seq": self._next_seq}) + "\n")
+                for task_id, task in self._tasks.items():
+                    f.write(json.dumps({"op": "put", "task": task, "seq": self._seq[task_id]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._records = len(self._tasks)
+
+    def close(self):
+        with self.lock:
+            self._file.close()
+
+
+class SqliteTaskStore(TaskStore):
+    """SQLite in WAL mode, one row per task; the row's seq is the task's pagination sequence number."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, data TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        for seq, data in self._conn.execute("SELECT seq, data FROM tasks ORDER BY seq"):
+            task = json.loads(data)
+            self._tasks[task["id"]] = task
+            self._seq[task["id"]] = seq
+        # AUTOINCREMENT's high-water mark, which outlives removed rows
+        row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+        self._next_seq = row[0] + 1 if row else 0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision_floor'").fetchone()
+        self._revision_floor = row[0] if row else 0
+        self._rebuild_indexes()
+
+    def _persist_put(self, task: dict):
+        self._conn.execute(
+            "INSERT INTO tasks (seq, id, data) VALUES (?, ?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+            (self._seq[task["id"]], task["id"], json.dumps(task)),
+        )
+
+    def _persist_patch(self, task_id: str, fields: dict, task: dict):
+        self._conn.execute("UPDATE tasks SET data = ? WHERE id = ?", (json.dumps(task), task_id))
+
+    def _persist_remove(self, task_ids: list, revision: int):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in task_ids])
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('revision_floor', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (revision,),
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def compact(self):
+        with self.lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.lock:
+            self._conn.close()
+
+
+INTERNAL_FIELDS = ("lease_owner", "lease_expires")  # execution leases: bookkeeping, not task state
+
+
+def public_view(task: dict) -> dict:
+    """`task` without the store's internal fields, for API responses."""
+    return {key: value for key, value in task.items() if key not in INTERNAL_FIELDS}
+
+
+def _parse_iso(value: str):
+    """Parses an ISO timestamp to an aware datetime (naive values are taken as UTC)."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def open_store(backend: str = "journal", path: str = "tasks.journal", legacy_json: str = None) -> TaskStore:
+    """Opens a task store. A store that has never been written is seeded from `legacy_json` if given.
+
+    "Never written" is revision 0, not merely empty: retention can archive
+    every task, and those must not come back from the legacy file.
+    """
+    if backend == "sqlite":
+        store = SqliteTaskStore(path)
+    elif backend == "journal":
+        store = JournalTaskStore(path)
+    else:
+        raise ValueError(f"Unknown task store backend: {backend}")
+
+    if legacy_json and store.revision == 0:
+        store.import_json(legacy_json)
+    return store
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from connectivity_service import ConnectivityMonitor
+
+
+class FakeProbe:
+    """Returns queued results (repeating the last one) and counts calls."""
+
+    def __init__(self, *results, gate=None):
+        self.results = list(results)
+        self.calls = 0
+        self.gate = gate
+        self.entered = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set()
+        if self.gate:
+            self.gate.wait(5)
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_result_is_reused_within_ttl():
+    probe = FakeProbe(True)
+    monitor = ConnectivityMonitor(probe, ttl=0.05)
+    assert monitor.is_online() and monitor.is_online()
+    assert probe.calls == 1
+    time.sleep(0.06)
+    assert monitor.is_online()
+    assert probe.calls == 2
+
+
+def test_concurrent_callers_share_one_probe():
+    gate = threading.Event()
+    probe = FakeProbe(True, gate=gate)
+    monitor = ConnectivityMonitor(probe)
+    results = []
+    first = threading.Thread(target=lambda: results.append(monitor.is_online()))
+    first.start()
+    assert probe.entered.wait(5)
+    others = [threading.Thread(target=lambda: results.append(monitor.is_online())) for _ in range(7)]
+    for t in others:
+        t.start()
+    time.sleep(0.05)  # let them queue behind the probe in flight
+    gate.set()
+    for t in [first, *others]:
+        t.join(5)
+
+    assert results == [True] * 8
+    assert probe.calls == 1
+
+
+def test_subscribers_see_each_transition():
+    probe = FakeProbe(True, True, False, True)
+    monitor = ConnectivityMonitor(probe)
+    seen = []
+    monitor.subscribe(seen.append)
+    for _ in range(4):
+        monitor.check()
+    assert seen == [False, True]
+
+
+def test_report_failure_goes_offline_and_reprobes():
+    probe = FakeProbe(True)
+    monitor = ConnectivityMonitor(probe, min_interval=0.01, max_online_interval=60)
+    seen = []
+    monitor.subscribe(seen.append)
+    monitor.start()
+    _wait_for(lambda: monitor.online is True)
+    calls = probe.calls
+
+    monitor.report_failure()
+    assert seen[0] is False
+    # The background thread is woken at once rather than after its interval
+    _wait_for(lambda: monitor.online is True)
+    assert probe.calls > calls
+    assert seen[:2] == [False, True]
+
+
+def test_running_monitor_answers_without_probing():
+    probe = FakeProbe(True)
+    monitor = ConnectivityMonitor(probe, ttl=0.01, min_interval=60).start()
+    _wait_for(lambda: monitor.online is True)
+    time.sleep(0.02)  # past the ttl
+    calls = probe.calls
+    assert all(monitor.is_online() for _ in range(10))
+    assert probe.calls == calls
@@ -0,0 +1,31 @@
+import pytest
+
+import bench_event_extractor as bench
+import event_extractor
+
+CASES = bench.load_corpus(bench.CORPUS)
+
+
+def _run(case):
+    now = event_extractor.reference_time(case["client_time"])
+    return event_extractor.extract(case["text"], now, case.get("extracted_time"))
+
+
+@pytest.mark.parametrize("case", CASES, ids=[c["text"] for c in CASES])
+def test_confident_extractions_are_right(case):
+    """Anything at or above MIN_CONFIDENCE skips the LLM, so it must be exactly right."""
+    result = _run(case)
+    if result.confidence < event_extractor.MIN_CONFIDENCE:
+        pytest.skip(f"deferred to the LLM ({result.confidence}: {', '.join(result.reasons)})")
+    assert bench.score(result.details, case["expected"]) == {"summary": True, "start_time": True, "duration": True}, \
+        result.details
+
+
+def test_corpus_accuracy_and_coverage():
+    results = [_run(case) for case in CASES]
+    accuracy = bench.accuracy([bench.score(r.details, c["expected"]) for r, c in zip(results, CASES)])
+    assert accuracy["summary"] >= 0.9
+    assert accuracy["start_time"] >= 0.9
+    assert accuracy["duration"] >= 0.95
+    coverage = sum(r.confidence >= event_extractor.MIN_CONFIDENCE for r in results) / len(results)
+    assert coverage >= 0.75
@@ -0,0 +1,61 @@
+import json
+import os
+import time
+
+from file_watch import FileWatch
+from intent_router import IntentRouter
+
+
+def test_reports_creation_edit_and_removal(tmp_path):
+    path = tmp_path / "config.json"
+    watch = FileWatch(str(path), interval=60)
+    assert watch.changed(force=True) and not watch.exists
+    assert not watch.changed(force=True)
+
+    path.write_text("{}")
+    assert watch.changed(force=True) and watch.exists
+    assert not watch.changed(force=True)
+
+    path.write_text('{"a": 1}')  # size changes even if the mtime tick doesn't
+    assert watch.changed(force=True)
+
+    path.unlink()
+    assert watch.changed(force=True) and not watch.exists
+
+
+def test_checks_at_most_every_interval(tmp_path):
+    path = tmp_path / "config.json"
+    watch = FileWatch(str(path), interval=0.05)
+    assert watch.changed()
+    path.write_text("{}")
+    assert not watch.due() and not watch.changed()
+    time.sleep(0.06)
+    assert watch.due() and watch.changed()
+
+
+def test_mark_skips_own_writes(tmp_path):
+    path = tmp_path / "config.json"
+    watch = FileWatch(str(path), interval=60)
+    watch.changed(force=True)
+    path.write_text("{}")
+    watch.mark()
+    assert watch.exists and not watch.changed(force=True)
+
+
+def test_intent_router_reloads_and_keeps_last_good_config(tmp_path):
+    path = tmp_path / "intents.json"
+    path.write_text(json.dumps({"greeting": {"keywords": ["hello"]}}))
+    router = IntentRouter(str(path), defaults={"fallback": {"keywords": ["help"]}})
+    assert router.has("hello there", "greeting")
+
+    path.write_text(json.dumps({"farewell": {"keywords": ["bye"]}}))
+    assert router.reload()
+    assert router.has("bye now", "farewell") and not router.has("hello", "greeting")
+
+    path.write_text("{not json")
+    assert not router.reload()
+    assert router.has("bye now", "farewell")
+
+    os.remove(path)
+    assert router.reload()
+    assert router.has("help me", "fallback")
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+import task_store
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = task_store.open_store("journal", path=str(tmp_path / "tasks.journal"))
+    store.put({"id": "t1", "status": "planned"})
+    yield store
+    store.close()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_submit_is_idempotent_while_pending(store):
+    calls = []
+    jobs = JobQueue(store, lambda task_id: calls.append(task_id) or True, workers=1).start()
+    assert jobs.submit("t1", delay=0.05)
+    assert not jobs.submit("t1")
+    _wait_for(lambda: jobs.stats()["completed"] == 1)
+    assert calls == ["t1"]
+    assert jobs.stats()["submitted"] == 1
+    assert jobs.submit("t1")  # no longer pending
+
+
+def test_task_leased_elsewhere_is_skipped(store):
+    calls = []
+    assert store.claim("t1", "other-process", lease_seconds=60)
+    jobs = JobQueue(store, lambda task_id: calls.append(task_id) or True, workers=1).start()
+    jobs.submit("t1")
+    _wait_for(lambda: jobs.stats()["skipped"] == 1)
+    assert calls == []
+    assert store.get("t1")["lease_owner"] == "other-process"
+
+
+def test_lease_is_held_while_running_and_released_after(store):
+    running, finish = threading.Event(), threading.Event()
+
+    def handler(task_id):
+        running.set()
+        finish.wait(5)
+        return True
+
+    jobs = JobQueue(store, handler, workers=1).start()
+    jobs.submit("t1")
+    assert running.wait(5)
+    assert store.get("t1")["lease_owner"].startswith(jobs.owner)
+    assert not store.claim("t1", "someone-else", lease_seconds=60)
+    finish.set()
+    _wait_for(lambda: store.get("t1")["lease_owner"] is None)
+    assert jobs.stats()["completed"] == 1
+
+
+def test_failures_are_retried_with_growing_backoff(store):
+    attempts = []
+
+    def handler(task_id):
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError("flaky")
+        return True
+
+    jobs = JobQueue(store, handler, workers=1, backoff_base=0.05).start()
+    jobs.submit("t1")
+    _wait_for(lambda: jobs.stats()["completed"] == 1)
+    stats = jobs.stats()
+    assert len(attempts) == 3 and stats["retried"] == 2 and stats["failed"] == 0
+    first_gap, second_gap = attempts[1] - attempts[0], attempts[2] - attempts[1]
+    assert first_gap >= 0.05 and second_gap >= 0.1
+
+
+def test_task_is_marked_error_after_the_last_attempt(store):
+    given_up = []
+
+    def give_up(task_id, error):
+        given_up.append((task_id, str(error)))
+        store.update(task_id, status="error")
+
+    def handler(task_id):
+        raise RuntimeError("calendar down")
+
+    jobs = JobQueue(store, handler, workers=2, max_attempts=3, backoff_base=0.01, on_give_up=give_up).start()
+    jobs.submit("t1")
+    _wait_for(lambda: store.get("t1")["status"] == "error" and store.get("t1")["lease_owner"] is None)
+    assert jobs.stats()["failed"] == 1
+    assert given_up == [("t1", "calendar down")]
+    assert jobs.stats()["retried"] == 2
+
+
+def test_parked_jobs_are_counted_and_released(store):
+    jobs = JobQueue(store, lambda task_id: False, workers=1).start()
+    jobs.submit("t1")
+    _wait_for(lambda: jobs.stats()["parked"] == 1)
+    _wait_for(lambda: store.get("t1")["lease_owner"] is None)
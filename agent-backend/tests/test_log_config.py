@@ -0,0 +1,21 @@
+import logging
+
+from log_config import ModuleLevelFilter, parse_level, parse_levels
+
+
+def test_parse_level_accepts_names_and_numbers():
+    assert parse_level("debug") == logging.DEBUG
+    assert parse_level(" WARNING ") == logging.WARNING
+    assert parse_level("15") == 15
+    assert parse_level("VERBOSE") is None
+
+
+def test_unknown_levels_are_skipped(caplog):
+    with caplog.at_level(logging.WARNING):
+        levels = parse_levels("ollama_client=DEBUG, task_store=VERBOSE,urllib3=error,junk")
+    assert levels == {"ollama_client": logging.DEBUG, "urllib3": logging.ERROR}
+    assert "VERBOSE" in caplog.text
+
+    # Every level the filter sees is comparable
+    record = logging.LogRecord("task_store", logging.INFO, __file__, 1, "msg", None, None)
+    assert ModuleLevelFilter(logging.INFO, levels).filter(record)
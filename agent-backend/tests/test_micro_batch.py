@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from micro_batch import MicroBatcher
+
+
+class Recorder:
+    """Batch function that records each batch and can be held at a gate."""
+
+    def __init__(self, gate=None, fail=False):
+        self.batches = []
+        self.gate = gate
+        self.fail = fail
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("model down")
+        return [item * 10 for item in items]
+
+
+def test_batch_closes_when_full():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, "full", max_batch=3, max_wait=5, concurrency=1)
+    futures = [batcher.submit(i) for i in range(3)]
+    assert [f.result(1) for f in futures] == [0, 10, 20]  # long before max_wait
+    assert fn.batches == [[0, 1, 2]]
+
+
+def test_batch_closes_after_max_wait():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, "wait", max_batch=8, max_wait=0.05, concurrency=1)
+    start = time.monotonic()
+    assert batcher(7) == 70
+    assert time.monotonic() - start >= 0.05
+    assert fn.batches == [[7]]
+
+
+def test_items_queue_up_while_all_slots_are_busy():
+    gate = threading.Event()
+    fn = Recorder(gate=gate)
+    batcher = MicroBatcher(fn, "busy", max_batch=4, max_wait=0.001, concurrency=1)
+    first = batcher.submit(0)
+    while not fn.batches:
+        time.sleep(0.001)
+    rest = [batcher.submit(i) for i in range(1, 7)]
+    gate.set()
+    assert first.result(5) == 0
+    assert [f.result(5) for f in rest] == [10, 20, 30, 40, 50, 60]  # each result goes to its own caller
+    assert fn.batches == [[0], [1, 2, 3, 4], [5, 6]]
+    stats = batcher.stats()
+    assert stats["items"] == 7 and stats["batches"] == 3 and stats["largest"] == 4
+
+
+def test_failed_batch_fails_every_caller():
+    batcher = MicroBatcher(Recorder(fail=True), "fail", max_batch=2, max_wait=5, concurrency=1)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model down"):
+            future.result(1)
+    assert batcher.stats()["errors"] == 1
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], "short", max_batch=2, max_wait=5, concurrency=1)
+    futures = [batcher.submit(i) for i in range(2)]
+    with pytest.raises(ValueError):
+        futures[1].result(1)
+
+
+def test_callers_fail_when_the_pool_is_shut_down():
+    batcher = MicroBatcher(Recorder(), "closed", max_batch=1, max_wait=0, concurrency=1)
+    assert batcher(1) == 10
+    batcher._pool.shutdown()
+    with pytest.raises(RuntimeError):
+        batcher.submit(2).result(1)
+    with pytest.raises(RuntimeError):
+        batcher.submit(3).result(1)  # the slot was given back
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_ollama import FakeOllama
+from ollama_client import PRIORITY_BACKGROUND, PRIORITY_USER, OllamaClient, PriorityLimiter
+
+
+@pytest.fixture
+def fake():
+    server = FakeOllama(token_latency=0.02).start()
+    yield server
+    server.stop()
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=t) for t in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+
+
+def test_identical_inflight_requests_share_one_generation(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+    results = []
+    _run_threads([lambda: results.append(client.generate("same prompt", "m"))] * 5)
+
+    assert len(fake.calls) == 1
+    assert len(results) == 5 and all(r == results[0] for r in results)
+    assert client.metrics()["models"]["m"]["coalesced"] == 4
+
+
+def test_concurrency_cap_holds_across_requests(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+    _run_threads([lambda i=i: client.generate(f"prompt {i}", "m") for i in range(6)])
+
+    assert len(fake.calls) == 6
+    assert fake.max_active == 2
+
+
+def test_waiters_are_served_by_priority_then_arrival(fake):
+    client = OllamaClient(fake.url, max_concurrency=1)
+    client.limiter.acquire()  # hold the only slot while the waiters line up
+    waiters = [("background 1", PRIORITY_BACKGROUND), ("user 1", PRIORITY_USER),
+               ("background 2", PRIORITY_BACKGROUND), ("user 2", PRIORITY_USER)]
+    threads = []
+    for i, (prompt, priority) in enumerate(waiters):
+        t = threading.Thread(target=client.generate, args=(prompt, "m"), kwargs={"priority": priority})
+        t.start()
+        threads.append(t)
+        _wait_for(lambda: client.limiter.waiting == i + 1)
+    client.limiter.release()
+    for t in threads:
+        t.join(10)
+
+    assert [c["prompt"] for c in fake.calls] == ["user 1", "user 2", "background 1", "background 2"]
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    limiter = PriorityLimiter(1)
+
+    async def scenario():
+        await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiting == 0
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire_async(), 1)  # the slot is free again
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert limiter._active == 0
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    limiter = PriorityLimiter(1)
+
+    async def scenario():
+        await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        limiter.release()  # hands the slot over, but the waiter hasn't run yet...
+        waiter.cancel()  # ...when it is cancelled
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert limiter._active == 0 and limiter.waiting == 0
+
+
+def test_async_generate_and_stream(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+
+    async def scenario():
+        data = await client.agenerate("plan this", "m")
+        chunks = [c async for c in client.astream("plan this", "m")]
+        await client.aclose()
+        return data, chunks
+
+    data, chunks = asyncio.run(scenario())
+    assert data["done"] and chunks[-1]["done"]
+    assert "".join(c["response"] for c in chunks).strip() == data["response"]
+
+
+def test_async_client_from_a_previous_loop_is_closed(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(client.agenerate("a", "m"), old_loop).result(10)
+        old_client = client._async_client
+
+        async def on_new_loop():
+            await client.agenerate("b", "m")
+            await client.aclose()
+
+        asyncio.run(on_new_loop())
+        _wait_for(lambda: old_client.is_closed)
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join(5)
+        old_loop.close()
+
+
+def test_async_requests_coalesce_with_each_other_and_with_sync_ones(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+
+    async def scenario():
+        first = asyncio.ensure_future(client.agenerate("same prompt", "m"))
+        await asyncio.sleep(0)  # the first call is the leader
+        # A thread calling generate() joins the same generation
+        sync_result = asyncio.get_running_loop().run_in_executor(None, client.generate, "same prompt", "m")
+        results = await asyncio.gather(first, client.agenerate("same prompt", "m"), sync_result)
+        await client.aclose()
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(fake.calls) == 1
+    assert all(r == results[0] for r in results)
+    assert client.metrics()["models"]["m"]["coalesced"] == 2
+    assert client._inflight == {}
+
+
+def test_cancelled_async_caller_leaves_the_shared_generation_running(fake):
+    client = OllamaClient(fake.url, max_concurrency=2)
+
+    async def scenario():
+        leader = asyncio.ensure_future(client.agenerate("same prompt", "m"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(client.agenerate("same prompt", "m"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        data = await follower
+        await client.aclose()
+        return data, leader.cancelled()
+
+    data, cancelled = asyncio.run(scenario())
+    assert cancelled and data["done"]
+    assert len(fake.calls) == 1
@@ -0,0 +1,57 @@
+import structured_output
+from structured_output import EventDetails, InternetAnswers, JsonObjectReader, validate
+
+
+def _read(*chunks):
+    reader = JsonObjectReader()
+    for chunk in chunks:
+        if reader.feed(chunk):
+            break
+    return reader
+
+
+def test_reader_completes_when_the_object_closes_across_chunks():
+    reader = _read('Sure! {"summary": "Dent', 'ist", "duration_minutes": 3', '0}', " trailing chatter {")
+    assert reader.complete
+    assert reader.value() == {"summary": "Dentist", "duration_minutes": 30}
+
+
+def test_reader_ignores_braces_and_escaped_quotes_inside_strings():
+    reader = _read('{"summary": "a } \\" { b", "nested": {"x": [1, {"y": 2}]}}')
+    assert reader.value() == {"summary": 'a } " { b', "nested": {"x": [1, {"y": 2}]}}
+
+
+def test_reader_stops_at_the_first_object():
+    reader = JsonObjectReader()
+    assert reader.feed('{"a": 1}{"b": 2}')
+    assert reader.text == '{"a": 1}'
+
+
+def test_reader_without_a_closed_object_has_no_value():
+    assert _read('{"summary": "cut off').value() is None
+    assert _read("no json here").value() is None
+
+
+def test_event_details_are_validated_and_cleaned():
+    data = validate(EventDetails, {"summary": "  Dentist ", "start_time": "2026-02-05T15:00:00+05:30"})
+    assert data == {"summary": "Dentist", "start_time": "2026-02-05T15:00:00+05:30", "duration_minutes": 30}
+
+
+def test_invalid_event_details_are_rejected():
+    assert validate(EventDetails, None) is None
+    assert validate(EventDetails, {"summary": "   ", "start_time": "2026-02-05T15:00:00"}) is None
+    assert validate(EventDetails, {"summary": "Dentist", "start_time": "tomorrow at 3"}) is None
+    assert validate(EventDetails, {"summary": "Dentist", "start_time": "2026-02-05T15:00:00Z",
+                                   "duration_minutes": 0}) is None
+
+
+def test_internet_answers_only_allow_yes_or_no():
+    assert validate(InternetAnswers, {"answers": ["YES", "NO"]}) == {"answers": ["YES", "NO"]}
+    assert validate(InternetAnswers, {"answers": ["YES", "maybe"]}) is None
+
+
+def test_schemas_are_plain_json_schema():
+    schema = structured_output.EVENT_DETAILS_SCHEMA
+    assert schema["type"] == "object"
+    assert set(schema["required"]) == {"summary", "start_time"}
+    assert structured_output.INTERNET_ANSWERS_SCHEMA["properties"]["answers"]["items"]["enum"] == ["YES", "NO"]
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import task_archive
+import task_store
+
+NOW = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def _task(task_id, days_old, status="completed", **fields):
+    stamp = (NOW - timedelta(days=days_old)).isoformat()
+    return {"id": task_id, "status": status, "created_at": stamp, "updated_at": stamp, **fields}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = task_store.open_store("journal", path=str(tmp_path / "tasks.journal"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return task_archive.TaskArchive(str(tmp_path / "archive"))
+
+
+def test_select_by_age_then_oldest_first_over_the_limit(store, archive):
+    finished = [_task("a", 40), _task("b", 20), _task("c", 10), _task("d", 1)]
+    by_age = task_archive.Retention(store, archive, max_age_days=30, max_tasks=0)
+    assert by_age.select(finished, live_count=6, now=NOW) == ["a"]
+
+    by_count = task_archive.Retention(store, archive, max_age_days=0, max_tasks=4)
+    assert by_count.select(finished, live_count=6, now=NOW) == ["a", "b"]
+
+    both = task_archive.Retention(store, archive, max_age_days=30, max_tasks=4)
+    assert both.select(finished, live_count=6, now=NOW) == ["a", "b"]  # "a" counts toward the excess
+
+
+def test_run_archives_only_finished_unleased_tasks(store, archive):
+    # Stored with current timestamps, so a tiny max_age selects everything finished
+    for task_id, status in [("done", "completed"), ("failed", "error"), ("busy", "executing"), ("leased", "completed")]:
+        store.put({"id": task_id, "status": status, "original_request": f"request {task_id}"})
+    store.claim("leased", "worker", 60)
+    retention = task_archive.Retention(store, archive, max_age_days=1e-9, max_tasks=0)
+
+    assert retention.run() == 2
+    assert sorted(t["id"] for t in store.all()) == ["busy", "leased"]
+    assert retention.stats["archived"] == 2 and retention.stats["errors"] == 0
+
+
+def test_archive_round_trip_and_query(store, archive):
+    archive.append([_task("a", 3, original_request="Dentist at 5"), _task("b", 3, status="error")])
+    archive.append([_task("c", 1, original_request="Gym"), _task("a", 3, original_request="Dentist at 6")])
+
+    assert [day for day, _ in archive.segments()] == [(NOW - timedelta(days=3)).date().isoformat(),
+                                                       (NOW - timedelta(days=1)).date().isoformat()]
+    tasks, cursor = archive.query()
+    assert [t["id"] for t in tasks] == ["a", "b", "c"] and cursor is None
+    assert tasks[0]["original_request"] == "Dentist at 6"  # the last copy of an id wins
+
+    assert [t["id"] for t in archive.query(text="dentist")[0]] == ["a"]
+    assert [t["id"] for t in archive.query(status=["error"])[0]] == ["b"]
+    after = (NOW - timedelta(days=2)).isoformat()
+    assert [t["id"] for t in archive.query(created_after=after)[0]] == ["c"]
+    page, cursor = archive.query(limit=2)
+    assert [t["id"] for t in page] == ["a", "b"]
+    assert [t["id"] for t in archive.query(cursor=cursor, limit=2)[0]] == ["c"]
+
+
+def test_task_changed_while_archiving_stays_live(store, archive):
+    store.put({"id": "a", "status": "completed"})
+    store.put({"id": "b", "status": "completed"})
+
+    class ChangingArchive(task_archive.TaskArchive):
+        def append(self, tasks):
+            super().append(tasks)
+            store.update("a", plan="edited meanwhile")  # the store isn't locked during the write
+
+    retention = task_archive.Retention(store, ChangingArchive(archive.directory), max_age_days=1e-9, max_tasks=0)
+    assert retention.run() == 1
+    assert [t["id"] for t in store.all()] == ["a"]
+    assert store.get("a")["plan"] == "edited meanwhile"
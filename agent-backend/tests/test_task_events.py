@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+import task_events
+import task_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = task_store.open_store("journal", path=str(tmp_path / "tasks.journal"))
+    store.add_listener(task_events.broker.publish)
+    yield store
+    store.close()
+
+
+def _parse(chunk: str):
+    """(id, task) of an SSE task event, None for a keep-alive comment."""
+    if chunk.startswith(":"):
+        return None
+    lines = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return int(lines["id"]), json.loads(lines["data"])
+
+
+async def _take(stream, n: int, timeout: float = 2.0) -> list:
+    events = []
+    while len(events) < n:
+        event = _parse(await asyncio.wait_for(stream.__anext__(), timeout))
+        if event is not None:
+            events.append(event)
+    return events
+
+
+def test_resume_sends_only_changes_after_since_then_live_ones(store):
+    store.put({"id": "a", "status": "planned"})
+    since = store.revision
+    store.update("a", status="executing")
+    store.put({"id": "b", "status": "planned"})
+
+    async def scenario():
+        stream = task_events.event_stream(store, since=since)
+        backlog = await _take(stream, 2)
+        store.update("b", status="completed")
+        live = await _take(stream, 1)
+        await stream.aclose()
+        return backlog, live
+
+    backlog, live = asyncio.run(scenario())
+    assert [(t["id"], t["status"]) for _, t in backlog] == [("a", "executing"), ("b", "planned")]
+    assert [rev for rev, _ in backlog] == sorted(rev for rev, _ in backlog)
+    assert [(t["id"], t["status"]) for _, t in live] == [("b", "completed")]
+    assert live[0][0] > backlog[-1][0]
+
+
+def test_resume_for_one_task_skips_other_tasks(store):
+    store.put({"id": "a"})
+    store.put({"id": "b"})
+    since = 0
+
+    async def scenario():
+        stream = task_events.event_stream(store, task_id="b", since=since)
+        events = await _take(stream, 1)
+        store.update("a", status="completed")
+        store.update("b", status="completed")
+        events += await _take(stream, 1)
+        await stream.aclose()
+        return events
+
+    events = asyncio.run(scenario())
+    assert [(t["id"], t.get("status")) for _, t in events] == [("b", None), ("b", "completed")]
+
+
+def test_snapshot_is_not_repeated_by_the_live_stream(store):
+    store.put({"id": "a", "status": "planned"})
+
+    class UpdatedWhileSubscribing:
+        """The store, with a change landing between the revision read and the snapshot read."""
+        revision = property(lambda self: store.revision)
+
+        def get(self, task_id):
+            store.update(task_id, status="executing")
+            return store.get(task_id)
+
+    async def scenario():
+        stream = task_events.event_stream(UpdatedWhileSubscribing(), task_id="a")
+        snapshot = await _take(stream, 1)
+        store.update("a", status="completed")
+        return snapshot + await _take(stream, 1)
+
+    events = asyncio.run(scenario())
+    assert [t["status"] for _, t in events] == ["executing", "completed"]
+
+
+def test_publish_drops_subscribers_whose_loop_closed(store):
+    loop = asyncio.new_event_loop()
+
+    async def subscribe():
+        return task_events.broker.subscribe()
+
+    dead = loop.run_until_complete(subscribe())
+    loop.close()
+
+    async def scenario():
+        live = task_events.broker.subscribe()
+        try:
+            store.put({"id": "a"})
+            return await asyncio.wait_for(live[1].get(), 1)
+        finally:
+            task_events.broker.unsubscribe(live)
+
+    assert asyncio.run(scenario())["id"] == "a"
+    assert dead not in task_events.broker._subscribers
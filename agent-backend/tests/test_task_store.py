@@ -0,0 +1,94 @@
+import json
+import time
+
+import pytest
+
+import task_archive
+import task_store
+
+
+def _open(backend, tmp_path, **kwargs):
+    path = tmp_path / ("tasks.db" if backend == "sqlite" else "tasks.journal")
+    return task_store.open_store(backend, path=str(path), **kwargs)
+
+
+@pytest.fixture(params=["journal", "sqlite"])
+def backend(request):
+    return request.param
+
+
+def test_cursor_survives_restart_and_removals(backend, tmp_path):
+    store = _open(backend, tmp_path)
+    for task_id in "abcde":
+        store.put({"id": task_id, "status": "planned"})
+    page, cursor = store.query(limit=2)
+    assert [t["id"] for t in page] == ["a", "b"]
+    store.remove(["a"])
+    store.compact()
+    store.close()
+
+    store = _open(backend, tmp_path)
+    page, _ = store.query(cursor=cursor, limit=2)
+    assert [t["id"] for t in page] == ["c", "d"]
+    store.put({"id": "f", "status": "planned"})
+    page, _ = store.query(cursor=cursor)
+    assert [t["id"] for t in page] == ["c", "d", "e", "f"]
+    store.close()
+
+
+def test_sequence_numbers_of_removed_tasks_are_not_reused(backend, tmp_path):
+    store = _open(backend, tmp_path)
+    for task_id in "ab":
+        store.put({"id": task_id})
+    _, cursor = store.query(limit=1)  # after "a"
+    store.remove(["b"])
+    store.compact()
+    store.close()
+
+    store = _open(backend, tmp_path)
+    store.put({"id": "c"})
+    page, _ = store.query(cursor=cursor)
+    assert [t["id"] for t in page] == ["c"]
+    assert store._seq["c"] > store._seq["a"] + 1
+    store.close()
+
+
+def test_archived_tasks_are_not_reimported_from_legacy_json(backend, tmp_path):
+    legacy = tmp_path / "tasks.json"
+    legacy_tasks = json.dumps([{"id": "a", "status": "completed"}, {"id": "b", "status": "completed"}])
+    legacy.write_text(legacy_tasks)
+    store = _open(backend, tmp_path, legacy_json=str(legacy))
+    assert len(store) == 2
+    assert not legacy.exists()
+
+    # Archive everything: any finished task older than ~10ms
+    archive = task_archive.TaskArchive(str(tmp_path / "archive"))
+    retention = task_archive.Retention(store, archive, max_age_days=0.01 / 86400, max_tasks=0)
+    time.sleep(0.02)
+    assert retention.run() == 2
+    store.close()
+
+    # Also as if tasks.json had been left behind by a version that didn't rename it
+    legacy.write_text(legacy_tasks)
+    store = _open(backend, tmp_path, legacy_json=str(legacy))
+    assert len(store) == 0
+    store.close()
+
+
+def test_clear_leases_is_silent(backend, tmp_path):
+    store = _open(backend, tmp_path)
+    store.put({"id": "a"})
+    store.put({"id": "b"})
+    store.claim("a", "dead-process", lease_seconds=600)
+    events = []
+    store.add_listener(events.append)
+    revision = store.revision
+
+    assert store.clear_leases() == 1
+    assert store.get("a")["lease_owner"] is None
+    assert store.revision == revision and events == []
+    store.close()
+
+    store = _open(backend, tmp_path)
+    assert store.get("a")["lease_owner"] is None
+    store.close()
@@ -0,0 +1,254 @@
+"""In-process tracing and metrics, exposed in Prometheus text format.
+
+- `span(name)` times a block: the duration goes into the `agent_span_seconds`
+  histogram and, inside a request, onto that request's trace (contextvars, so
+  it follows the request into threads started with a copied context).
+- `TimedLock` wraps a lock and records how long acquiring it waited.
+- `render()` produces the /metrics page: every histogram and counter here plus
+  whatever registered collectors report (queue depths, cache stats, ...).
+
+No collector or agent is needed; recent traces are kept in memory (`recent_traces`).
+"""
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_HISTORY = 200  # finished traces kept for /traces
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LOCK_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def _labels_text(names, values) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _labels_text(self.labelnames + ("le",), labelvalues + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels_text(self.labelnames + ("le",), labelvalues + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            base = _labels_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{base} {series[-2]}")
+            lines.append(f"{self.name}_count{base} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels_text(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+_metrics = []
+_collectors = []
+
+
+def histogram(name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def counter(name: str, help: str, labelnames=()) -> Counter:
+    metric = Counter(name, help, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def add_collector(fn):
+    """fn() -> iterable of (name, type, help, [(labels dict, value), ...]), called on every scrape."""
+    _collectors.append(fn)
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collect in _collectors:
+        try:
+            families = list(collect())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                if value is None:
+                    continue
+                labels = labels or {}
+                lines.append(f"{name}{_labels_text(tuple(labels), tuple(labels.values()))} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+SPAN_SECONDS = histogram("agent_span_seconds", "Duration of traced operations.", ("span",))
+SPAN_ERRORS = counter("agent_span_errors_total", "Traced operations that raised.", ("span",))
+LOCK_WAIT_SECONDS = histogram("agent_lock_wait_seconds", "Time spent waiting to acquire a lock.", ("lock",), LOCK_BUCKETS)
+
+
+# --- Traces ---
+
+class Trace:
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.attrs = {}
+        self.spans = []  # appended from any thread; list.append is atomic
+        self.error = None
+
+    def add_span(self, name: str, start: float, duration: float, attrs: dict, error: str = None):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self._t0) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            **({"attrs": attrs} if attrs else {}),
+            **({"error": error} if error else {}),
+        })
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._t0
+        _recent.append(self)
+
+    def server_timing(self) -> str:
+        """Server-Timing header: total time per span name, so the browser's devtools show the breakdown."""
+        totals = {}
+        for s in self.spans:
+            totals[s["name"]] = totals.get(s["name"], 0.0) + s["duration_ms"]
+        return ", ".join(f'{name.replace(".", "-")};dur={ms:.1f}' for name, ms in totals.items())
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            **self.attrs,
+            **({"error": self.error} if self.error else {}),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+_current = contextvars.ContextVar("trace", default=None)
+_recent = deque(maxlen=TRACE_HISTORY)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """Makes a new Trace current for the block (a request, a job run); spans inside land on it."""
+    t = Trace(name)
+    t.attrs.update(attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    except BaseException as e:
+        t.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        t.finish()
+
+
+def current_trace():
+    return _current.get()
+
+
+def recent_traces(limit: int = 50) -> list:
+    return [t.to_dict() for t in list(_recent)[-limit:]][::-1]
+
+
+@contextmanager
+def span(name: str, **attrs):
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs  # the block may add attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        SPAN_ERRORS.inc(name)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        SPAN_SECONDS.observe(duration, name)
+        current = _current.get()
+        if current is not None:
+            current.add_span(name, start, duration, attrs, error)
+
+
+class TimedLock:
+    """A Lock/RLock that records acquisition wait time under `agent_lock_wait_seconds{lock=name}`."""
+
+    def __init__(self, lock, name: str):
+        self._lock = lock
+        self.name = name
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(blocking=False):
+            LOCK_WAIT_SECONDS.observe(0.0, self.name)
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()